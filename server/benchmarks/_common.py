@@ -0,0 +1,73 @@
+"""Shared helpers for the benchmark scripts.
+
+Run benchmarks from the ``server`` directory, e.g.::
+
+    python -m benchmarks.bench_batching
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def summarize_ms(latencies_s: List[float]) -> Dict[str, float]:
+    ms = [v * 1000.0 for v in latencies_s]
+    return {
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'max_ms': round(max(ms) if ms else 0.0, 2),
+    }
+
+
+def run_closed_loop(fn: Callable[[int], Any], concurrency: int, requests_per_client: int) -> Dict[str, float]:
+    """Drive ``fn`` from ``concurrency`` threads, each issuing requests back to back."""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def client(client_id: int) -> None:
+        local: List[float] = []
+        for i in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                fn(client_id * requests_per_client + i)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    result = {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 1) if wall > 0 else 0.0,
+    }
+    result.update(summarize_ms(latencies))
+    return result
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    if not rows:
+        return
+    cols = list(rows[0].keys())
+    widths = {c: max(len(str(c)), *(len(str(r.get(c, ''))) for r in rows)) for c in cols}
+    print("  ".join(str(c).ljust(widths[c]) for c in cols))
+    for r in rows:
+        print("  ".join(str(r.get(c, '')).ljust(widths[c]) for c in cols))
@@ -0,0 +1,97 @@
+"""Detection accuracy helpers shared by the evaluation benchmarks.
+
+Labelled folders follow the YOLO layout::
+
+    folder/images/<name>.png
+    folder/labels/<name>.txt   # one "cls cx cy w h" line per box, normalized
+"""
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from utils.box_ops import box_iou
+
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.webp')
+
+
+def load_labelled_folder(folder: str) -> List[Tuple[str, np.ndarray, np.ndarray, np.ndarray]]:
+    """Return ``(name, rgb_image, gt_xyxy, gt_cls)`` for every labelled image."""
+    image_dir = os.path.join(folder, 'images')
+    label_dir = os.path.join(folder, 'labels')
+    samples = []
+    for fname in sorted(os.listdir(image_dir)):
+        if not fname.lower().endswith(IMAGE_EXTS):
+            continue
+        img = np.asarray(Image.open(os.path.join(image_dir, fname)).convert('RGB'))
+        h, w = img.shape[:2]
+        boxes, classes = [], []
+        label_path = os.path.join(label_dir, os.path.splitext(fname)[0] + '.txt')
+        if os.path.exists(label_path):
+            with open(label_path) as fh:
+                for line in fh:
+                    parts = line.split()
+                    if len(parts) < 5:
+                        continue
+                    c, cx, cy, bw, bh = int(parts[0]), *map(float, parts[1:5])
+                    boxes.append([(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h])
+                    classes.append(c)
+        samples.append((fname, img, np.asarray(boxes, np.float32).reshape(-1, 4), np.asarray(classes, np.int64)))
+    return samples
+
+
+def evaluate(predictions, ground_truth, iou_threshold: float = 0.5) -> Dict[int, Dict[str, float]]:
+    """Per-class AP@iou and recall.
+
+    ``predictions`` is a list of ``Detections`` and ``ground_truth`` a list of
+    ``(gt_xyxy, gt_cls)`` pairs, both aligned by image.
+    """
+    classes = sorted({int(c) for _, gt_cls in ground_truth for c in gt_cls})
+    report: Dict[int, Dict[str, float]] = {}
+    for c in classes:
+        scored: List[Tuple[float, bool]] = []
+        n_gt = 0
+        for det, (gt_xyxy, gt_cls) in zip(predictions, ground_truth):
+            gt = gt_xyxy[gt_cls == c]
+            n_gt += len(gt)
+            mask = det.cls == c
+            boxes, conf = det.xyxy[mask], det.conf[mask]
+            order = np.argsort(-conf)
+            ious = box_iou(boxes[order], gt)
+            taken = np.zeros(len(gt), dtype=bool)
+            for rank, i in enumerate(order):
+                hit = False
+                if len(gt):
+                    candidates = np.where(~taken, ious[rank], -1.0)
+                    j = int(np.argmax(candidates))
+                    if candidates[j] >= iou_threshold:
+                        taken[j] = True
+                        hit = True
+                scored.append((float(conf[i]), hit))
+        scored.sort(key=lambda x: -x[0])
+        tp = np.cumsum([hit for _, hit in scored]) if scored else np.zeros(0)
+        fp = np.cumsum([not hit for _, hit in scored]) if scored else np.zeros(0)
+        recall_curve = tp / max(n_gt, 1)
+        precision_curve = tp / np.maximum(tp + fp, 1)
+        report[c] = {
+            'ap50': round(_area_under_pr(recall_curve, precision_curve), 4),
+            'recall': round(float(recall_curve[-1]) if len(recall_curve) else 0.0, 4),
+            'n_gt': n_gt,
+        }
+    return report
+
+
+def mean_ap(report: Dict[int, Dict[str, float]]) -> float:
+    return round(float(np.mean([r['ap50'] for r in report.values()])) if report else 0.0, 4)
+
+
+def _area_under_pr(recall: np.ndarray, precision: np.ndarray) -> float:
+    if len(recall) == 0:
+        return 0.0
+    r = np.concatenate([[0.0], recall, [1.0]])
+    p = np.concatenate([[1.0], precision, [0.0]])
+    # Precision envelope, then all-point interpolation
+    p = np.maximum.accumulate(p[::-1])[::-1]
+    idx = np.where(r[1:] != r[:-1])[0]
+    return float(np.sum((r[idx + 1] - r[idx]) * p[idx + 1]))
@@ -0,0 +1,137 @@
+"""Load test of admission control: p99 under 3x overload with and without it.
+
+A local HTTP server exposes one endpoint whose work is modelled as a
+``--service-ms`` hold on one of ``--cores`` "CPU" slots (a semaphore plus
+sleep, so the test behaves the same on any machine). Requests arrive
+open-loop at ``--overload`` times that capacity. Without admission
+control every request is accepted and waits for a core, so latency grows
+for as long as the overload lasts. With it, at most ``--cores`` requests
+run and ``--queue`` wait; the rest get an immediate 503 with Retry-After
+and the p99 of accepted requests stays bounded. Exits 1 if the admitted
+p99 exceeds ``--p99-bound-ms``.
+
+    python -m benchmarks.bench_admission
+"""
+import argparse
+import http.client
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List
+
+from flask import Flask, jsonify
+from werkzeug.serving import make_server
+
+from benchmarks._common import print_table, summarize_ms
+from utils.admission import AdmissionPolicy, admission_controlled
+
+
+def build_app(cores: int, service_s: float, policy: AdmissionPolicy) -> Flask:
+    app = Flask(__name__)
+    cpu = threading.Semaphore(cores)
+
+    @app.route('/work', methods=['POST'])
+    @admission_controlled('bench_work', policy)
+    def work():
+        with cpu:
+            time.sleep(service_s)
+        return jsonify({'ok': True})
+
+    return app
+
+
+def drive(port: int, rate: float, seconds: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    lock = threading.Lock()
+
+    def request() -> None:
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            conn.request('POST', '/work')
+            status = conn.getresponse().status
+        except Exception:
+            status = 'error'
+        finally:
+            conn.close()
+        elapsed = time.perf_counter() - start
+        with lock:
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    threads = []
+    t0 = time.perf_counter()
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(rate)
+        if offset >= seconds:
+            break
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        thread = threading.Thread(target=request)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - t0
+    return {
+        'sent': len(threads),
+        'ok': statuses[200],
+        'shed_503': statuses[503],
+        'errors': statuses['error'],
+        'goodput_rps': round(statuses[200] / wall, 1),
+        **summarize_ms(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cores', type=int, default=2)
+    parser.add_argument('--service-ms', type=float, default=50.0)
+    parser.add_argument('--overload', type=float, default=3.0)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--queue', type=int, default=4)
+    parser.add_argument('--queue-timeout-s', type=float, default=1.0)
+    parser.add_argument('--p99-bound-ms', type=float, default=0.0,
+                        help='Fail above this admitted p99 (default: 2x the worst-case queue + service time, plus 100 ms)')
+    args = parser.parse_args()
+
+    service_s = args.service_ms / 1000.0
+    capacity = args.cores / service_s
+    policy = AdmissionPolicy(
+        concurrency=args.cores, queue=args.queue, queue_timeout_s=args.queue_timeout_s,
+        ip_rate=0.0, ip_burst=1.0, user_rate=0.0, user_burst=1.0,
+    )
+    worst_s = min(args.queue_timeout_s + service_s, (args.queue / args.cores + 1) * service_s)
+    bound_ms = args.p99_bound_ms or 2000.0 * worst_s + 100.0
+    print(f"capacity {capacity:.0f} req/s, offered {capacity * args.overload:.0f} req/s for {args.seconds:.0f}s\n")
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    rows = []
+    for enabled in ('false', 'true'):
+        os.environ['ADMISSION_ENABLED'] = enabled
+        server = make_server('127.0.0.1', 0, build_app(args.cores, service_s, policy), threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        result = drive(server.server_port, capacity * args.overload, args.seconds, seed=0)
+        server.shutdown()
+        rows.append({'admission': 'on' if enabled == 'true' else 'off', **result})
+    print_table(rows)
+
+    admitted_p99 = rows[-1]['p99_ms']
+    print(f"\nadmitted p99 with admission control: {admitted_p99} ms (bound {bound_ms:.0f} ms)")
+    if admitted_p99 > bound_ms or rows[-1]['errors']:
+        print("FAIL: admitted p99 not bounded")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Peak allocation and latency of annotation + PNG encode, previous vs current renderer.
+
+Peak allocation is measured with tracemalloc (numpy and OpenCV output arrays
+are tracked). The current renderer draws on one copy of the frame (the
+decoded frame is shared, so it is never drawn on) where the previous one
+converted it to BGR and back and then copied it into PIL. The script exits non-zero if its peak is not at most
+``--max-ratio`` of the previous renderer's, so it doubles as a regression
+guard.
+
+    python -m benchmarks.bench_annotation
+"""
+import argparse
+import io
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from benchmarks._common import print_table
+from benchmarks.bench_decode import synthetic_screenshot
+from utils.annotation import encode_image, render_annotations
+
+
+def previous_renderer(img_np: np.ndarray, patterns) -> bytes:
+    """The analyze_pil annotation block and image_to_base64 encode before this change."""
+    img_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
+    for p in patterns:
+        x1, y1, x2, y2 = [int(v) for v in p["bbox"]]
+        cv2.rectangle(img_bgr, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        label = f"{p['pattern']} {p['confidence']*100:.1f}%"
+        cv2.putText(img_bgr, label, (x1, max(0, y1 - 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2, cv2.LINE_AA)
+    annotated = Image.fromarray(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))
+    buffered = io.BytesIO()
+    annotated.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+
+def current_renderer(img_np: np.ndarray, patterns, scale: float = 1.0) -> bytes:
+    return encode_image(render_annotations(img_np, patterns, scale=scale), "PNG")
+
+
+def measure(fn, make_image, patterns, repeats: int):
+    timings, peaks = [], []
+    for _ in range(repeats):
+        img = make_image()
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn(img, patterns)
+        timings.append((time.perf_counter() - start) * 1000.0)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peaks.append(peak)
+    return sorted(timings)[len(timings) // 2], max(peaks)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--max-ratio', type=float, default=0.6)
+    args = parser.parse_args()
+
+    base = synthetic_screenshot(args.width, args.height)
+    patterns = [
+        {'pattern': 'double_bottom', 'confidence': 0.91, 'bbox': [100, 200, 700, 800]},
+        {'pattern': 'bullish_engulfing', 'confidence': 0.77, 'bbox': [900, 300, 1200, 600]},
+    ]
+    make_image = lambda: base.copy()
+
+    rows = []
+    old_ms, old_peak = measure(previous_renderer, make_image, patterns, args.repeats)
+    rows.append({'renderer': 'previous', 'scale': 1.0, 'median_ms': round(old_ms, 1), 'peak_alloc_kb': old_peak // 1024})
+    new_peak_full = None
+    for scale in (1.0, 0.5):
+        ms, peak = measure(lambda img, p, s=scale: current_renderer(img, p, s), make_image, patterns, args.repeats)
+        rows.append({'renderer': 'current', 'scale': scale, 'median_ms': round(ms, 1), 'peak_alloc_kb': peak // 1024})
+        if scale == 1.0:
+            new_peak_full = peak
+    print_table(rows)
+
+    img = make_image()
+    render_annotations(img, patterns)
+    if not np.array_equal(img, base):
+        print("FAIL: render_annotations modified its input frame", file=sys.stderr)
+        sys.exit(1)
+
+    ratio = new_peak_full / old_peak if old_peak else 0.0
+    print(f"peak allocation ratio (current / previous): {ratio:.3f}")
+    if ratio > args.max_ratio:
+        print(f"FAIL: expected at most {args.max_ratio}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Throughput vs p99 latency of the micro-batching layer in front of the YOLO model.
+
+Without ``--model`` a synthetic model is used whose cost is a fixed per-call
+overhead plus a per-image cost, which is the shape that makes batching pay off.
+With ``--model path/to/model.pt`` the real ``YoloChartAnalyzer`` is measured.
+
+    python -m benchmarks.bench_batching --concurrency 16 --requests 20
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+
+from benchmarks._common import print_table, run_closed_loop
+from utils.inference_batcher import MicroBatcher
+
+
+class SyntheticModel:
+    def __init__(self, overhead_ms: float, per_image_ms: float) -> None:
+        self.overhead = overhead_ms / 1000.0
+        self.per_image = per_image_ms / 1000.0
+        # One model instance computes one forward pass at a time
+        self._lock = threading.Lock()
+
+    def predict_batch(self, images):
+        with self._lock:
+            time.sleep(self.overhead + self.per_image * len(images))
+        return [[] for _ in images]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Path to a real .pt model (default: synthetic model)')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=20, help='Requests per client thread')
+    parser.add_argument('--batch-sizes', default='1,2,4,8,16')
+    parser.add_argument('--waits-ms', default='2,5,10')
+    parser.add_argument('--overhead-ms', type=float, default=20.0)
+    parser.add_argument('--per-image-ms', type=float, default=4.0)
+    args = parser.parse_args()
+
+    if args.model:
+        os.environ['CHART_MODEL_PATH'] = args.model
+        os.environ['CHART_BATCH_MAX_SIZE'] = '1'
+        from utils.yolo_service import YoloChartAnalyzer
+        predict_batch = YoloChartAnalyzer().predict_batch
+        image = np.random.randint(0, 255, (720, 1280, 3), dtype=np.uint8)
+    else:
+        predict_batch = SyntheticModel(args.overhead_ms, args.per_image_ms).predict_batch
+        image = np.zeros((8, 8, 3), dtype=np.uint8)
+
+    rows = []
+    for batch_size in [int(b) for b in args.batch_sizes.split(',')]:
+        waits = [0.0] if batch_size == 1 else [float(w) for w in args.waits_ms.split(',')]
+        for wait_ms in waits:
+            if batch_size == 1:
+                lock = threading.Lock()
+
+                def call(_i, lock=lock):
+                    with lock:
+                        return predict_batch([image])[0]
+                batcher = None
+            else:
+                batcher = MicroBatcher(predict_batch, max_batch_size=batch_size, max_wait_ms=wait_ms)
+                call = lambda _i, b=batcher: b.submit(image)
+            res = run_closed_loop(call, args.concurrency, args.requests)
+            row = {'max_batch': batch_size, 'wait_ms': wait_ms}
+            row.update(res)
+            row['avg_batch'] = batcher.stats()['avg_batch_size'] if batcher else 1.0
+            rows.append(row)
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
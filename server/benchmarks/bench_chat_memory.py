@@ -0,0 +1,210 @@
+"""Chat prompt size, rows read and latency as a session grows: full history vs rolling summary.
+
+Sessions are grown to ``--lengths`` messages of about ``--message-chars``
+characters. Each request uses history_mode 'full' with history_limit 200.
+The chat tables live in an in-memory store that counts the rows it
+returns. Gemini is a local HTTP server whose reply time is ``--base-ms``
+plus ``--ms-per-kchar`` per 1000 characters of request (a rough model of
+prefill cost); summary requests go to the same server.
+
+- full history: the pre-summary behaviour. Up to 200 messages are read and
+  inlined, and CHAT_PROMPT_BUDGET_CHARS is effectively unlimited.
+- rolling summary: ChatMemory folds older messages into the session summary
+  after each exchange (synchronously here). The prompt is the summary plus
+  every message it does not cover yet, within the prompt budget.
+
+Exits 1 if the rolling-summary prompt at the longest session is more than
+10% larger than at the shortest one that has a summary, or if a message
+newer than the summary is missing from what ChatMemory loads.
+
+    python -m benchmarks.bench_chat_memory
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from benchmarks._common import print_table, summarize_ms
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    """The slice of the Supabase query builder ChatMemory uses, over a list of dicts."""
+
+    def __init__(self, store: 'MemoryStore', table: str) -> None:
+        self.store, self.table = store, table
+        self.filters, self.order_by, self.span, self.values = [], None, None, None
+
+    def select(self, columns):
+        self.columns = columns.split(',')
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self.span = (start, end + 1)
+        return self
+
+    def limit(self, count):
+        self.span = (0, count)
+        return self
+
+    def execute(self):
+        rows = [row for row in self.store.tables[self.table] if all(f(row) for f in self.filters)]
+        if self.values is not None:
+            for row in rows:
+                row.update(self.values)
+            return _Result([dict(row) for row in rows])
+        if self.order_by:
+            rows.sort(key=lambda row: row[self.order_by[0]], reverse=self.order_by[1])
+        if self.span:
+            rows = rows[self.span[0]:self.span[1]]
+        self.store.rows_read += len(rows)
+        return _Result([{c: row.get(c) for c in self.columns} for row in rows])
+
+
+class MemoryStore:
+    def __init__(self) -> None:
+        self.tables = {'chat_sessions': [], 'chat_messages': []}
+        self.rows_read = 0
+
+    def table(self, name):
+        return _Query(self, name)
+
+
+def fake_gemini(base_s: float, s_per_char: float, answer_chars: int, summary_chars: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(base_s + s_per_char * len(request))
+            is_summary = b'running summary' in request
+            text = ('S' if is_summary else 'A') * (summary_chars if is_summary else answer_chars)
+            body = json.dumps({'candidates': [{'content': {'parts': [{'text': text}]}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lengths', default='10,50,100,200,400', help='Session lengths in messages')
+    parser.add_argument('--message-chars', type=int, default=400)
+    parser.add_argument('--base-ms', type=float, default=150.0)
+    parser.add_argument('--ms-per-kchar', type=float, default=10.0)
+    parser.add_argument('--requests', type=int, default=3, help='Timed asks per checkpoint')
+    args = parser.parse_args()
+    lengths = sorted(int(n) for n in args.lengths.split(','))
+
+    gemini = fake_gemini(args.base_ms / 1000.0, args.ms_per_kchar / 1e6, args.message_chars, 1500)
+    os.environ['GEMINI_API_KEY'] = 'bench'
+    os.environ['GEMINI_API_BASE'] = f"http://127.0.0.1:{gemini.server_port}/v1beta"
+
+    from db.config import db_config
+    from utils.ai_insights import chat_service
+    from utils.chat_memory import chat_memory
+
+    store = MemoryStore()
+    db_config.supabase = store
+    user_id, session_id = 'u1', 's1'
+    store.tables['chat_sessions'].append({'id': session_id, 'user_id': user_id, 'summary': None,
+                                          'summarized_through': None, 'summarized_count': 0})
+    t0 = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    message = 'Given the double bottom on the daily, where would you put the stop?'
+    budget = chat_service.history_budget_chars
+
+    rows, gaps = [], []
+    for length in lengths:
+        # Grow the session, folding after each exchange as _save_chat_exchange does
+        while len(store.tables['chat_messages']) < length:
+            i = len(store.tables['chat_messages'])
+            for role in ('user', 'assistant'):
+                store.tables['chat_messages'].append({
+                    'user_id': user_id, 'session_id': session_id, 'role': role,
+                    'message': f"{role} turn {i}: " + 'x' * args.message_chars,
+                    'created_at': (t0 + timedelta(seconds=i)).isoformat(),
+                })
+                i += 1
+            while chat_memory.fold(user_id, session_id):
+                pass
+
+        for mode in ('full history', 'rolling summary'):
+            latencies: List[float] = []
+            for _ in range(args.requests):
+                store.rows_read = 0
+                start = time.perf_counter()
+                if mode == 'full history':
+                    chat_service.history_budget_chars = 10 ** 9
+                    history = list(reversed(
+                        store.table('chat_messages').select('role,message,created_at').eq('session_id', session_id)
+                        .order('created_at', desc=True).range(0, 199).execute().data
+                    ))
+                    summary = None
+                else:
+                    chat_service.history_budget_chars = budget
+                    summary, history = chat_memory.load(user_id, session_id, 'session', 'full', 200)
+                    through = store.tables['chat_sessions'][0]['summarized_through'] or ''
+                    unsummarized = sum(m['created_at'] > through for m in store.tables['chat_messages'])
+                    if len(history or []) != unsummarized:
+                        gaps.append(f"{length} messages: loaded {len(history or [])} of {unsummarized} unsummarized")
+                rows_read = store.rows_read
+                result = chat_service.ask(message, history=history, summary=summary)
+                latencies.append(time.perf_counter() - start)
+                if 'error' in result:
+                    print(f"FAIL: {result['error']}")
+                    sys.exit(1)
+            prompt_chars = len(json.dumps(chat_service._build_payload(message, None, history, summary)))
+            rows.append(dict(messages=length, mode=mode, rows_read=rows_read, prompt_chars=prompt_chars,
+                             **summarize_ms(latencies)))
+    chat_service.history_budget_chars = budget
+    gemini.shutdown()
+    print_table(rows)
+
+    summarized = [r for r in rows if r['mode'] == 'rolling summary']
+    session = store.tables['chat_sessions'][0]
+    print(f"\nsummary covers {session['summarized_count']} messages; prompt budget {budget} chars")
+    first = next((r for r in summarized if r['messages'] > chat_memory.recent_turns + chat_memory.fold_batch), summarized[0])
+    if summarized[-1]['prompt_chars'] > 1.1 * first['prompt_chars']:
+        print("FAIL: prompt size grows with the session")
+        sys.exit(1)
+    if gaps:
+        print("FAIL: messages neither summarized nor loaded:\n  " + "\n  ".join(gaps))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
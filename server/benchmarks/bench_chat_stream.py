@@ -0,0 +1,137 @@
+"""Time to first byte vs total time for /ask-bot-stream against a fake streaming Gemini.
+
+A local HTTP server stands in for Gemini (GEMINI_API_BASE points at it):
+streamGenerateContent sends ``--chunks`` SSE events ``--chunk-ms`` apart,
+generateContent answers once the same total time has passed. Requests go
+through the real Flask routes on a local server. /ask-bot (and the old
+buffered /ask-bot-stream) cannot send anything before the full answer
+exists, so its TTFB equals its total time; the streaming route's TTFB
+should be about one chunk interval. Exits 1 if the streaming TTFB is not
+below half of its total time, or if the non-ASCII text in the events does
+not come through intact.
+
+    python -m benchmarks.bench_chat_stream
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+from benchmarks._common import print_table, summarize_ms
+
+
+def fake_gemini(chunks: int, chunk_s: float) -> ThreadingHTTPServer:
+    # Non-ASCII text must survive the text/event-stream decoding
+    words = [f"**Chart outlook {i}**\n" if i == 0 else f"₹{i} " for i in range(chunks)]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if ':streamGenerateContent' in self.path:
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for word in words:
+                    time.sleep(chunk_s)
+                    event = {'candidates': [{'content': {'parts': [{'text': word}]}}]}
+                    data = f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode()
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    self.wfile.flush()
+                self.wfile.write(b'0\r\n\r\n')
+                return
+            time.sleep(chunk_s * chunks)
+            body = json.dumps({'candidates': [{'content': {'parts': [{'text': ''.join(words)}]}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def timed_request(port: int, path: str, first_marker: bytes) -> tuple[float, float, bytes]:
+    """(seconds to the first line starting with ``first_marker``, seconds to the end of the body, body)."""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    start = time.perf_counter()
+    conn.request('POST', path, body=json.dumps({'message': 'Is this a double bottom?'}),
+                 headers={'Content-Type': 'application/json'})
+    resp = conn.getresponse()
+    first = None
+    body = b''
+    while True:
+        line = resp.readline()
+        if not line:
+            break
+        body += line
+        if first is None and line.startswith(first_marker):
+            first = time.perf_counter() - start
+    total = time.perf_counter() - start
+    conn.close()
+    return (first if first is not None else total), total, body
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=40)
+    parser.add_argument('--chunk-ms', type=float, default=25.0)
+    parser.add_argument('--requests', type=int, default=10)
+    args = parser.parse_args()
+
+    gemini = fake_gemini(args.chunks, args.chunk_ms / 1000.0)
+    os.environ['GEMINI_API_KEY'] = 'bench'
+    os.environ['GEMINI_API_BASE'] = f"http://127.0.0.1:{gemini.server_port}/v1beta"
+
+    from flask import Flask
+    from werkzeug.serving import make_server
+    from routes.analysis_routes import analysis_bp
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = Flask(__name__)
+    app.register_blueprint(analysis_bp)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    rows = []
+    for route, marker in (('/api/analysis/ask-bot', b'{'), ('/api/analysis/ask-bot-stream', b'DATA:')):
+        ttfb: List[float] = []
+        total: List[float] = []
+        for _ in range(args.requests):
+            first, whole, body = timed_request(server.server_port, route, marker)
+            ttfb.append(first)
+            total.append(whole)
+        rows.append({
+            'route': route.rsplit('/', 1)[-1],
+            'ttfb_p50_ms': summarize_ms(ttfb)['p50_ms'],
+            'total_p50_ms': summarize_ms(total)['p50_ms'],
+        })
+    print_table(rows)
+    server.shutdown()
+    gemini.shutdown()
+
+    if '₹1 '.encode() not in body:
+        print("FAIL: streamed text is not decoded as UTF-8")
+        sys.exit(1)
+    stream = rows[-1]
+    print(f"\nstreaming TTFB {stream['ttfb_p50_ms']} ms of {stream['total_p50_ms']} ms total")
+    if stream['ttfb_p50_ms'] > stream['total_p50_ms'] / 2:
+        print("FAIL: first token is not streamed ahead of the full answer")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
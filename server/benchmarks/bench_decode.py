@@ -0,0 +1,103 @@
+"""Latency and peak memory of upload decoding: previous path vs utils.image_decode.
+
+The previous path was ``Image.open(...).convert('RGB')`` in the route followed
+by ``convert('RGB')`` + ``np.array`` in ``analyze_pil``. Each measurement runs
+in a fresh subprocess so peak RSS belongs to that path alone.
+
+    python -m benchmarks.bench_decode --width 4000 --height 3000
+"""
+import argparse
+import importlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from benchmarks._common import print_table
+
+
+def synthetic_screenshot(width: int, height: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    img = np.full((height, width, 3), 18, dtype=np.uint8)
+    step = max(4, width // 300)
+    price = height / 2
+    for x in range(0, width - step, step):
+        nxt = price + rng.normal(0, height / 150)
+        color = (0, 190, 90) if nxt >= price else (220, 60, 60)
+        top, bottom = int(min(price, nxt)), int(max(price, nxt)) + 2
+        cv2.rectangle(img, (x, top), (x + step - 2, bottom), color, -1)
+        price = min(max(nxt, 20), height - 20)
+    return img
+
+
+def old_path(data: bytes) -> np.ndarray:
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    return np.array(image.convert('RGB'))
+
+
+def new_path(data: bytes) -> np.ndarray:
+    from utils.image_decode import decode_chart
+    return decode_chart(data)
+
+
+def run_worker(path: str, mode: str, repeats: int) -> None:
+    with open(path, 'rb') as fh:
+        data = fh.read()
+    fn = old_path if mode == 'old' else new_path
+    importlib.import_module('utils.image_decode')  # keep import cost out of the measurement
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    shape = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        shape = fn(data).shape
+        timings.append((time.perf_counter() - start) * 1000.0)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({
+        'mode': mode,
+        'shape': 'x'.join(map(str, shape[:2][::-1])),
+        'median_ms': round(sorted(timings)[len(timings) // 2], 1),
+        'peak_rss_mb': round(peak / 1024, 1),
+        'peak_rss_growth_mb': round((peak - baseline) / 1024, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=4000)
+    parser.add_argument('--height', type=int, default=3000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker[0], args.worker[1], args.repeats)
+        return
+
+    img = synthetic_screenshot(args.width, args.height)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, ext, params in (('JPEG', '.jpg', [cv2.IMWRITE_JPEG_QUALITY, 90]), ('PNG', '.png', [])):
+            path = os.path.join(tmp, f'chart{ext}')
+            cv2.imwrite(path, cv2.cvtColor(img, cv2.COLOR_RGB2BGR), params)
+            for mode in ('old', 'new'):
+                proc = subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.bench_decode', '--repeats', str(args.repeats), '--worker', path, mode],
+                    capture_output=True, text=True, check=True,
+                )
+                row = {'format': fmt, 'bytes': os.path.getsize(path)}
+                row.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+                rows.append(row)
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""Latency and errors while the model registry hot-swaps to a new version.
+
+Client threads send detections back to back while a new model version is
+loaded, warmed and swapped in. A slow-loading synthetic backend stands in
+for the weights (``--load-s`` per profile load), so the swap is visible
+without a real model. Requests should never fail and p99 during the reload
+should stay close to steady state; the old version's requests finish on it
+and new ones pick up the new version, and the old version is closed once
+its last request has released it. Exits 1 on any error, if the swap did
+not happen or if the old version is still open afterwards. For comparison, the first request on a cold analyzer (what
+a restart costs) is reported too.
+
+    python -m benchmarks.bench_hot_swap
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import utils.yolo_service as yolo_service
+from benchmarks._common import print_table, summarize_ms
+from benchmarks.bench_decode import synthetic_screenshot
+from benchmarks.bench_replicas import MatmulBackend
+
+
+class SlowLoadBackend(MatmulBackend):
+    """MatmulBackend that takes ``load_s`` to construct, like reading and initialising weights."""
+
+    def __init__(self, load_s: float, size: int, rounds: int) -> None:
+        time.sleep(load_s)
+        super().__init__(size, rounds)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=6.0, help='Total load duration')
+    parser.add_argument('--load-s', type=float, default=1.0, help='Synthetic model load time per profile')
+    parser.add_argument('--size', type=int, default=192)
+    parser.add_argument('--rounds', type=int, default=4)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='bench_hot_swap_')
+    paths = []
+    for version in ('v1', 'v2'):
+        path = os.path.join(tmp, f'{version}.pt')
+        with open(path, 'wb') as fh:
+            fh.write(version.encode() * 64)
+        paths.append(path)
+    os.environ['CHART_MODEL_PATH'] = paths[0]
+    os.environ.setdefault('CHART_WARMUP_RUNS', '1')
+
+    yolo_service.create_backend = lambda *a, **kw: SlowLoadBackend(args.load_s, args.size, args.rounds)
+    from utils.inference_profiles import get_profile
+    from utils.model_registry import model_registry
+
+    img_np = synthetic_screenshot(640, 360)
+
+    cold_start = time.perf_counter()
+    with model_registry.lease() as generation:
+        generation.analyzer(get_profile('fast')).detect(img_np)
+    cold_ms = (time.perf_counter() - cold_start) * 1000
+    old = model_registry.current()
+    old.load(warmup_runs=1)
+
+    samples = []  # (finished_at, latency_s, version, error)
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client() -> None:
+        while not stop.is_set():
+            start = time.perf_counter()
+            version, error = None, None
+            try:
+                with model_registry.lease() as generation:
+                    generation.analyzer(get_profile('fast')).detect(img_np)
+                    version = generation.version
+            except Exception as e:
+                error = repr(e)
+            end = time.perf_counter()
+            with lock:
+                samples.append((end, end - start, version, error))
+
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds / 3)
+    reload_start = time.perf_counter()
+    model_registry.reload(paths[1])
+    while model_registry.status()['reload']['state'] == 'loading':
+        time.sleep(0.01)
+    swapped_at = time.perf_counter()
+    time.sleep(max(0.0, args.seconds - (swapped_at - t0)))
+    stop.set()
+    for t in threads:
+        t.join()
+
+    phases = {'before': [], 'reloading': [], 'after': []}
+    for end, latency, _, _ in samples:
+        phase = 'before' if end < reload_start else 'reloading' if end < swapped_at else 'after'
+        phases[phase].append(latency)
+    rows = [dict(phase=name, requests=len(lat), **summarize_ms(lat)) for name, lat in phases.items()]
+    print_table(rows)
+
+    errors = [s[3] for s in samples if s[3]]
+    versions = Counter(s[2] for s in samples if s[2])
+    status = model_registry.status()
+    print(f"\ncold first request (restart equivalent): {cold_ms:.0f} ms")
+    print(f"reload took {swapped_at - reload_start:.2f}s; requests per version: {dict(versions)}")
+    print(f"serving: {status['current']['model_version']}; errors: {len(errors)}; old version closed: {old.closed}")
+    if errors or status['current']['model_path'] != paths[1] or status['reload']['state'] != 'idle':
+        print(f"FAIL: {errors[:3] or status['reload']}")
+        sys.exit(1)
+    if not old.closed:
+        print("FAIL: the replaced version was not closed after its last request")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Per-call latency of outbound HTTPS: bare requests.post vs the pooled http_client.
+
+A local HTTPS server with a throwaway self-signed certificate stands in for
+Gemini/Expo/Apple. To model a remote host it waits ``--rtt-ms`` per
+request and two more round trips per new connection (TCP + TLS
+handshakes); the TLS handshake itself is real. Bare ``requests.post``
+opens a new connection for every call, the way every integration used to;
+``http_client`` keeps connections alive in a per-host pool. Exits 1 if the
+pooled p50 is not below the bare p50.
+
+    python -m benchmarks.bench_http_client
+"""
+import argparse
+import logging
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from benchmarks._common import print_table, run_closed_loop
+from utils.http_client import HttpClient
+
+
+def self_signed_cert(directory: str) -> tuple[str, str]:
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+         '-subj', '/CN=localhost', '-addext', 'subjectAltName=DNS:localhost,IP:127.0.0.1',
+         '-keyout', key, '-out', cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def https_stand_in(cert: str, key: str, rtt_s: float) -> ThreadingHTTPServer:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    body = b'{"data": [{"status": "ok"}]}'
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body go out as separate writes; avoid Nagle + delayed ACK stalls
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(rtt_s)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def finish_request(self, request, client_address):
+            # New connection: TCP and TLS handshakes cost a round trip each
+            time.sleep(2 * rtt_s)
+            try:
+                request = context.wrap_socket(request, server_side=True)
+            except (ssl.SSLError, OSError):
+                return
+            super().finish_request(request, client_address)
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rtt-ms', type=float, default=10.0, help='Simulated network round trip')
+    parser.add_argument('--requests', type=int, default=100, help='Calls per client')
+    parser.add_argument('--concurrency', default='1,4')
+    args = parser.parse_args()
+
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cert, key = self_signed_cert(tmp)
+        server = https_stand_in(cert, key, args.rtt_ms / 1000.0)
+        url = f"https://127.0.0.1:{server.server_port}/--/api/v2/push/send"
+        payload = [{'to': 'ExponentPushToken[bench]', 'title': 'ChartAi', 'body': 'bench'}]
+        client = HttpClient()
+
+        def bare(_):
+            requests.post(url, json=payload, timeout=10, verify=cert).raise_for_status()
+
+        def pooled(_):
+            client.post(url, json=payload, timeout=10, verify=cert).raise_for_status()
+
+        for concurrency in (int(c) for c in args.concurrency.split(',')):
+            for name, fn in (('requests.post', bare), ('http_client', pooled)):
+                rows.append({'client': name, 'concurrency': concurrency,
+                             **run_closed_loop(fn, concurrency, args.requests)})
+        client.close()
+        server.shutdown()
+    print_table(rows)
+
+    bare_p50 = max(r['p50_ms'] for r in rows if r['client'] == 'requests.post')
+    pooled_p50 = max(r['p50_ms'] for r in rows if r['client'] == 'http_client')
+    print(f"\nworst p50: bare {bare_p50} ms, pooled {pooled_p50} ms")
+    if pooled_p50 >= bare_p50 or any(r['errors'] for r in rows):
+        print("FAIL: pooled client is not faster per call")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Response size and encode time: inline base64 PNG vs stored image in WebP/JPEG/PNG.
+
+    python -m benchmarks.bench_image_formats --width 1600 --height 1200
+"""
+import argparse
+import base64
+import json
+import time
+
+from benchmarks._common import print_table
+from benchmarks.bench_decode import synthetic_screenshot
+from utils.annotation import encode_image, render_annotations
+
+
+def timed(fn, repeats: int):
+    timings, out = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return out, sorted(timings)[len(timings) // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=1600)
+    parser.add_argument('--height', type=int, default=1200)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    img = synthetic_screenshot(args.width, args.height)
+    patterns = [{'pattern': 'double_bottom', 'confidence': 0.91, 'bbox': [100, 200, 700, 800]}]
+    render_annotations(img, patterns)
+    base_payload = {'patterns_detected': patterns, 'summary': '1 pattern(s) detected.', 'insights': {'summary': ''}}
+
+    rows = []
+    png, ms = timed(lambda: encode_image(img, 'PNG'), args.repeats)
+    inline = dict(base_payload, annotated_image='data:image/png;base64,' + base64.b64encode(png).decode('utf-8'))
+    rows.append({'path': 'inline base64 PNG (previous)', 'encode_ms': round(ms, 1),
+                 'json_bytes': len(json.dumps(inline)), 'image_bytes': 0})
+
+    by_ref = dict(base_payload, annotated_image='https://api.example.com/api/analysis/annotated/' + '0' * 32,
+                  annotated_image_id='0' * 32)
+    json_bytes = len(json.dumps(by_ref))
+    variants = [
+        ('master PNG level 1 (background)', lambda: encode_image(img, 'PNG', compress_level=1)),
+        ('GET webp q80', lambda: encode_image(img, 'WEBP', quality=80)),
+        ('GET jpeg q80', lambda: encode_image(img, 'JPEG', quality=80)),
+        ('GET png', lambda: encode_image(img, 'PNG')),
+    ]
+    for label, fn in variants:
+        data, ms = timed(fn, args.repeats)
+        rows.append({'path': label, 'encode_ms': round(ms, 1), 'json_bytes': json_bytes, 'image_bytes': len(data)})
+    print_table(rows)
+    print("\nGET responses are encoded once per (id, format, quality) and then served from cache / HTTP caches.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Gemini calls and insights latency with the canonical-pattern insights cache.
+
+Analyses are drawn from a small, skewed set of pattern combinations (as in
+production, where a handful such as double bottom + bullish engulfing
+dominate), each with fresh bboxes and jittered confidences. Gemini is
+replaced by a stub that sleeps ``--gemini-ms`` per call. Without the cache
+every analysis is a Gemini call; with it, only the first analysis of each
+canonical key is.
+
+    python -m benchmarks.bench_insights_cache
+"""
+import argparse
+import random
+import time
+
+from benchmarks._common import print_table, summarize_ms
+from utils.ai_insights import AIInsightsService, insights_cache
+
+PATTERNS = [
+    'double_bottom', 'double_top', 'bullish_engulfing', 'bearish_engulfing',
+    'head_and_shoulders', 'ascending_triangle', 'descending_triangle', 'cup_and_handle',
+]
+
+
+class StubGeminiInsights(AIInsightsService):
+    def __init__(self, latency_s: float) -> None:
+        super().__init__()
+        self.enabled = True
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _fetch_insights(self, prompt):
+        self.calls += 1
+        time.sleep(self.latency_s)
+        return {'summary': prompt[-80:], 'explanations': [], 'entry_signals': [], 'exit_signals': [],
+                'risk_management': [], 'confidence_notes': []}
+
+
+def pattern_stream(count: int, combos: int, seed: int):
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(combos):
+        names = rng.sample(PATTERNS, rng.randint(1, 3))
+        pool.append([(name, rng.uniform(0.35, 0.95)) for name in names])
+    # Zipf-like popularity: the first combinations dominate
+    weights = [1.0 / (i + 1) for i in range(combos)]
+    for _ in range(count):
+        combo = rng.choices(pool, weights)[0]
+        patterns = []
+        for name, confidence in combo:
+            x, y = rng.uniform(0, 800), rng.uniform(0, 500)
+            patterns.append({
+                'pattern': name,
+                'confidence': round(min(0.99, max(0.0, confidence + rng.uniform(-0.03, 0.03))), 3),
+                'bbox': [x, y, x + rng.uniform(40, 300), y + rng.uniform(40, 200)],
+            })
+        yield patterns
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--analyses', type=int, default=500)
+    parser.add_argument('--combinations', type=int, default=40)
+    parser.add_argument('--gemini-ms', type=float, default=20.0, help='Stub Gemini latency (real calls take seconds)')
+    args = parser.parse_args()
+
+    rows = []
+    for cached in (False, True):
+        service = StubGeminiInsights(args.gemini_ms / 1000.0)
+        insights_cache.local.clear()
+        insights_cache.local.enabled = cached
+        latencies = []
+        for patterns in pattern_stream(args.analyses, args.combinations, seed=0):
+            start = time.perf_counter()
+            service.generate_insights(patterns)
+            latencies.append(time.perf_counter() - start)
+        stats = insights_cache.stats()
+        rows.append(dict(
+            cache='on' if cached else 'off',
+            analyses=args.analyses,
+            gemini_calls=service.calls,
+            hit_rate=stats['hit_rate'] if cached else 0.0,
+            **summarize_ms(latencies),
+        ))
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Request-thread hold time: synchronous analysis vs the background job queue.
+
+A synthetic handler sleeps ``--work-ms`` to stand in for decode + YOLO +
+Gemini + Supabase. Requests against the synchronous route hold their thread
+for the whole analysis; job submissions only enqueue. The script also fills
+the queue to check that overflow is rejected immediately (503 path), and
+exits non-zero if submit p99 exceeds ``--max-submit-ms`` so it doubles as a
+regression guard.
+
+    python -m benchmarks.bench_jobs
+"""
+import argparse
+import sys
+import time
+
+from benchmarks._common import print_table, run_closed_loop, summarize_ms
+from utils.job_queue import JOB_DONE, Job, JobQueue, QueueFullError
+
+
+def make_handler(work_s: float):
+    def handler(job: Job, payload):
+        time.sleep(work_s)
+        job.add_event('detected', {'patterns_detected': []})
+        return {'ok': True}
+    return handler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--work-ms', type=float, default=300.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=32)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=4, help='requests per client')
+    parser.add_argument('--max-submit-ms', type=float, default=20.0)
+    args = parser.parse_args()
+    work_s = args.work_ms / 1000.0
+    handler = make_handler(work_s)
+
+    sync = run_closed_loop(lambda i: handler(Job(), None), args.concurrency, args.requests)
+
+    jobs = JobQueue(handler, workers=args.workers, max_queued=args.queue_size, ttl_seconds=60, name='bench_jobs')
+    submitted = []
+
+    def submit(i: int) -> None:
+        submitted.append(jobs.submit({'i': i}))
+
+    queued = run_closed_loop(submit, args.concurrency, args.requests)
+    drain_start = time.perf_counter()
+    for job in list(submitted):
+        while not job.finished:
+            time.sleep(0.01)
+    drain_s = time.perf_counter() - drain_start
+    done = sum(1 for j in submitted if j.status == JOB_DONE)
+
+    # Backpressure: a tiny queue with one slow worker must reject, not block
+    small = JobQueue(make_handler(1.0), workers=1, max_queued=2, ttl_seconds=60, name='bench_jobs_small')
+    reject_latencies, rejected = [], 0
+    for i in range(10):
+        start = time.perf_counter()
+        try:
+            small.submit({'i': i})
+        except QueueFullError:
+            rejected += 1
+        reject_latencies.append(time.perf_counter() - start)
+
+    rows = [
+        dict(mode='sync', requests=sync['requests'], **{k: sync[k] for k in ('p50_ms', 'p99_ms', 'max_ms')}),
+        dict(mode='job submit', requests=queued['requests'], **{k: queued[k] for k in ('p50_ms', 'p99_ms', 'max_ms')}),
+        dict(mode='overflow submit', requests=len(reject_latencies), **summarize_ms(reject_latencies)),
+    ]
+    print_table(rows)
+    print(f"jobs completed: {done}/{len(submitted)} (drained in {drain_s:.2f}s); overflow rejected: {rejected}/10")
+
+    if queued['p99_ms'] > args.max_submit_ms or done != len(submitted) or rejected == 0:
+        print(f"FAIL: submit p99 {queued['p99_ms']} ms (limit {args.max_submit_ms} ms), "
+              f"{done}/{len(submitted)} done, {rejected} rejected")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Throughput of /analyze-charts vs the same charts as sequential single uploads.
+
+The synthetic analyzer charges ``--call-ms`` per inference call plus
+``--image-ms`` per image (a batch pays the call overhead once), and the
+synthetic insights service sleeps ``--insights-ms`` per Gemini call.
+Annotation and image storage run for real.
+
+    python -m benchmarks.bench_multi_chart --charts 12
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault('CHART_IMAGE_STORE_DIR', tempfile.mkdtemp(prefix='bench_multi_chart_'))
+
+from benchmarks._common import print_table
+from benchmarks.bench_decode import synthetic_screenshot
+from utils.analysis_pipeline import iter_batch_analysis, start_analysis
+from utils.inference_profiles import InferenceProfile
+from utils.result_cache import analysis_cache
+
+PATTERN = {'pattern': 'double_bottom', 'confidence': 0.91, 'bbox': [120.0, 80.0, 640.0, 420.0]}
+
+
+class SyntheticBatchAnalyzer:
+    model_version = 'synthetic:0'
+    profile = InferenceProfile('synthetic', imgsz=640, conf=0.25, max_det=300, annotation_scale=1.0)
+    annotation_scale = 1.0
+
+    def __init__(self, call_s: float, image_s: float) -> None:
+        self.call_s = call_s
+        self.image_s = image_s
+        self.calls = 0
+
+    def detect_many(self, images):
+        self.calls += 1
+        time.sleep(self.call_s + self.image_s * len(images))
+        return [[dict(PATTERN)] for _ in images]
+
+    def detect_or_reuse(self, img_np):
+        return self.detect_many([img_np])[0]
+
+
+class SyntheticInsights:
+    def __init__(self, insights_s: float) -> None:
+        self.insights_s = insights_s
+        self.calls = 0
+
+    def generate_insights(self, patterns):
+        self.calls += 1
+        time.sleep(self.insights_s)
+        return {'summary': 'synthetic'}
+
+    def generate_combined_insights(self, charts):
+        return self.generate_insights([c['patterns'] for c in charts])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--charts', type=int, default=12)
+    parser.add_argument('--call-ms', type=float, default=120.0)
+    parser.add_argument('--image-ms', type=float, default=60.0)
+    parser.add_argument('--insights-ms', type=float, default=1500.0)
+    parser.add_argument('--size', default='1600x900')
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split('x'))
+
+    base = synthetic_screenshot(width, height)
+    images = []
+    for i in range(args.charts):
+        img = base.copy()
+        img[0, 0, 0] = i  # distinct pixels so the result cache never hits
+        images.append(img)
+    labels = [f'tf{i}' for i in range(args.charts)]
+
+    rows = []
+    analyzer = SyntheticBatchAnalyzer(args.call_ms / 1000.0, args.image_ms / 1000.0)
+    insights = SyntheticInsights(args.insights_ms / 1000.0)
+    analysis_cache.clear()
+    start = time.perf_counter()
+    for img in images:
+        start_analysis(img.copy(), 'http://localhost/', analyzer=analyzer, insights_service=insights).result()
+    wall = time.perf_counter() - start
+    rows.append(dict(mode='sequential singles', charts=args.charts, wall_s=round(wall, 2),
+                     charts_per_s=round(args.charts / wall, 2), inference_calls=analyzer.calls, gemini_calls=insights.calls))
+
+    analyzer = SyntheticBatchAnalyzer(args.call_ms / 1000.0, args.image_ms / 1000.0)
+    insights = SyntheticInsights(args.insights_ms / 1000.0)
+    analysis_cache.clear()
+    start = time.perf_counter()
+    first_chart = None
+    for stage, _ in iter_batch_analysis([img.copy() for img in images], labels, 'http://localhost/', analyzer=analyzer, insights_service=insights):
+        if first_chart is None:
+            first_chart = time.perf_counter() - start
+    wall = time.perf_counter() - start
+    rows.append(dict(mode='analyze-charts batch', charts=args.charts, wall_s=round(wall, 2),
+                     charts_per_s=round(args.charts / wall, 2), inference_calls=analyzer.calls, gemini_calls=insights.calls))
+    print_table(rows)
+    print(f"first chart line after {first_chart * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
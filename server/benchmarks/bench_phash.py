@@ -0,0 +1,134 @@
+"""Lookup latency, memory and persistence cost of the perceptual hash index.
+
+Also checks the thumbnail confirmation (recompressed / cropped / status-bar
+variants of a chart must be confirmed, other charts rejected) and that a
+``--max-entries`` ring stays at its size with the oldest entries gone.
+Exits 1 if either does not hold.
+
+    python -m benchmarks.bench_phash --entries 1000000 --distance 2
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks._common import percentile
+from utils.phash_index import PerceptualHashIndex, _correlation, dhash, phash, thumbnail
+
+
+def flip_bits(h: int, n: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), n):
+        h ^= 1 << bit
+    return h
+
+
+def candles(seed: int) -> np.ndarray:
+    import cv2
+    rng = np.random.default_rng(seed)
+    img = np.full((800, 1200, 3), 20, dtype=np.uint8)
+    closes = np.cumsum(rng.normal(0, 4, 120)) + 400
+    for i, c in enumerate(closes):
+        x = 10 + i * 9
+        o = closes[i - 1] if i else c
+        color = (0, 200, 0) if c >= o else (200, 0, 0)
+        cv2.rectangle(img, (x, int(min(o, c))), (x + 6, int(max(o, c)) + 1), color, -1)
+    return img
+
+
+def robustness_check(min_correlation: float) -> list:
+    """Hash distance and thumbnail correlation between a synthetic chart and its variants / other charts."""
+    import cv2
+    img = candles(0)
+    ok, jpg = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 40])
+    variants = {
+        'jpeg_q40': cv2.imdecode(jpg, cv2.IMREAD_COLOR)[:, :, ::-1],
+        'crop_2pct': img[16:-16, 24:-24],
+        'status_bar': np.vstack([np.full((40, 1200, 3), 255, np.uint8), img[40:]]),
+    }
+    for name, fn in (('dhash', dhash), ('phash', phash)):
+        base = fn(img)
+        dists = {k: (fn(np.ascontiguousarray(v)) ^ base).bit_count() for k, v in variants.items()}
+        print(f"{name}: {dists}")
+
+    failures = []
+    base = thumbnail(img)
+    same = {k: round(_correlation(thumbnail(np.ascontiguousarray(v)), base), 3) for k, v in variants.items()}
+    other = max(_correlation(thumbnail(candles(seed)), base) for seed in range(1, 50))
+    print(f"thumbnail correlation: {same}; best of 49 other charts: {other:.3f} (threshold {min_correlation})")
+    failures += [f"{k} variant not confirmed" for k, v in same.items() if v < min_correlation]
+    if other >= min_correlation:
+        failures.append('a different chart passed the thumbnail check')
+    return failures
+
+
+def eviction_check(max_entries: int) -> list:
+    index = PerceptualHashIndex(max_distance=0, max_entries=max_entries)
+    for h in range(3 * max_entries):
+        index.add(h << 16, h)
+    kept = [h for h in range(3 * max_entries) if index.lookup(h << 16) is not None]
+    print(f"ring of {max_entries}: {len(index)} entries after {3 * max_entries} adds, oldest kept {kept[0] if kept else None}")
+    if len(index) != max_entries or kept != list(range(2 * max_entries, 3 * max_entries)):
+        return ['eviction does not keep exactly the newest max_entries']
+    return []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=10_000)
+    parser.add_argument('--distance', type=int, default=2)
+    parser.add_argument('--max-entries', type=int, default=1000, help='Ring size for the eviction check')
+    parser.add_argument('--min-correlation', type=float, default=0.9)
+    args = parser.parse_args()
+
+    failures = robustness_check(args.min_correlation) + eviction_check(args.max_entries)
+
+    rng = random.Random(42)
+    index = PerceptualHashIndex(max_distance=args.distance, model_version='bench')
+    payload = [['double_bottom', 0.91, 0.1, 0.2, 0.5, 0.8]]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    hashes = [rng.getrandbits(64) for _ in range(args.entries)]
+    for h in hashes:
+        index.add(h, payload)
+    build_s = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"built {len(index)} entries in {build_s:.1f}s, ~{(rss_after - rss_before) / 1024:.0f} MB RSS growth")
+
+    hit_lat, miss_lat, found = [], [], 0
+    for i in range(args.queries):
+        target = flip_bits(hashes[rng.randrange(len(hashes))], rng.randint(0, args.distance), rng)
+        t = time.perf_counter()
+        if index.lookup(target) is not None:
+            found += 1
+        hit_lat.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        index.lookup(rng.getrandbits(64))
+        miss_lat.append(time.perf_counter() - t)
+    print(f"near-duplicate recall: {found / args.queries:.4f}")
+    for label, lat in (('near-dup lookup', hit_lat), ('random lookup', miss_lat)):
+        us = [v * 1e6 for v in lat]
+        print(f"{label}: p50 {percentile(us, 50):.1f}us  p99 {percentile(us, 99):.1f}us")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'phash.idx')
+        t = time.perf_counter()
+        index.save(path)
+        save_s = time.perf_counter() - t
+        reloaded = PerceptualHashIndex(max_distance=args.distance, model_version='bench')
+        t = time.perf_counter()
+        reloaded.load(path)
+        print(f"save {save_s:.1f}s, load {time.perf_counter() - t:.1f}s, file {os.path.getsize(path) / 1e6:.0f} MB")
+
+    if failures:
+        print("FAIL:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Per-profile inference latency and single-core throughput.
+
+Builds one backend per inference profile (CHART_PROFILE_* settings) from the
+given weights and times ``predict`` on synthetic chart screenshots, so the
+cost of the accurate tier relative to the fast tier is visible per core.
+
+    python -m benchmarks.bench_profiles --model model.pt
+"""
+import argparse
+import time
+
+from benchmarks._common import print_table, summarize_ms
+from benchmarks.bench_decode import synthetic_screenshot
+from utils.inference_backends import create_backend
+from utils.inference_profiles import PROFILES
+from utils.yolo_service import get_model_version
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', required=True)
+    parser.add_argument('--backend', help='Override CHART_BACKEND')
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--size', default='1600x900')
+    parser.add_argument('--threads', type=int, default=1, help='torch / onnxruntime intra-op threads')
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split('x'))
+
+    try:
+        import torch
+        torch.set_num_threads(args.threads)
+    except ImportError:
+        pass
+    import os
+    os.environ.setdefault('CHART_ORT_INTRA_THREADS', str(args.threads))
+
+    version = get_model_version(args.model)
+    image = synthetic_screenshot(width, height)
+    rows = []
+    for name, profile in PROFILES.items():
+        backend = create_backend(args.model, version, backend=args.backend,
+                                 imgsz=profile.imgsz, conf=profile.conf, max_det=profile.max_det)
+        backend.predict([image])  # warm-up
+        latencies = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            backend.predict([image])
+            latencies.append(time.perf_counter() - start)
+        total = sum(latencies)
+        rows.append(dict(profile=name, imgsz=profile.imgsz, conf=profile.conf, max_det=profile.max_det,
+                         images_per_s=round(args.runs / total, 2), **summarize_ms(latencies)))
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Throughput scaling with the number of in-process model replicas.
+
+Each replica serves one call at a time on its own thread. The synthetic
+backend does NumPy matrix products (which release the GIL, like torch and
+onnxruntime kernels); with ``--model`` the real CHART_BACKEND is used, with
+``--threads`` intra-op threads per replica (default: cores / replicas).
+Run on a many-core box: throughput should grow with replicas until cores
+are used up, and queue wait shows requests waiting for a free replica.
+
+    python -m benchmarks.bench_replicas --replicas 1,2,4,8 --concurrency 16
+"""
+import argparse
+import functools
+import os
+
+import numpy as np
+
+from benchmarks._common import print_table, run_closed_loop
+from benchmarks.bench_decode import synthetic_screenshot
+from utils.inference_backends import Detections, create_backend
+from utils.metrics import metrics
+from utils.replica_pool import ReplicaPool
+
+
+class MatmulBackend:
+    names = {0: 'pattern'}
+
+    def __init__(self, size: int, rounds: int) -> None:
+        self.a = np.random.default_rng(0).random((size, size), dtype=np.float32)
+        self.rounds = rounds
+
+    def predict(self, images):
+        out = []
+        for _ in images:
+            x = self.a
+            for _ in range(self.rounds):
+                x = np.tanh(x @ self.a)
+            out.append(Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64)))
+        return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Real .pt model (default: synthetic backend)')
+    parser.add_argument('--replicas', default='1,2,4')
+    parser.add_argument('--threads', type=int, default=0, help='Intra-op threads per replica (0: cores / replicas)')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=10, help='Requests per client thread')
+    parser.add_argument('--size', type=int, default=384, help='Synthetic matrix size')
+    parser.add_argument('--rounds', type=int, default=8, help='Synthetic matrix products per image')
+    args = parser.parse_args()
+
+    image = synthetic_screenshot(1280, 720)
+    rows = []
+    for replicas in (int(r) for r in args.replicas.split(',')):
+        threads = args.threads or max(1, (os.cpu_count() or 1) // replicas)
+        if args.model:
+            from utils.yolo_service import get_model_version
+            factory = functools.partial(create_backend, args.model, get_model_version(args.model), intra_threads=threads)
+        else:
+            factory = functools.partial(MatmulBackend, args.size, args.rounds)
+        name = f'bench_replicas_{replicas}'
+        pool = ReplicaPool(factory, replicas=replicas, intra_threads=threads, name=name)
+        pool.predict([image])  # warm-up
+        result = run_closed_loop(lambda i: pool.predict([image]), args.concurrency, args.requests)
+        wait = metrics.snapshot()['timings'].get(f'{name}.queue_wait', {})
+        rows.append(dict(replicas=replicas, threads=threads, **result,
+                         wait_p50_ms=wait.get('p50_ms'), wait_p99_ms=wait.get('p99_ms')))
+        pool.close()
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
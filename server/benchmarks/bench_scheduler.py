@@ -0,0 +1,201 @@
+"""Simulated overload of the inference scheduler: premium latency SLO and fair share.
+
+Requests arrive open-loop at ``--overload`` times the capacity of
+``--slots`` slots that each take ``--service-ms`` per request (a sleep
+stands in for inference). Traffic is mostly free-tier, with a single
+heavy free user sending half of it, plus anonymous and a small share of
+premium requests. The same arrivals are replayed through a plain FIFO
+(every request in one class) and through the priority scheduler.
+
+With priority scheduling, premium p99 should stay within
+``--premium-slo-ms`` while FIFO blows past it, and light free users should
+not wait behind the heavy user's backlog.
+
+The same arrivals are then sent through ``start_analysis`` with the
+global scheduler, while every request's insights stage (a ``--insights-ms``
+sleep) keeps the shared stage pool saturated. Premium time to detections
+must still meet the SLO there. Exits 1 if either premium check fails.
+
+    python -m benchmarks.bench_scheduler
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+os.environ.setdefault('ANALYSIS_SCHED_SLOTS', '2')
+os.environ.setdefault('CHART_IMAGE_STORE_DIR', tempfile.mkdtemp(prefix='bench_scheduler_'))
+
+import numpy as np
+
+from benchmarks._common import print_table, summarize_ms
+from benchmarks.bench_streaming import SyntheticAnalyzer, SyntheticInsights
+from utils.analysis_pipeline import STAGE_DETECTED, stage_executor, start_analysis
+from utils.inference_scheduler import (
+    ANONYMOUS,
+    FREE,
+    PREMIUM,
+    Priority,
+    PriorityScheduler,
+    SchedulerDeadlineError,
+    inference_scheduler,
+)
+
+
+def arrivals(rate: float, seconds: float, seed: int) -> List[Tuple[float, Priority, str]]:
+    """(offset_s, priority, group) for a Poisson arrival stream with the mix described above."""
+    rng = random.Random(seed)
+    out, t = [], 0.0
+    while True:
+        t += rng.expovariate(rate)
+        if t >= seconds:
+            return out
+        roll = rng.random()
+        if roll < 0.1:
+            out.append((t, Priority(PREMIUM, f'p{rng.randrange(5)}'), 'premium'))
+        elif roll < 0.45:
+            out.append((t, Priority(FREE, 'heavy'), 'free (heavy user)'))
+        elif roll < 0.8:
+            out.append((t, Priority(FREE, f'f{rng.randrange(30)}'), 'free (others)'))
+        else:
+            out.append((t, Priority(ANONYMOUS, f'ip{rng.randrange(50)}'), 'anonymous'))
+
+
+def simulate(schedule, scheduler: PriorityScheduler, service_s: float, fifo: bool) -> Dict[str, dict]:
+    results: Dict[str, List[float]] = defaultdict(list)
+    dropped: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    def request(priority: Priority, group: str) -> None:
+        start = time.perf_counter()
+        try:
+            with scheduler.slot(Priority(FREE, 'all') if fifo else priority):
+                time.sleep(service_s)
+        except SchedulerDeadlineError:
+            with lock:
+                dropped[group] += 1
+            return
+        with lock:
+            results[group].append(time.perf_counter() - start)
+
+    threads = []
+    t0 = time.perf_counter()
+    for offset, priority, group in schedule:
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        thread = threading.Thread(target=request, args=(priority, group))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    groups = sorted(set(results) | set(dropped))
+    return {
+        group: dict(served=len(results[group]), dropped=dropped[group], **summarize_ms(results[group]))
+        for group in groups
+    }
+
+
+def simulate_pipeline(schedule, service_s: float, insights_s: float) -> Dict[str, dict]:
+    """Replay ``schedule`` through start_analysis; latency is time to the detected stage."""
+    analyzer = SyntheticAnalyzer(service_s)
+    insights = SyntheticInsights(insights_s)
+    results: Dict[str, List[float]] = defaultdict(list)
+    dropped: Dict[str, int] = defaultdict(int)
+    lock = threading.Lock()
+
+    def request(index: int, priority: Priority, group: str) -> None:
+        # Distinct pixels per request so the result cache never hits
+        img = np.zeros((32, 32, 3), dtype=np.uint8)
+        img.flat[:4] = np.frombuffer(index.to_bytes(4, 'little'), dtype=np.uint8)
+        start = time.perf_counter()
+        try:
+            run = start_analysis(img, 'http://localhost/', analyzer=analyzer, insights_service=insights, priority=priority)
+            run.stage_run.result(STAGE_DETECTED)
+        except SchedulerDeadlineError:
+            with lock:
+                dropped[group] += 1
+            return
+        with lock:
+            results[group].append(time.perf_counter() - start)
+
+    threads = []
+    t0 = time.perf_counter()
+    for index, (offset, priority, group) in enumerate(schedule):
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        thread = threading.Thread(target=request, args=(index, priority, group))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    groups = sorted(set(results) | set(dropped))
+    return {
+        group: dict(served=len(results[group]), dropped=dropped[group], **summarize_ms(results[group]))
+        for group in groups
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--slots', type=int, default=2)
+    parser.add_argument('--service-ms', type=float, default=20.0)
+    parser.add_argument('--overload', type=float, default=2.0, help='Offered load as a multiple of capacity')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--deadline-s', type=float, default=1.5, help='Queue deadline for every class')
+    parser.add_argument('--premium-slo-ms', type=float, default=250.0)
+    parser.add_argument('--insights-ms', type=float, default=150.0, help='Insights stage time in the start_analysis run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    service_s = args.service_ms / 1000.0
+    capacity = args.slots / service_s
+    failed = False
+    schedule = arrivals(capacity * args.overload, args.seconds, args.seed)
+    print(f"capacity {capacity:.0f} req/s, offered {capacity * args.overload:.0f} req/s, {len(schedule)} requests\n")
+
+    rows = []
+    premium_p99 = None
+    for policy in ('fifo', 'priority'):
+        scheduler = PriorityScheduler(
+            args.slots,
+            deadlines_s={cls: args.deadline_s for cls in (PREMIUM, FREE, ANONYMOUS)},
+            name=f'bench_scheduler_{policy}',
+        )
+        for group, row in simulate(schedule, scheduler, service_s, fifo=policy == 'fifo').items():
+            rows.append(dict(policy=policy, group=group, **row))
+            if policy == 'priority' and group == 'premium':
+                premium_p99 = row['p99_ms']
+    print_table(rows)
+
+    print(f"\npremium p99 with priority scheduling: {premium_p99} ms (SLO {args.premium_slo_ms:.0f} ms)")
+    if premium_p99 is None or premium_p99 > args.premium_slo_ms:
+        print("FAIL: premium SLO missed")
+        failed = True
+
+    # Same arrivals through the analysis pipeline, sized like the direct run
+    inference_scheduler.deadlines_s = {cls: args.deadline_s for cls in (PREMIUM, FREE, ANONYMOUS)}
+    schedule = arrivals(inference_scheduler.slots / service_s * args.overload, args.seconds, args.seed)
+    print(
+        f"\nstart_analysis: {inference_scheduler.slots} slots, {len(schedule)} requests, insights keep "
+        f"{len(schedule) / args.seconds * args.insights_ms / 1000.0:.0f} of {stage_executor._max_workers} stage threads busy\n"
+    )
+    rows = simulate_pipeline(schedule, service_s, args.insights_ms / 1000.0)
+    print_table([dict(group=group, **row) for group, row in rows.items()])
+    pipeline_p99 = rows.get('premium', {}).get('p99_ms')
+    print(f"\npremium p99 to detections through start_analysis: {pipeline_p99} ms (SLO {args.premium_slo_ms:.0f} ms)")
+    if pipeline_p99 is None or pipeline_p99 > args.premium_slo_ms:
+        print("FAIL: premium SLO missed through start_analysis")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""Coalescing of identical in-flight Gemini calls (single-flight).
+
+``--callers`` threads ask for insights on the same pattern set at the
+same moment, the way uploads of a chart that is doing the rounds arrive.
+Gemini is replaced by a stub that sleeps ``--gemini-ms`` and counts calls.
+The insights cache is switched off so only coalescing is measured. Cases:
+
+- insights without single-flight: one upstream call per caller;
+- insights with it: exactly one upstream call, shared by everyone;
+- insights when that one call fails: one call, every caller gets the
+  fallback;
+- ``ask`` without history: one call. With history, calls are not coalesced.
+
+A follower whose leader takes longer than the flight timeout must get
+SingleFlightTimeout. Exits 1 if any of this does not hold.
+
+    python -m benchmarks.bench_single_flight
+"""
+import argparse
+import sys
+import threading
+import time
+from typing import Callable, List
+
+from benchmarks._common import print_table, summarize_ms
+from utils import ai_insights
+from utils.ai_insights import AIInsightsService, ChatService, SingleFlight, SingleFlightTimeout, insights_cache
+
+PATTERNS = [
+    {'pattern': 'double_bottom', 'confidence': 0.82, 'bbox': [10, 20, 200, 180]},
+    {'pattern': 'bullish_engulfing', 'confidence': 0.64, 'bbox': [220, 40, 260, 120]},
+]
+
+
+class StubInsights(AIInsightsService):
+    def __init__(self, latency_s: float, fail: bool = False) -> None:
+        super().__init__()
+        self.enabled = True
+        self.latency_s = latency_s
+        self.fail = fail
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _fetch_insights(self, prompt):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_s)
+        if self.fail:
+            raise RuntimeError('Gemini 500')
+        return {key: ([] if key != 'summary' else 'ok') for key in ai_insights.INSIGHT_KEYS}
+
+
+class StubChat(ChatService):
+    def __init__(self, latency_s: float) -> None:
+        super().__init__()
+        self.enabled = True
+        self.latency_s = latency_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _ask(self, message, context, history, web_search, summary=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_s)
+        return {'text': f"answer to {message}", 'title': None}
+
+
+class NoFlight:
+    def do(self, key, fn):
+        return fn()
+
+
+def burst(callers: int, fn: Callable[[], object]) -> tuple[List[float], List[object]]:
+    """Run ``fn`` from ``callers`` threads released together; (latencies, results)."""
+    barrier = threading.Barrier(callers)
+    latencies: List[float] = []
+    results: List[object] = []
+    lock = threading.Lock()
+
+    def run() -> None:
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            result = e
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            results.append(result)
+
+    threads = [threading.Thread(target=run) for _ in range(callers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, default=50)
+    parser.add_argument('--gemini-ms', type=float, default=200.0)
+    args = parser.parse_args()
+    latency_s = args.gemini_ms / 1000.0
+    insights_cache.local.enabled = False
+
+    rows, failures = [], []
+
+    def record(case: str, calls: int, expected: int | None, latencies: List[float]) -> None:
+        rows.append(dict(case=case, callers=args.callers, upstream_calls=calls, **summarize_ms(latencies)))
+        if expected is not None and calls != expected:
+            failures.append(f"{case}: {calls} upstream calls, expected {expected}")
+
+    flight = ai_insights.insights_flight
+    ai_insights.insights_flight = NoFlight()
+    service = StubInsights(latency_s)
+    latencies, _ = burst(args.callers, lambda: service.generate_insights(PATTERNS))
+    record('insights, no single-flight', service.calls, args.callers, latencies)
+    ai_insights.insights_flight = flight
+
+    before = flight.stats()['coalesced']
+    service = StubInsights(latency_s)
+    latencies, results = burst(args.callers, lambda: service.generate_insights(PATTERNS))
+    record('insights', service.calls, 1, latencies)
+    if flight.stats()['coalesced'] - before != args.callers - 1:
+        failures.append('insights: coalesced counter does not match')
+    if any(r.get('summary') != 'ok' for r in results):
+        failures.append('insights: a caller did not get the shared result')
+
+    service = StubInsights(latency_s, fail=True)
+    latencies, results = burst(args.callers, lambda: service.generate_insights(PATTERNS))
+    record('insights, upstream error', service.calls, 1, latencies)
+    if any('unavailable' not in r.get('summary', '') for r in results):
+        failures.append('insights error: a caller did not get the fallback')
+
+    chat = StubChat(latency_s)
+    latencies, results = burst(args.callers, lambda: chat.ask('Is this a double bottom?'))
+    record('ask', chat.calls, 1, latencies)
+    if any(r.get('text') != 'answer to Is this a double bottom?' for r in results):
+        failures.append('ask: a caller did not get the shared answer')
+
+    chat = StubChat(latency_s)
+    history = [{'role': 'user', 'message': 'hi'}]
+    latencies, _ = burst(args.callers, lambda: chat.ask('Is this a double bottom?', history=history))
+    record('ask with history', chat.calls, args.callers, latencies)
+
+    short = SingleFlight('bench_timeout', timeout_s=latency_s / 4)
+    _, results = burst(args.callers, lambda: short.do('k', lambda: time.sleep(latency_s) or 'late'))
+    timeouts = sum(isinstance(r, SingleFlightTimeout) for r in results)
+    if timeouts != args.callers - 1 or results.count('late') != 1:
+        failures.append(f"timeout: {timeouts} of {args.callers - 1} followers timed out")
+
+    print_table(rows)
+    print(f"\nsingleflight counters: {ai_insights.insights_flight.stats()} / {ai_insights.chat_flight.stats()}")
+    if failures:
+        print("FAIL:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Wall-clock time of analyze-chart: sequential stages vs the stage graph.
+
+Synthetic stand-ins sleep for detection (``--detect-ms``), the Gemini
+insights call (``--insights-ms``) and the analysis_history insert
+(``--persist-ms``); annotation, image storage and the JWT check run for real.
+Sequentially the request pays for every stage. With the graph, annotation
+overlaps insights, the JWT check overlaps both, and the insert leaves the
+critical path.
+
+    python -m benchmarks.bench_stages
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault('CHART_IMAGE_STORE_DIR', tempfile.mkdtemp(prefix='bench_stages_'))
+
+import jwt
+
+from benchmarks._common import print_table, summarize_ms
+from benchmarks.bench_decode import synthetic_screenshot
+from benchmarks.bench_streaming import SyntheticAnalyzer, SyntheticInsights
+from utils.analysis_pipeline import annotated_image_url, stage_executor, start_analysis
+from utils.annotation import render_annotations
+from utils.image_store import image_store
+from utils.result_cache import analysis_cache
+
+SECRET = 'bench-secret-for-hs256-signing-only'
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detect-ms', type=float, default=250.0)
+    parser.add_argument('--insights-ms', type=float, default=1500.0)
+    parser.add_argument('--persist-ms', type=float, default=150.0)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--size', default='1600x900')
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split('x'))
+
+    analyzer = SyntheticAnalyzer(args.detect_ms / 1000.0)
+    insights = SyntheticInsights(args.insights_ms / 1000.0)
+    token = jwt.encode({'user_id': 'bench-user'}, SECRET, algorithm='HS256')
+
+    def verify():
+        return jwt.decode(token, SECRET, algorithms=['HS256'])['user_id']
+
+    def persist(user_id, payload):
+        time.sleep(args.persist_ms / 1000.0)
+
+    sequential, graph = [], []
+    stage_totals: dict = {}
+    for i in range(args.runs):
+        img = synthetic_screenshot(width, height)
+        img[0, 0, 0] = i  # distinct pixels per run so the result cache never hits
+
+        start = time.perf_counter()
+        patterns = analyzer.detect_or_reuse(img)
+        result = insights.generate_insights(patterns)
+        image_id = image_store.put(render_annotations(img.copy(), patterns))
+        payload = {'patterns_detected': patterns, 'annotated_image': annotated_image_url(image_id, 'http://localhost/'), 'insights': result}
+        persist(verify(), payload)
+        sequential.append(time.perf_counter() - start)
+
+        analysis_cache.clear()
+        start = time.perf_counter()
+        run = start_analysis(img, 'http://localhost/', analyzer=analyzer, insights_service=insights)
+        user_id = verify()
+        payload = run.result()
+        stage_executor.submit(persist, user_id, payload)
+        graph.append(time.perf_counter() - start)
+        for name, seconds in run.stage_run.timings.items():
+            stage_totals.setdefault(name, []).append(seconds)
+
+    print_table([
+        dict(pipeline='sequential', **summarize_ms(sequential)),
+        dict(pipeline='stage graph', **summarize_ms(graph)),
+    ])
+    print()
+    print_table([dict(stage=name, **summarize_ms(values)) for name, values in stage_totals.items()])
+
+
+if __name__ == '__main__':
+    main()
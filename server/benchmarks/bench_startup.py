@@ -0,0 +1,74 @@
+"""Process startup cost and first-request latency, lazy vs eager model loading.
+
+Each mode runs in a fresh subprocess. ``lazy`` is the old behaviour: the
+first analysis pays for the imports, the weight load and first-inference
+graph setup. ``eager`` runs the startup warm-up (every profile, synthetic
+frames at each profile size) before the first request, which is what
+/api/ready waits for.
+
+    python -m benchmarks.bench_startup --model model.pt
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def run_worker(mode: str) -> None:
+    start = time.perf_counter()
+    from benchmarks.bench_decode import synthetic_screenshot
+    from utils.inference_profiles import FREE_PROFILE
+    from utils.model_warmup import readiness, warm_up_models
+    from utils.yolo_service import get_chart_analyzer
+    imported = time.perf_counter()
+
+    if mode == 'eager':
+        warm_up_models()
+        if not readiness.ready:
+            raise SystemExit(f"warm-up failed: {readiness.error}")
+    ready = time.perf_counter()
+
+    image = synthetic_screenshot(1600, 900)
+    latencies = []
+    for _ in range(3):
+        t0 = time.perf_counter()
+        get_chart_analyzer(FREE_PROFILE).predict_batch([image])
+        latencies.append(time.perf_counter() - t0)
+    print(json.dumps({
+        'mode': mode,
+        'import_s': round(imported - start, 2),
+        'ready_s': round(ready - start, 2),
+        'first_request_ms': round(latencies[0] * 1000, 1),
+        'second_request_ms': round(latencies[1] * 1000, 1),
+        'third_request_ms': round(latencies[2] * 1000, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('CHART_MODEL_PATH', 'model.pt'))
+    parser.add_argument('--modes', default='lazy,eager')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker)
+        return
+
+    from benchmarks._common import print_table
+
+    env = dict(os.environ, CHART_MODEL_PATH=args.model)
+    rows = []
+    for mode in args.modes.split(','):
+        proc = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_startup', '--worker', mode],
+            capture_output=True, text=True, check=True, env=env,
+        )
+        rows.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Time to first useful byte: buffered analyze-chart vs the NDJSON stream.
+
+A synthetic analyzer and insights service sleep ``--detect-ms`` and
+``--insights-ms`` (defaults roughly match YOLO on CPU and a Gemini round
+trip); annotation and image storage run for real. The buffered route can
+only answer once every stage is done, while the stream delivers detections
+as soon as they exist.
+
+    python -m benchmarks.bench_streaming --insights-ms 2500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+os.environ.setdefault('CHART_IMAGE_STORE_DIR', tempfile.mkdtemp(prefix='bench_streaming_'))
+
+from benchmarks._common import print_table, summarize_ms
+from benchmarks.bench_decode import synthetic_screenshot
+from utils.analysis_pipeline import STAGE_ANNOTATED, STAGE_DETECTED, iter_analysis
+from utils.inference_profiles import InferenceProfile
+from utils.result_cache import analysis_cache
+
+
+class SyntheticAnalyzer:
+    model_version = 'synthetic:0'
+    profile = InferenceProfile('synthetic', imgsz=640, conf=0.25, max_det=300, annotation_scale=1.0)
+    annotation_scale = 1.0
+
+    def __init__(self, detect_s: float) -> None:
+        self.detect_s = detect_s
+
+    def detect_or_reuse(self, img_np):
+        time.sleep(self.detect_s)
+        return [{'pattern': 'double_bottom', 'confidence': 0.91, 'bbox': [120.0, 80.0, 640.0, 420.0]}]
+
+
+class SyntheticInsights:
+    def __init__(self, insights_s: float) -> None:
+        self.insights_s = insights_s
+
+    def generate_insights(self, patterns):
+        time.sleep(self.insights_s)
+        return {'summary': 'synthetic', 'explanations': []}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detect-ms', type=float, default=250.0)
+    parser.add_argument('--insights-ms', type=float, default=1500.0)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--size', default='1600x900')
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split('x'))
+
+    analyzer = SyntheticAnalyzer(args.detect_ms / 1000.0)
+    insights = SyntheticInsights(args.insights_ms / 1000.0)
+    first, annotated, total = [], [], []
+    for _ in range(args.runs):
+        analysis_cache.clear()
+        img = synthetic_screenshot(width, height)
+        start = time.perf_counter()
+        for stage, _ in iter_analysis(img, 'http://localhost/', analyzer=analyzer, insights_service=insights):
+            now = time.perf_counter() - start
+            if stage == STAGE_DETECTED:
+                first.append(now)
+            elif stage == STAGE_ANNOTATED:
+                annotated.append(now)
+        total.append(time.perf_counter() - start)
+
+    rows = [
+        dict(response='buffered (analyze-chart)', milestone='first byte', **summarize_ms(total)),
+        dict(response='stream (analyze-chart-stream)', milestone='detections', **summarize_ms(first)),
+        dict(response='stream (analyze-chart-stream)', milestone='annotated image', **summarize_ms(annotated)),
+        dict(response='stream (analyze-chart-stream)', milestone='insights (last)', **summarize_ms(total)),
+    ]
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
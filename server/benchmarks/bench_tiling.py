@@ -0,0 +1,126 @@
+"""Tiled vs whole-image inference on wide charts: tiles/s and recall.
+
+By default a synthetic detector stands in for YOLO: it finds the red pattern
+markers drawn on a wide synthetic chart, but only those at least
+``--min-px`` tall after the image is letterboxed to ``--imgsz``, which is
+how small patterns vanish when a 5:1 screenshot is squashed. With
+``--model`` and ``--data`` (YOLO-layout labelled folder) the real backend
+is evaluated on the labelled charts the planner would tile.
+
+    python -m benchmarks.bench_tiling --width 5000 --height 1000
+    python -m benchmarks.bench_tiling --model model.pt --data wide_charts/
+"""
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks._common import print_table
+from benchmarks._eval import evaluate, load_labelled_folder
+from benchmarks.bench_decode import synthetic_screenshot
+from utils.inference_backends import Detections, create_backend
+from utils.tiling import TilePlanner
+
+
+class SyntheticMarkerBackend:
+    """Detects pure-red rectangles that stay at least ``min_px`` tall at model input size."""
+
+    names = {0: 'pattern'}
+
+    def __init__(self, imgsz: int, min_px: float, cost_ms: float) -> None:
+        self.imgsz = imgsz
+        self.min_px = min_px
+        self.cost_s = cost_ms / 1000.0
+
+    def predict(self, images):
+        out = []
+        for img in images:
+            time.sleep(self.cost_s)
+            mask = ((img[:, :, 0] > 200) & (img[:, :, 1] < 60) & (img[:, :, 2] < 60)).astype(np.uint8)
+            n, _, stats, _ = cv2.connectedComponentsWithStats(mask)
+            scale = self.imgsz / max(img.shape[:2])
+            boxes = [
+                [x, y, x + w, y + h]
+                for x, y, w, h, _ in stats[1:n]
+                if min(w, h) * scale >= self.min_px
+            ]
+            xyxy = np.asarray(boxes, np.float32).reshape(-1, 4)
+            out.append(Detections(xyxy, np.full(len(xyxy), 0.9, np.float32), np.zeros(len(xyxy), np.int64)))
+        return out
+
+
+def synthetic_wide_chart(width: int, height: int, markers: int, marker_px: int, seed: int):
+    rng = np.random.default_rng(seed)
+    img = synthetic_screenshot(width, height)
+    boxes = []
+    for _ in range(markers):
+        w = int(marker_px * rng.uniform(1.0, 2.5))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - marker_px))
+        img[y:y + marker_px, x:x + w] = (255, 0, 0)
+        boxes.append([x, y, x + w, y + marker_px])
+    return img, np.asarray(boxes, np.float32), np.zeros(len(boxes), np.int64)
+
+
+def run(backend, planner: TilePlanner, samples):
+    whole_preds, tiled_preds = [], []
+    whole_s = tiled_s = 0.0
+    tiles = 0
+    for img, _, _ in samples:
+        start = time.perf_counter()
+        whole_preds.append(backend.predict([img])[0])
+        whole_s += time.perf_counter() - start
+
+        windows = planner.windows(img.shape[1], img.shape[0]) or [(0, 0, img.shape[1], img.shape[0])]
+        start = time.perf_counter()
+        dets = backend.predict(planner.crops(img, windows))
+        tiled_preds.append(planner.merge(dets, windows))
+        tiled_s += time.perf_counter() - start
+        tiles += len(windows)
+    gt = [(boxes, cls) for _, boxes, cls in samples]
+    whole_report, tiled_report = evaluate(whole_preds, gt), evaluate(tiled_preds, gt)
+    recall = lambda report: round(float(np.mean([r['recall'] for r in report.values()])) if report else 0.0, 4)
+    return [
+        dict(mode='whole image', images=len(samples), inputs=len(samples), inputs_per_s=round(len(samples) / whole_s, 1),
+             ms_per_image=round(whole_s / len(samples) * 1000, 1), recall=recall(whole_report)),
+        dict(mode='tiled', images=len(samples), inputs=tiles, inputs_per_s=round(tiles / tiled_s, 1),
+             ms_per_image=round(tiled_s / len(samples) * 1000, 1), recall=recall(tiled_report)),
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Real .pt model (requires --data)')
+    parser.add_argument('--data', help='YOLO-layout labelled folder of wide charts')
+    parser.add_argument('--width', type=int, default=5000)
+    parser.add_argument('--height', type=int, default=1000)
+    parser.add_argument('--images', type=int, default=5)
+    parser.add_argument('--markers', type=int, default=20)
+    parser.add_argument('--marker-px', type=int, default=40)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--min-px', type=float, default=12.0)
+    parser.add_argument('--cost-ms', type=float, default=30.0, help='Synthetic cost per model input')
+    parser.add_argument('--min-aspect', type=float, default=2.0)
+    parser.add_argument('--overlap', type=float, default=0.2)
+    args = parser.parse_args()
+
+    planner = TilePlanner(min_aspect=args.min_aspect, overlap=args.overlap)
+    if args.model:
+        if not args.data:
+            parser.error('--model requires --data')
+        from utils.yolo_service import get_model_version
+        backend = create_backend(args.model, get_model_version(args.model))
+        samples = [(img, boxes, cls) for _, img, boxes, cls in load_labelled_folder(args.data)
+                   if planner.windows(img.shape[1], img.shape[0])]
+        if not samples:
+            raise SystemExit('No labelled charts in --data meet the tiling threshold')
+    else:
+        backend = SyntheticMarkerBackend(args.imgsz, args.min_px, args.cost_ms)
+        samples = [synthetic_wide_chart(args.width, args.height, args.markers, args.marker_px, seed)
+                   for seed in range(args.images)]
+    print_table(run(backend, planner, samples))
+
+
+if __name__ == '__main__':
+    main()
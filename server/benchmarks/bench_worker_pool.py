@@ -0,0 +1,153 @@
+"""In-process inference vs the shared-memory worker process pool.
+
+The synthetic backend burns CPU in Python (holding the GIL), standing in for
+the parts of inference that serialize Flask request threads. With
+``--model`` the real backend from CHART_BACKEND is used instead.
+
+Afterwards every worker of a pool is killed mid-task, with replacements made
+to fail loading until released: the task must fail with WorkerDiedError within
+a couple of seconds (not after the task timeout), a call made while no worker
+is up must fail at once rather than queue, and once loading is allowed again
+the retried replacements must serve the next call. Exits 1 otherwise.
+
+    python -m benchmarks.bench_worker_pool --workers 4 --concurrency 8
+"""
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks._common import print_table, run_closed_loop
+from utils.inference_backends import Detections, create_backend
+from utils.inference_pool import InferenceWorkerPool, WorkerDiedError
+
+
+class SyntheticBackend:
+    names = {0: 'pattern'}
+
+    def __init__(self, work: int) -> None:
+        self.work = work
+
+    def predict(self, images):
+        out = []
+        for img in images:
+            acc = 0
+            for i in range(self.work):
+                acc += i * i
+            out.append(Detections(np.zeros((1, 4), np.float32), np.ones(1, np.float32), np.zeros(1, np.int64)))
+        return out
+
+
+def make_synthetic_backend(work: int) -> SyntheticBackend:
+    return SyntheticBackend(work)
+
+
+def _load_unless_blocked(factory, block_path: str):
+    if os.path.exists(block_path):
+        raise RuntimeError("model loading blocked by the benchmark")
+    return factory()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', help='Path to a real .pt model (default: synthetic backend)')
+    parser.add_argument('--workers', default='1,2,4')
+    parser.add_argument('--torch-threads', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=10, help='Requests per client thread')
+    parser.add_argument('--work', type=int, default=300_000, help='Synthetic CPU work per image')
+    args = parser.parse_args()
+
+    if args.model:
+        from utils.yolo_service import get_model_version
+        factory = functools.partial(create_backend, args.model, get_model_version(args.model))
+    else:
+        factory = functools.partial(make_synthetic_backend, args.work)
+    image = np.random.randint(0, 255, (1080, 1920, 3), dtype=np.uint8)
+
+    rows = []
+    local = factory()
+    lock = threading.Lock()
+
+    def in_process(_i):
+        with lock:
+            return local.predict([image])
+
+    row = {'mode': 'in-process', 'workers': 0}
+    row.update(run_closed_loop(in_process, args.concurrency, args.requests))
+    rows.append(row)
+
+    for workers in [int(w) for w in args.workers.split(',')]:
+        pool = InferenceWorkerPool(workers, factory, torch_threads=args.torch_threads)
+        try:
+            row = {'mode': 'process-pool', 'workers': workers}
+            row.update(run_closed_loop(lambda _i: pool.predict([image]), args.concurrency, args.requests))
+            rows.append(row)
+        finally:
+            pool.close()
+    print_table(rows)
+
+    failure = crash_check(factory, image)
+    if failure:
+        print(f"FAIL: {failure}")
+        sys.exit(1)
+
+
+def crash_check(factory, image: np.ndarray) -> str | None:
+    """Kill the workers while a slow task runs; None if the pool fails it fast and recovers."""
+    block_path = os.path.join(tempfile.mkdtemp(prefix='bench_worker_pool_'), 'block')
+    pool = InferenceWorkerPool(2, functools.partial(_load_unless_blocked, factory, block_path), torch_threads=1)
+    try:
+        result = {}
+        caller = threading.Thread(target=lambda: result.update(outcome=_outcome(pool, [image] * 50)))
+        caller.start()
+        time.sleep(0.5)
+        open(block_path, 'w').close()
+        killed_at = time.perf_counter()
+        for proc in list(pool._procs.values()):
+            proc.kill()
+        caller.join()
+        failed_after = time.perf_counter() - killed_at
+        print(f"\nworkers killed mid-task: {result['outcome']} after {failed_after:.2f}s")
+        if result['outcome'] != 'WorkerDiedError' or failed_after > 3:
+            return f"killed task ended with {result['outcome']} after {failed_after:.2f}s"
+        # The idle worker's death is noticed within a second
+        deadline = time.monotonic() + 10
+        while pool.stats()['serving'] and time.monotonic() < deadline:
+            time.sleep(0.1)
+        start = time.perf_counter()
+        outcome = _outcome(pool, [image])
+        print(f"call with no worker serving: {outcome} after {time.perf_counter() - start:.2f}s")
+        if outcome != 'WorkerDiedError' or time.perf_counter() - start > 1:
+            return f"call with no worker serving ended with {outcome}"
+        os.remove(block_path)
+        deadline = time.monotonic() + 60
+        while pool.stats()['serving'] < pool.workers and time.monotonic() < deadline:
+            time.sleep(0.1)
+        start = time.perf_counter()
+        outcome = _outcome(pool, [image])
+        print(f"next call after respawn: {outcome} in {time.perf_counter() - start:.2f}s; restarts {pool.restarts}")
+        if outcome != 'ok':
+            return f"call after respawn ended with {outcome}"
+    finally:
+        pool.close()
+    return None
+
+
+def _outcome(pool: InferenceWorkerPool, images) -> str:
+    try:
+        pool.predict(images)
+        return 'ok'
+    except WorkerDiedError:
+        return 'WorkerDiedError'
+    except Exception as e:
+        return repr(e)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Parity and latency comparison between the ultralytics and ONNX backends.
+
+Runs every image in ``--images`` (or synthetic charts when omitted) through
+both backends, matches detections by class and IoU, and prints agreement and
+latency. Exits non-zero when agreement is below ``--min-agreement``.
+
+    python -m benchmarks.compare_backends --model model.pt --images charts/
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from benchmarks._common import percentile
+from utils.box_ops import box_iou
+from utils.inference_backends import OnnxBackend, UltralyticsBackend
+from utils.yolo_service import get_model_version
+
+
+def load_images(folder: str | None, count: int) -> list:
+    if folder:
+        paths = sorted(p for ext in ('png', 'jpg', 'jpeg', 'webp') for p in glob.glob(os.path.join(folder, f'*.{ext}')))
+        return [np.asarray(Image.open(p).convert('RGB')) for p in paths]
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 255, (720, 1280, 3), dtype=np.uint8) for _ in range(count)]
+
+
+def match(a, b, iou_threshold: float):
+    """Greedy class-aware matching; returns (matched, max confidence delta)."""
+    if len(a.cls) == 0 or len(b.cls) == 0:
+        return 0, 0.0
+    ious = box_iou(a.xyxy, b.xyxy)
+    ious[a.cls[:, None] != b.cls[None, :]] = 0
+    matched, max_delta, used = 0, 0.0, set()
+    for i in np.argsort(-a.conf):
+        j = int(np.argmax(ious[i]))
+        if ious[i, j] >= iou_threshold and j not in used:
+            used.add(j)
+            matched += 1
+            max_delta = max(max_delta, abs(float(a.conf[i]) - float(b.conf[j])))
+    return matched, max_delta
+
+
+def timed_predict(backend, images):
+    outputs, latencies = [], []
+    backend.predict(images[:1])  # warm-up
+    for img in images:
+        t = time.perf_counter()
+        outputs.append(backend.predict([img])[0])
+        latencies.append((time.perf_counter() - t) * 1000.0)
+    return outputs, latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('CHART_MODEL_PATH', 'model.pt'))
+    parser.add_argument('--images', help='Folder of chart images')
+    parser.add_argument('--count', type=int, default=20, help='Synthetic images when --images is omitted')
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--iou', type=float, default=0.9, help='IoU for two boxes to count as the same detection')
+    parser.add_argument('--min-agreement', type=float, default=0.95)
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count)
+    reference = UltralyticsBackend(args.model)
+    candidate = OnnxBackend(args.model, get_model_version(args.model), imgsz=args.imgsz)
+
+    ref_out, ref_lat = timed_predict(reference, images)
+    cand_out, cand_lat = timed_predict(candidate, images)
+
+    total_ref = sum(len(d.cls) for d in ref_out)
+    total_cand = sum(len(d.cls) for d in cand_out)
+    matched, max_delta = 0, 0.0
+    for a, b in zip(ref_out, cand_out):
+        m, d = match(a, b, args.iou)
+        matched += m
+        max_delta = max(max_delta, d)
+    agreement = matched / max(total_ref, total_cand) if max(total_ref, total_cand) else 1.0
+
+    print(f"images: {len(images)}  detections ultralytics={total_ref} onnx={total_cand}  matched={matched}")
+    print(f"agreement: {agreement:.3f}  max confidence delta: {max_delta:.4f}")
+    for label, lat in (('ultralytics', ref_lat), ('onnx', cand_lat)):
+        print(f"{label:12s} p50 {percentile(lat, 50):7.1f} ms  p99 {percentile(lat, 99):7.1f} ms")
+    sys.exit(0 if agreement >= args.min_agreement else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Accuracy / speed / memory of the FP32 vs INT8 chart detector.
+
+Each backend runs in its own subprocess so peak RSS is attributable to it.
+Reports AP@0.5 and recall per pattern class, images per second and max RSS.
+
+    python -m benchmarks.eval_quantized --model model.pt --data labelled_charts/
+    python -m benchmarks.eval_quantized --model model.pt --data labelled_charts/ --backends ultralytics,onnx,onnx-int8
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks._common import print_table
+from benchmarks._eval import evaluate, load_labelled_folder, mean_ap
+
+
+def run_worker(args) -> None:
+    from utils.inference_backends import create_backend
+    from utils.yolo_service import get_model_version
+
+    samples = load_labelled_folder(args.data)
+    backend = create_backend(args.model, get_model_version(args.model), backend=args.worker)
+    backend.predict([samples[0][1]])  # warm-up
+
+    predictions = []
+    start = time.perf_counter()
+    for _, img, _, _ in samples:
+        predictions.append(backend.predict([img])[0])
+    elapsed = time.perf_counter() - start
+
+    report = evaluate(predictions, [(gt, cls) for _, _, gt, cls in samples])
+    print(json.dumps({
+        'backend': args.worker,
+        'names': {int(k): v for k, v in backend.names.items()},
+        'per_class': report,
+        'map50': mean_ap(report),
+        'images_per_s': round(len(samples) / elapsed, 2),
+        # ru_maxrss is KiB on Linux
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.getenv('CHART_MODEL_PATH', 'model.pt'))
+    parser.add_argument('--data', required=True, help='Folder with images/ and labels/ (YOLO format)')
+    parser.add_argument('--backends', default='onnx,onnx-int8')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = []
+    for backend in args.backends.split(','):
+        proc = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.eval_quantized', '--model', args.model, '--data', args.data, '--worker', backend],
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    print_table([
+        {'backend': r['backend'], 'mAP50': r['map50'], 'img/s': r['images_per_s'], 'max_rss_mb': r['max_rss_mb']}
+        for r in results
+    ])
+    print()
+    names = results[0]['names']
+    rows = []
+    for cls_id in results[0]['per_class']:
+        row = {'class': names.get(cls_id, cls_id), 'n_gt': results[0]['per_class'][cls_id]['n_gt']}
+        for r in results:
+            stats = r['per_class'].get(cls_id, {})
+            row[f"{r['backend']} AP50"] = stats.get('ap50')
+            row[f"{r['backend']} recall"] = stats.get('recall')
+        rows.append(row)
+    print_table(rows)
+
+
+if __name__ == '__main__':
+    main()
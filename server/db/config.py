@@ -103,6 +103,7 @@ CREATE TABLE analysis_history (
     patterns_detected JSONB,
     insights JSONB,
     annotated_image TEXT,
+    model_version TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
@@ -110,6 +111,16 @@ CREATE INDEX IF NOT EXISTS idx_analysis_history_user_created ON analysis_history
                     """
                 )
                 return
+            # Optional: model version column on analysis history
+            try:
+                self.supabase.table('analysis_history').select('model_version').limit(1).execute()
+            except Exception:
+                print("ℹ️ Add the model_version column to analysis_history in Supabase SQL Editor:")
+                print(
+                    """
+ALTER TABLE analysis_history ADD COLUMN IF NOT EXISTS model_version TEXT;
+                    """
+                )
             # Push tokens table
             try:
                 self.supabase.table('push_tokens').select('id').limit(1).execute()
@@ -164,6 +175,9 @@ CREATE TABLE chat_sessions (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
     title TEXT,
+    summary TEXT,
+    summarized_through TIMESTAMP WITH TIME ZONE,
+    summarized_count INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
@@ -172,6 +186,18 @@ CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_updated ON chat_sessions(user_
                     """
                 )
                 return
+            # Optional: rolling summary columns on chat sessions
+            try:
+                self.supabase.table('chat_sessions').select('summary,summarized_through,summarized_count').limit(1).execute()
+            except Exception:
+                print("ℹ️ Add the summary columns to chat_sessions in Supabase SQL Editor:")
+                print(
+                    """
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summarized_through TIMESTAMP WITH TIME ZONE;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summarized_count INTEGER NOT NULL DEFAULT 0;
+                    """
+                )
             
             print("✅ All database tables are ready")
             
@@ -1,5 +1,6 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 import os
 import asyncio
@@ -10,15 +11,27 @@ from routes.apple_auth_routes import auth_apple_bp
 from routes.push_routes import push_bp
 from routes.iap_routes import iap_bp
 from routes.analysis_routes import analysis_bp
+from routes.admin_routes import admin_bp, is_admin_request
 from utils.push_service import push_service
+from utils.metrics import metrics
+from utils.model_warmup import readiness, start_warmup
 import random
 from db.config import db_config
 
 # Load environment variables
 load_dotenv()
 
-def create_app():
+def create_app(warm_up: bool = True):
     app = Flask(__name__)
+    # Behind TRUSTED_PROXY_HOPS reverse proxies, take the client address (used
+    # for per-IP rate limits and scheduling) and the public host/scheme from the
+    # X-Forwarded-* headers they add. Off by default: with clients connecting
+    # directly those headers are theirs to forge.
+    proxy_hops = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+    if proxy_hops > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxy_hops, x_proto=proxy_hops, x_host=proxy_hops)
+    # Reject oversized request bodies before they are buffered
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', str(32 * 1024 * 1024)))
     
     # Enable CORS for all routes
     CORS(app, origins=['http://localhost:3000', 'http://localhost:8081', 'http://localhost:19006', 'http://192.168.0.105:19006', 'exp://192.168.*.*:8081'])
@@ -30,6 +43,7 @@ def create_app():
     app.register_blueprint(push_bp)
     app.register_blueprint(iap_bp)
     app.register_blueprint(analysis_bp)
+    app.register_blueprint(admin_bp)
     
     # Health check endpoint
     @app.route('/api/health', methods=['GET'])
@@ -40,6 +54,18 @@ def create_app():
             'version': '1.0.0'
         })
     
+    # Readiness: 503 until the chart models are loaded and warmed
+    @app.route('/api/ready', methods=['GET'])
+    def ready_check():
+        return jsonify(readiness.to_dict()), (200 if readiness.ready else 503)
+
+    # In-process counters and timings (cache hit rates, etc.); same key as /api/admin
+    @app.route('/api/metrics', methods=['GET'])
+    def get_metrics():
+        if not is_admin_request():
+            return jsonify({'error': 'Unauthorized'}), 401
+        return jsonify(metrics.snapshot())
+
     # Root endpoint
     @app.route('/', methods=['GET'])
     def root():
@@ -48,7 +74,9 @@ def create_app():
             'version': '1.0.0',
             'endpoints': {
                 'auth': '/api/auth',
-                'health': '/api/health'
+                'health': '/api/health',
+                'ready': '/api/ready',
+                'metrics': '/api/metrics'
             }
         })
     
@@ -57,10 +85,18 @@ def create_app():
     def not_found(error):
         return jsonify({'error': 'Endpoint not found'}), 404
     
+    @app.errorhandler(413)
+    def payload_too_large(error):
+        return jsonify({'error': 'Request body too large'}), 413
+
     @app.errorhandler(500)
     def internal_error(error):
         return jsonify({'error': 'Internal server error'}), 500
-    
+
+    # Load and warm the chart models in the background; /api/ready flips when done
+    if warm_up:
+        start_warmup()
+
     return app
 
 def setup_database():
@@ -74,11 +110,11 @@ if __name__ == '__main__':
     # Setup database
     setup_database()
     
-    # Create and run app
-    app = create_app()
-
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+
+    # Create and run app; with the debug reloader only the serving child loads models
+    app = create_app(warm_up=not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     
     print(f"🚀 Starting Chart Ai API server on port {port}")
     print(f"📊 Database: Supabase")
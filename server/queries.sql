@@ -35,9 +35,12 @@ CREATE TABLE IF NOT EXISTS analysis_history (
     patterns_detected JSONB,
     insights JSONB,
     annotated_image TEXT,
+    model_version TEXT,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 CREATE INDEX IF NOT EXISTS idx_analysis_history_user_created ON analysis_history(user_id, created_at DESC);
+-- Existing deployments: record which model produced each analysis
+ALTER TABLE analysis_history ADD COLUMN IF NOT EXISTS model_version TEXT;
 
 CREATE TABLE chat_messages (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
@@ -57,8 +60,15 @@ CREATE TABLE chat_sessions (
     id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
     title TEXT,
+    summary TEXT,
+    summarized_through TIMESTAMP WITH TIME ZONE,
+    summarized_count INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
-CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_updated ON chat_sessions(user_id, updated_at DESC);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_updated ON chat_sessions(user_id, updated_at DESC);
+-- Existing deployments: rolling conversation summary per session
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summarized_through TIMESTAMP WITH TIME ZONE;
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summarized_count INTEGER NOT NULL DEFAULT 0;
\ No newline at end of file
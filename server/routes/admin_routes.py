@@ -0,0 +1,57 @@
+from flask import Blueprint, request, jsonify
+import hmac
+import os
+
+from utils.model_registry import model_registry
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+
+def is_admin_request() -> bool:
+    """Admin endpoints need ADMIN_API_KEY in the X-Admin-Key header; disabled when unset."""
+    expected = os.getenv('ADMIN_API_KEY')
+    provided = request.headers.get('X-Admin-Key', '')
+    return bool(expected) and hmac.compare_digest(provided, expected)
+
+
+@admin_bp.before_request
+def require_admin_key():
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+
+
+@admin_bp.route('/model', methods=['GET'])
+def model_status():
+    try:
+        return jsonify(model_registry.status())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/model/reload', methods=['POST'])
+def reload_model():
+    """Load new weights in the background and swap them in (or shadow them) once warm.
+
+    Body: ``{"model_path": optional, default CHART_MODEL_PATH, "shadow": bool}``.
+    Poll GET /api/admin/model for progress.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        state = model_registry.reload(data.get('model_path'), shadow=bool(data.get('shadow')))
+        return jsonify({'message': 'Model reload started', 'reload': state}), 202
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@admin_bp.route('/model/shadow', methods=['DELETE'])
+def stop_shadow():
+    try:
+        if not model_registry.stop_shadow():
+            return jsonify({'error': 'No shadow model is running'}), 404
+        return jsonify({'message': 'Shadow model stopped'})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,73 +1,337 @@
 from flask import Blueprint, request, jsonify
-from PIL import Image
-import base64
-import io
-
-from utils.yolo_service import get_chart_analyzer
-from utils.ai_insights import ai_insights_service
+import json
+import os
+
+from utils.analysis_pipeline import (
+    MAX_CHARTS_PER_REQUEST,
+    STAGE_INSIGHTS,
+    analysis_jobs,
+    iter_analysis,
+    iter_batch_analysis,
+    persist_analysis_async,
+    start_analysis,
+)
+from utils.image_decode import ImageTooLargeError, decode_upload, probe_image, read_upload
+from utils.inference_profiles import profile_for_user
+from utils.inference_scheduler import SchedulerDeadlineError, request_priority
+from utils.admission import AdmissionPolicy, admission_controlled
+from utils.job_queue import JOB_DONE, JOB_FAILED, QueueFullError
+from utils.image_store import FORMATS, image_store
 from utils.auth_utils import auth_utils
 from db.config import db_config
 from utils.ai_insights import chat_service
+from utils.chat_memory import chat_memory
 from flask import Response, stream_with_context
 
 
 analysis_bp = Blueprint('analysis', __name__, url_prefix='/api/analysis')
 
+SSE_KEEPALIVE_SECONDS = 15
+
+# Default admission limits for the synchronous analysis routes (override with ADMISSION_<ROUTE>_*)
+ANALYSIS_ADMISSION = AdmissionPolicy(
+    concurrency=16, queue=16, queue_timeout_s=2.0, ip_rate=2.0, ip_burst=10.0, user_rate=2.0, user_burst=10.0,
+)
+
+
+def public_base_url() -> str:
+    return os.getenv('PUBLIC_BASE_URL') or request.host_url
 
-def image_to_base64(img_pil: Image.Image) -> str:
-    buffered = io.BytesIO()
-    img_pil.save(buffered, format="PNG")
-    img_bytes = buffered.getvalue()
-    return base64.b64encode(img_bytes).decode('utf-8')
+
+def optional_user_id() -> str | None:
+    """user_id from a valid Bearer token, or None for anonymous requests."""
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        token = auth_header.split(' ')[1]
+        payload = auth_utils.verify_jwt_token(token)
+        if payload:
+            return payload.get('user_id')
+    return None
 
 
 @analysis_bp.route('/analyze-chart', methods=['POST'])
+@admission_controlled('analyze_chart', ANALYSIS_ADMISSION, user_key=optional_user_id)
 def analyze_chart():
     try:
         if 'chart' not in request.files:
             return jsonify({'error': 'No chart file uploaded (field name: chart)'}), 400
 
         file = request.files['chart']
-        image = Image.open(file.stream).convert('RGB')
+        # Bounded, reduced-resolution decode into the one array used for
+        # hashing, inference and annotation
+        try:
+            img_np = decode_upload(file.stream)
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
 
-        analyzer = get_chart_analyzer()
-        patterns, annotated = analyzer.analyze_pil(image)
+        # The user's plan picks the inference profile and scheduling class;
+        # detection, annotation and insights then run on the stage pool
+        user_id = optional_user_id()
+        try:
+            run = start_analysis(
+                img_np,
+                public_base_url(),
+                profile=profile_for_user(user_id),
+                priority=request_priority(user_id, request.remote_addr),
+            )
+            result_payload = run.result()
+        except SchedulerDeadlineError as e:
+            resp = jsonify({'error': str(e)})
+            resp.headers['Retry-After'] = str(e.retry_after_s)
+            return resp, 503
 
-        # AI-generated insights
-        insights = ai_insights_service.generate_insights(patterns)
+        # If authenticated, persist to analysis_history without holding the response
+        if user_id:
+            persist_analysis_async(user_id, result_payload)
 
-        img_b64 = image_to_base64(annotated)
+        resp = jsonify(result_payload)
+        resp.headers['Server-Timing'] = run.server_timing()
+        return resp
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        result_payload = {
-            'patterns_detected': patterns,
-            'summary': f"{len(patterns)} pattern(s) detected.",
-            'annotated_image': f"data:image/png;base64,{img_b64}",
-            'insights': insights,
-        }
 
-        # If authenticated, persist to analysis_history
-        user_id = None
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            payload = auth_utils.verify_jwt_token(token)
-            if payload:
-                user_id = payload.get('user_id')
+@analysis_bp.route('/analyze-chart-stream', methods=['POST'])
+@admission_controlled('analyze_chart_stream', ANALYSIS_ADMISSION, user_key=optional_user_id)
+def analyze_chart_stream():
+    """Streaming analyze-chart: one NDJSON line per stage as soon as it is ready.
 
-        if user_id:
+    Lines are ``{"event": "detected", patterns_detected, summary}``, then
+    ``{"event": "annotated", annotated_image, annotated_image_id}``, then
+    ``{"event": "insights", insights}`` and finally ``{"event": "done"}``
+    (or ``{"event": "error", error}``).
+    """
+    try:
+        if 'chart' not in request.files:
+            return jsonify({'error': 'No chart file uploaded (field name: chart)'}), 400
+
+        try:
+            img_np = decode_upload(request.files['chart'].stream)
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+
+        base_url = public_base_url()
+        user_id = optional_user_id()
+        profile = profile_for_user(user_id)
+        priority = request_priority(user_id, request.remote_addr)
+
+        def generate():
+            result_payload = {}
             try:
-                db_config.supabase.table('analysis_history').insert({
+                for stage, data in iter_analysis(img_np, base_url, profile=profile, priority=priority):
+                    result_payload.update(data)
+                    yield json.dumps({'event': stage, **data}) + "\n"
+            except Exception as e:
+                yield json.dumps({'event': 'error', 'error': str(e)}) + "\n"
+                return
+            yield json.dumps({'event': 'done'}) + "\n"
+            if user_id:
+                persist_analysis_async(user_id, result_payload)
+
+        resp = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.headers['X-Accel-Buffering'] = 'no'
+        return resp
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@analysis_bp.route('/analyze-charts', methods=['POST'])
+@admission_controlled('analyze_charts', ANALYSIS_ADMISSION, user_key=optional_user_id)
+def analyze_charts():
+    """Analyze several charts (e.g. timeframes of one symbol) in one request.
+
+    Multipart ``charts`` (repeated), optional ``labels`` (repeated, same order;
+    defaults to the file names). Streams NDJSON: one ``{"event": "chart",
+    index, label, patterns_detected, summary, annotated_image,
+    annotated_image_id}`` line per chart as it is ready, then one combined
+    ``{"event": "insights", insights}`` and ``{"event": "done"}``. Charts that
+    cannot be decoded get ``{"event": "error", index, label, error}``.
+    """
+    try:
+        files = request.files.getlist('charts')
+        if not files:
+            return jsonify({'error': 'No chart files uploaded (field name: charts)'}), 400
+        if len(files) > MAX_CHARTS_PER_REQUEST:
+            return jsonify({'error': f'At most {MAX_CHARTS_PER_REQUEST} charts per request'}), 400
+
+        labels = request.form.getlist('labels')
+        images, image_labels, image_indexes, errors = [], [], [], []
+        for i, file in enumerate(files):
+            label = labels[i] if i < len(labels) and labels[i] else (file.filename or f'chart {i + 1}')
+            try:
+                images.append(decode_upload(file.stream))
+                image_labels.append(label)
+                image_indexes.append(i)
+            except ValueError as e:
+                errors.append({'event': 'error', 'index': i, 'label': label, 'error': str(e)})
+
+        base_url = public_base_url()
+        user_id = optional_user_id()
+        profile = profile_for_user(user_id)
+        priority = request_priority(user_id, request.remote_addr)
+
+        def generate():
+            for error in errors:
+                yield json.dumps(error) + "\n"
+            if not images:
+                yield json.dumps({'event': 'done'}) + "\n"
+                return
+            charts = []
+            try:
+                for stage, data in iter_batch_analysis(images, image_labels, base_url, profile=profile, priority=priority):
+                    if stage == 'chart':
+                        # Report positions in the original upload order
+                        data = {**data, 'index': image_indexes[data['index']]}
+                        charts.append(data)
+                    yield json.dumps({'event': stage, **data}) + "\n"
+                    if stage == STAGE_INSIGHTS and user_id:
+                        for chart in charts:
+                            persist_analysis_async(user_id, {**chart, **data})
+            except Exception as e:
+                yield json.dumps({'event': 'error', 'error': str(e)}) + "\n"
+                return
+            yield json.dumps({'event': 'done'}) + "\n"
+
+        resp = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.headers['X-Accel-Buffering'] = 'no'
+        return resp
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@analysis_bp.route('/jobs', methods=['POST'])
+def submit_analysis_job():
+    """Queue a chart for background analysis and return immediately.
+
+    Only the upload read and header check happen on the request thread; poll
+    ``status_url`` or follow ``events_url`` (SSE) for the stage updates.
+    """
+    try:
+        if 'chart' not in request.files:
+            return jsonify({'error': 'No chart file uploaded (field name: chart)'}), 400
+
+        try:
+            data = read_upload(request.files['chart'].stream)
+            probe_image(data)
+        except ImageTooLargeError as e:
+            return jsonify({'error': str(e)}), 413
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        user_id = optional_user_id()
+        try:
+            job = analysis_jobs.submit(
+                {
+                    'data': data,
+                    'base_url': public_base_url(),
                     'user_id': user_id,
-                    'summary': result_payload['summary'],
-                    'patterns_detected': result_payload['patterns_detected'],
-                    'insights': result_payload.get('insights'),
-                    'annotated_image': result_payload['annotated_image'],
-                }).execute()
-            except Exception:
-                # Non-fatal: continue even if saving fails
-                pass
+                    'profile': profile_for_user(user_id).name,
+                    'priority': request_priority(user_id, request.remote_addr),
+                },
+                owner=user_id,
+            )
+        except QueueFullError as e:
+            resp = jsonify({'error': str(e)})
+            resp.headers['Retry-After'] = str(e.retry_after_s)
+            return resp, 503
+
+        base = f"{public_base_url().rstrip('/')}/api/analysis/jobs/{job.id}"
+        return jsonify({
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': base,
+            'events_url': f"{base}/events",
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _visible_job(job_id: str):
+    """The job if it exists and belongs to the caller (anonymous jobs are open to the ID holder)."""
+    job = analysis_jobs.get(job_id)
+    if job is None or (job.owner and job.owner != optional_user_id()):
+        return None
+    return job
+
+
+@analysis_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id: str):
+    try:
+        job = _visible_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@analysis_bp.route('/jobs/<job_id>/events', methods=['GET'])
+def analysis_job_events(job_id: str):
+    """Server-sent events for a job: queued, running, detected, annotated, insights, then done or failed.
+
+    Reconnecting clients send Last-Event-ID to resume after the last event they saw.
+    """
+    try:
+        job = _visible_job(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        try:
+            last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_event_id') or 0)
+        except ValueError:
+            last_id = 0
 
-        return jsonify(result_payload)
+        def generate():
+            nonlocal last_id
+            while True:
+                events = job.events_after(last_id, timeout=SSE_KEEPALIVE_SECONDS)
+                if not events:
+                    yield ": keep-alive\n\n"
+                    continue
+                for seq, event, payload in events:
+                    last_id = seq
+                    yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+                    if event in (JOB_DONE, JOB_FAILED):
+                        return
+
+        resp = Response(stream_with_context(generate()), mimetype='text/event-stream')
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.headers['X-Accel-Buffering'] = 'no'
+        return resp
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@analysis_bp.route('/annotated/<image_id>', methods=['GET'])
+def get_annotated_image(image_id):
+    """Serve a stored annotated chart.
+
+    Query: format (webp | jpeg | png, default negotiated from Accept), quality (1-100)
+    """
+    try:
+        fmt = (request.args.get('format') or '').lower().replace('jpg', 'jpeg')
+        if not fmt:
+            best = request.accept_mimetypes.best_match([mime for _, mime in FORMATS.values()], default='image/jpeg')
+            fmt = best.split('/')[1]
+        if fmt not in FORMATS:
+            return jsonify({'error': f"Unsupported format: {fmt}"}), 400
+        try:
+            quality = int(request.args['quality']) if 'quality' in request.args else None
+        except ValueError:
+            return jsonify({'error': 'quality must be an integer'}), 400
+
+        data = image_store.render(image_id, fmt, quality)
+        if data is None:
+            return jsonify({'error': 'Image not found'}), 404
+
+        # Content-addressed: the bytes for (id, format, quality) never change
+        quality_tag = 'lossless' if fmt == 'png' else (quality or image_store.default_quality)
+        response = Response(data, mimetype=FORMATS[fmt][1])
+        response.set_etag(f"{image_id}-{fmt}-{quality_tag}")
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        response.headers['Vary'] = 'Accept'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -96,33 +360,12 @@ def ask_bot():
             if payload:
                 user_id = payload.get('user_id')
 
-        # Build recent history for memory if session provided and user is known
+        # Conversation memory (session summary + recent turns) if session provided and user is known
         body_json = (request.get_json(silent=True) or {})
-        session_id = body_json.get('session_id')
-        history_mode = body_json.get('history_mode') or 'recent'  # 'recent' | 'full'
-        history_limit = body_json.get('history_limit')
-        history_scope = (body_json.get('history_scope') or 'session')  # 'session' | 'user'
-        # Safe caps
-        try:
-            history_limit = int(history_limit) if history_limit is not None else None
-        except Exception:
-            history_limit = None
-        if history_limit is None:
-            history_limit = 12 if history_mode == 'recent' else 50
-        history_limit = max(1, min(200, history_limit))
-        history = None
-        if user_id and (session_id or history_scope == 'user'):
-            try:
-                base = db_config.supabase.table('chat_messages').select('role,message,created_at').eq('user_id', user_id)
-                if history_scope == 'session' and session_id:
-                    base = base.eq('session_id', session_id)
-                res_hist = base.order('created_at', desc=False).range(0, history_limit - 1).execute()
-                history = res_hist.data or None
-            except Exception:
-                history = None
+        summary, history = _load_chat_memory(body_json, user_id)
 
         # Call Gemini with bounded history and optional web search
-        result = chat_service.ask(message=message, context=context, history=history, web_search=bool(body_json.get('web_search')))
+        result = chat_service.ask(message=message, context=context, history=history, web_search=bool(body_json.get('web_search')), summary=summary)
         if 'error' in result:
             return jsonify({ 'error': result['error'] }), 502
 
@@ -131,43 +374,7 @@ def ask_bot():
 
         # Save conversation if authenticated (best-effort)
         if user_id:
-            try:
-                # Ensure a session exists or create one if session_id provided is absent
-                session_id = data.get('session_id')
-                if not session_id:
-                    # Create a new session using title (fallback to first 40 chars of message)
-                    title = answer_title or (message[:40] + ('...' if len(message) > 40 else ''))
-                    sess = db_config.supabase.table('chat_sessions').insert({
-                        'user_id': user_id,
-                        'title': title,
-                    }).execute()
-                    if sess.data and len(sess.data) > 0:
-                        session_id = sess.data[0].get('id')
-
-                db_config.supabase.table('chat_messages').insert({
-                    'user_id': user_id,
-                    'session_id': session_id,
-                    'role': 'user',
-                    'message': message,
-                    'context': context,
-                    'model': chat_service.model,
-                }).execute()
-                db_config.supabase.table('chat_messages').insert({
-                    'user_id': user_id,
-                    'session_id': session_id,
-                    'role': 'assistant',
-                    'message': answer_text,
-                    'context': None,
-                    'model': chat_service.model,
-                }).execute()
-                # Touch session updated_at
-                if session_id:
-                    try:
-                        db_config.supabase.table('chat_sessions').update({ 'updated_at': 'now()' }).eq('id', session_id).execute()
-                    except Exception:
-                        pass
-            except Exception:
-                pass
+            session_id = _save_chat_exchange(user_id, data.get('session_id'), message, context, answer_text, answer_title)
 
         return jsonify({ 'text': answer_text, 'title': answer_title, 'session_id': session_id if user_id else None })
     except Exception as e:
@@ -243,7 +450,12 @@ def chat_history():
 
 @analysis_bp.route('/ask-bot-stream', methods=['POST'])
 def ask_bot_stream():
-    """Stream a bot response in chunks. First line contains META json, followed by DATA chunks.
+    """Stream a bot response as Gemini generates it. Lines are prefixed META: (JSON) or DATA: (text).
+
+    The first META line has session_id, title (null until known) and links;
+    META is re-sent when the title changes and once more with ``done: true``
+    and the final session_id after the exchange is saved. A failure mid-answer
+    ends the stream with an ERROR: line.
 
     Body JSON: { message: string, context?: object, session_id?: string }
     """
@@ -262,89 +474,118 @@ def ask_bot_stream():
             if payload:
                 user_id = payload.get('user_id')
 
-        # Prepare recent history if available for better context
+        # Conversation memory (session summary + recent turns) if available for better context
         body_json = (request.get_json(silent=True) or {})
-        session_id = body_json.get('session_id')
-        history_mode = body_json.get('history_mode') or 'recent'
-        history_limit = body_json.get('history_limit')
-        history_scope = (body_json.get('history_scope') or 'session')
-        try:
-            history_limit = int(history_limit) if history_limit is not None else None
-        except Exception:
-            history_limit = None
-        if history_limit is None:
-            history_limit = 12 if history_mode == 'recent' else 50
-        history_limit = max(1, min(200, history_limit))
-        history = None
-        if user_id and (session_id or history_scope == 'user'):
-            try:
-                base = db_config.supabase.table('chat_messages').select('role,message,created_at').eq('user_id', user_id)
-                if history_scope == 'session' and session_id:
-                    base = base.eq('session_id', session_id)
-                res_hist = base.order('created_at', desc=False).range(0, history_limit - 1).execute()
-                history = res_hist.data or None
-            except Exception:
-                history = None
+        summary, history = _load_chat_memory(body_json, user_id)
 
-        # Call Gemini (non-stream), then stream the text progressively to the client
-        result = chat_service.ask(message=message, context=context, history=history, web_search=bool(body_json.get('web_search')))
+        # Start Gemini's streamed answer; failures to connect still get a 502 before any output
+        result = chat_service.ask_stream(message=message, context=context, history=history, web_search=bool(body_json.get('web_search')), summary=summary)
         if 'error' in result:
             return jsonify({ 'error': result['error'] }), 502
 
-        answer_text = (result.get('text') or '')
-        answer_title = result.get('title')
         answer_links = result.get('links')
-
-        # Persist and make sure we have a session
         session_id = data.get('session_id')
-        if user_id:
-            try:
-                if not session_id:
-                    title = answer_title or (message[:40] + ('...' if len(message) > 40 else ''))
-                    sess = db_config.supabase.table('chat_sessions').insert({
-                        'user_id': user_id,
-                        'title': title,
-                    }).execute()
-                    if sess.data and len(sess.data) > 0:
-                        session_id = sess.data[0].get('id')
-                db_config.supabase.table('chat_messages').insert({
-                    'user_id': user_id,
-                    'session_id': session_id,
-                    'role': 'user',
-                    'message': message,
-                    'context': context,
-                    'model': chat_service.model,
-                }).execute()
-                db_config.supabase.table('chat_messages').insert({
-                    'user_id': user_id,
-                    'session_id': session_id,
-                    'role': 'assistant',
-                    'message': answer_text,
-                    'context': None,
-                    'model': chat_service.model,
-                }).execute()
-                if session_id:
-                    try:
-                        db_config.supabase.table('chat_sessions').update({ 'updated_at': 'now()' }).eq('id', session_id).execute()
-                    except Exception:
-                        pass
-            except Exception:
-                pass
 
         def generate():
-            import json
-            meta = { 'session_id': session_id, 'title': answer_title, 'links': answer_links }
+            meta = { 'session_id': session_id, 'title': None, 'links': answer_links }
             yield f"META:{json.dumps(meta)}\n"
-            # Stream in chunks by sentences or fixed sizes
-            text = answer_text
-            chunk_size = 128
-            for i in range(0, len(text), chunk_size):
-                yield f"DATA:{text[i:i+chunk_size]}\n"
 
-        return Response(stream_with_context(generate()), mimetype='text/plain')
+            # Forward chunks as Gemini produces them. The title (first bold
+            # phrase, else first line) is re-sent in a META line whenever it changes.
+            parts: list[str] = []
+            title_settled = False
+            try:
+                for chunk in result['chunks']:
+                    parts.append(chunk)
+                    yield f"DATA:{chunk}\n"
+                    if title_settled:
+                        continue
+                    text_so_far = ''.join(parts)
+                    if '\n' in text_so_far or text_so_far.count('**') >= 2:
+                        title = chat_service.derive_title(text_so_far)
+                        title_settled = text_so_far.count('**') >= 2
+                        if title and title != meta['title']:
+                            meta['title'] = title
+                            yield f"META:{json.dumps(meta)}\n"
+            except Exception as e:
+                yield f"ERROR:{json.dumps({ 'error': f'Gemini stream failed: {e}' })}\n"
+                return
+
+            # Persist once the whole answer is known, then send the final session id and title
+            answer_text = ''.join(parts).strip()
+            meta['title'] = chat_service.derive_title(answer_text)
+            if user_id:
+                meta['session_id'] = _save_chat_exchange(user_id, session_id, message, context, answer_text, meta['title'])
+            yield f"META:{json.dumps({ **meta, 'done': True })}\n"
+
+        resp = Response(stream_with_context(generate()), mimetype='text/plain')
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.headers['X-Accel-Buffering'] = 'no'
+        return resp
     except Exception as e:
         return jsonify({ 'error': str(e) }), 500
 
+
+def _load_chat_memory(body_json: dict, user_id: str | None):
+    """(summary, recent messages) for the chat prompt from the request's history options.
+
+    history_mode: 'recent' (default, last turns only) | 'full' (session summary + last turns)
+    history_scope: 'session' (default) | 'user'
+    history_limit: max raw turns, further capped by CHAT_RECENT_TURNS (+ CHAT_SUMMARY_FOLD_BATCH in full mode)
+    """
+    history_mode = body_json.get('history_mode') or 'recent'
+    history_scope = (body_json.get('history_scope') or 'session')
+    history_limit = body_json.get('history_limit')
+    # Safe caps
+    try:
+        history_limit = int(history_limit) if history_limit is not None else None
+    except Exception:
+        history_limit = None
+    if history_limit is None:
+        history_limit = 12 if history_mode == 'recent' else 50
+    history_limit = max(1, min(200, history_limit))
+    return chat_memory.load(user_id, body_json.get('session_id'), history_scope, history_mode, history_limit)
+
+
+def _save_chat_exchange(user_id: str, session_id: str | None, message: str, context, answer_text: str, answer_title: str | None) -> str | None:
+    """Store a question and its answer in chat_messages (best-effort), creating the session if needed."""
+    try:
+        if not session_id:
+            # Create a new session using title (fallback to first 40 chars of message)
+            title = answer_title or (message[:40] + ('...' if len(message) > 40 else ''))
+            sess = db_config.supabase.table('chat_sessions').insert({
+                'user_id': user_id,
+                'title': title,
+            }).execute()
+            if sess.data and len(sess.data) > 0:
+                session_id = sess.data[0].get('id')
+        db_config.supabase.table('chat_messages').insert({
+            'user_id': user_id,
+            'session_id': session_id,
+            'role': 'user',
+            'message': message,
+            'context': context,
+            'model': chat_service.model,
+        }).execute()
+        db_config.supabase.table('chat_messages').insert({
+            'user_id': user_id,
+            'session_id': session_id,
+            'role': 'assistant',
+            'message': answer_text,
+            'context': None,
+            'model': chat_service.model,
+        }).execute()
+        if session_id:
+            try:
+                db_config.supabase.table('chat_sessions').update({ 'updated_at': 'now()' }).eq('id', session_id).execute()
+            except Exception:
+                pass
+            # Keep the rolling summary up to date as the session grows
+            chat_memory.schedule_fold(user_id, session_id)
+    except Exception:
+        pass
+    return session_id
+
 @analysis_bp.route('/history', methods=['GET'])
 def get_history():
     try:
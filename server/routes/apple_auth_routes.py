@@ -1,10 +1,10 @@
 from flask import Blueprint, request, jsonify
 from db.config import db_config
 from utils.auth_utils import auth_utils
+from utils.http_client import http_client
 import bcrypt
 import uuid
 import jwt
-import requests
 from datetime import datetime
 
 
@@ -14,7 +14,7 @@ auth_apple_bp = Blueprint('auth_apple', __name__, url_prefix='/api/auth')
 def _get_apple_public_keys():
     """Get Apple's public keys for JWT verification"""
     try:
-        response = requests.get('https://appleid.apple.com/auth/keys', timeout=10)
+        response = http_client.get('https://appleid.apple.com/auth/keys', timeout=10)
         if response.status_code == 200:
             return response.json()
         return None
@@ -2,14 +2,29 @@ from flask import Blueprint, request, jsonify
 from db.config import db_config
 from utils.auth_utils import auth_utils
 from utils.email_service import email_service
+from utils.admission import AdmissionPolicy, admission_controlled
 import bcrypt
+import os
 from datetime import datetime, timedelta
 
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
+# bcrypt keeps a core busy per request: cap concurrency near the core count,
+# and rate-limit per IP and per (IP, account email) (override with ADMISSION_AUTH_<ROUTE>_*)
+AUTH_ADMISSION = AdmissionPolicy(
+    concurrency=os.cpu_count() or 2, queue=8, queue_timeout_s=1.0, ip_rate=1.0, ip_burst=10.0, user_rate=0.2, user_burst=5.0,
+)
+
+
+def _request_ip_email() -> str | None:
+    # Keyed on the email alone, anyone could lock a victim out of their account
+    email = ((request.get_json(silent=True) or {}).get('email') or '').strip().lower()
+    return f"{request.remote_addr}|{email}" if email else None
+
 
 @auth_bp.route('/register', methods=['POST'])
+@admission_controlled('auth_register', AUTH_ADMISSION, user_key=_request_ip_email)
 def register():
     try:
         data = request.get_json() or {}
@@ -56,6 +71,7 @@ def register():
         return jsonify({'error': str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@admission_controlled('auth_login', AUTH_ADMISSION, user_key=_request_ip_email)
 def login():
     try:
         data = request.get_json() or {}
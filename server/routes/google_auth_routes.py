@@ -1,8 +1,8 @@
 from flask import Blueprint, request, jsonify
 from db.config import db_config
 from utils.auth_utils import auth_utils
+from utils.http_client import http_client
 import os
-import requests
 import bcrypt
 import uuid
 from datetime import datetime
@@ -12,7 +12,7 @@ auth_google_bp = Blueprint('auth_google', __name__, url_prefix='/api/auth')
 
 def _validate_google_id_token(id_token: str):
     try:
-        resp = requests.get('https://oauth2.googleapis.com/tokeninfo', params={'id_token': id_token}, timeout=8)
+        resp = http_client.get('https://oauth2.googleapis.com/tokeninfo', params={'id_token': id_token}, timeout=8)
         if resp.status_code != 200:
             return None, 'Invalid Google token'
         data = resp.json()
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify
 from db.config import db_config
+from utils.inference_profiles import forget_user_plan
+from utils.http_client import http_client
 import os
-import requests
 from datetime import datetime, timedelta
 
 iap_bp = Blueprint('iap', __name__, url_prefix='/api/iap')
@@ -15,7 +16,7 @@ def verify_with_apple(receipt_data: str, is_sandbox: bool):
         'password': secret,
         'exclude-old-transactions': True,
     }
-    resp = requests.post(url, json=payload, timeout=15)
+    resp = http_client.post(url, json=payload, timeout=15, idempotent=True)
     resp.raise_for_status()
     return resp.json()
 
@@ -53,6 +54,8 @@ def verify_ios():
             'subscription_plan': plan,
             'subscription_expires_at': expires_at.isoformat() + 'Z'
         }).eq('id', user_id).execute()
+        # Premium analyses (accurate inference profile) apply immediately
+        forget_user_plan(user_id)
 
         return jsonify({'success': True, 'plan': plan, 'expires_at': expires_at.isoformat() + 'Z', 'apple': result})
     except Exception as e:
@@ -1,6 +1,6 @@
 from flask import Blueprint, request, jsonify
 from db.config import db_config
-import requests
+from utils.http_client import http_client
 import os
 
 push_bp = Blueprint('push', __name__, url_prefix='/api/push')
@@ -76,7 +76,7 @@ def send_test_push():
         if access_token:
             headers['Authorization'] = f'Bearer {access_token}'
 
-        resp = requests.post(expo_endpoint, json=messages, headers=headers, timeout=10)
+        resp = http_client.post(expo_endpoint, json=messages, headers=headers, timeout=10)
         resp.raise_for_status()
         result = resp.json()
 
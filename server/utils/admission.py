@@ -0,0 +1,243 @@
+import functools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple
+
+from flask import jsonify, make_response, request
+
+from utils.metrics import metrics
+
+
+class AdmissionRejected(Exception):
+    """A request was refused before doing any work; ``status`` is 429 or 503."""
+
+    def __init__(self, status: int, reason: str, retry_after_s: int) -> None:
+        super().__init__("Too many requests, slow down" if status == 429 else "Server busy, retry later")
+        self.status = status
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class TokenBucketLimiter:
+    """Token bucket per key (client IP, user id): ``rate`` requests/s sustained, bursts of ``burst``.
+
+    Buckets are kept for the ``max_keys`` most recently seen keys; an
+    evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000) -> None:
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.max_keys = max(1, int(max_keys))
+        self._lock = threading.Lock()
+        self._buckets: "OrderedDict[str, tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, key: str) -> float:
+        """Take one token for ``key``; returns 0 when allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= 1.0:
+                tokens -= 1.0
+            else:
+                wait = (1.0 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def refund(self, key: str) -> None:
+        """Give back the token taken for a request that was then refused for another reason."""
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                self._buckets[key] = (min(self.burst, bucket[0] + 1.0), bucket[1])
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """At most ``limit`` requests in flight, ``max_queue`` more waiting up to ``queue_timeout_s``.
+
+    Requests beyond the queue are refused at once instead of piling up
+    behind work the server cannot finish in time.
+    """
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout_s: float) -> None:
+        self.limit = max(1, int(limit))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout_s = float(queue_timeout_s)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._avg_hold_s = 0.0
+
+    def acquire(self) -> bool:
+        """Take a slot; False when the queue is full or the wait timed out."""
+        with self._cond:
+            if self._active < self.limit and not self._waiting:
+                self._active += 1
+                return True
+            if self._waiting >= self.max_queue:
+                return False
+            self._waiting += 1
+            deadline = time.monotonic() + self.queue_timeout_s
+            try:
+                while self._active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # Pass on any wake-up meant for us to the next waiter
+                        self._cond.notify()
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            return True
+
+    def release(self, held_s: float) -> None:
+        with self._cond:
+            self._active -= 1
+            self._avg_hold_s = held_s if not self._avg_hold_s else 0.9 * self._avg_hold_s + 0.1 * held_s
+            self._cond.notify()
+
+    def retry_after(self) -> int:
+        """Rough seconds until the current backlog drains, for the Retry-After header."""
+        with self._cond:
+            backlog = self._active + self._waiting
+            return max(1, math.ceil(self._avg_hold_s * backlog / self.limit))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'in_flight': self._active,
+                'queued': self._waiting,
+                'limit': self.limit,
+                'max_queue': self.max_queue,
+                'avg_hold_ms': round(self._avg_hold_s * 1000, 1),
+            }
+
+
+class AdmissionPolicy(NamedTuple):
+    """Limits for one route; a rate of 0 disables that bucket."""
+
+    concurrency: int
+    queue: int
+    queue_timeout_s: float
+    ip_rate: float
+    ip_burst: float
+    user_rate: float
+    user_burst: float
+
+
+def policy_from_env(route: str, default: AdmissionPolicy) -> AdmissionPolicy:
+    """``default`` overridden by ADMISSION_<ROUTE>_<FIELD> env vars, e.g. ADMISSION_AUTH_LOGIN_IP_RATE."""
+    prefix = f"ADMISSION_{route.upper()}_"
+    return AdmissionPolicy(*(
+        type(value)(os.getenv(prefix + field.upper(), str(value)))
+        for field, value in default._asdict().items()
+    ))
+
+
+class AdmissionController:
+    """Per-route rate limits and concurrency limits, checked before a request does any work."""
+
+    def __init__(self, name: str, policy: AdmissionPolicy) -> None:
+        self.name = name
+        self.policy = policy
+        self.concurrency = ConcurrencyLimiter(policy.concurrency, policy.queue, policy.queue_timeout_s)
+        self.ip_limiter = TokenBucketLimiter(policy.ip_rate, policy.ip_burst) if policy.ip_rate > 0 else None
+        self.user_limiter = TokenBucketLimiter(policy.user_rate, policy.user_burst) if policy.user_rate > 0 else None
+
+    def admit(self, ip: str | None, user: str | None) -> None:
+        """Raise AdmissionRejected, or take a concurrency slot the caller must ``release``.
+
+        Rate tokens are taken first, so over-rate clients are turned away
+        without queueing; a request refused by a later check gets them back.
+        """
+        taken = []
+        try:
+            if self.ip_limiter is not None and ip:
+                self._check_rate(self.ip_limiter, ip, 'rate_limited_ip')
+                taken.append((self.ip_limiter, ip))
+            if self.user_limiter is not None and user:
+                self._check_rate(self.user_limiter, user, 'rate_limited_user')
+                taken.append((self.user_limiter, user))
+            if not self.concurrency.acquire():
+                metrics.incr(f'admission.{self.name}.shed')
+                raise AdmissionRejected(503, 'shed', self.concurrency.retry_after())
+        except AdmissionRejected:
+            for limiter, key in taken:
+                limiter.refund(key)
+            raise
+        metrics.incr(f'admission.{self.name}.admitted')
+
+    def release(self, held_s: float) -> None:
+        self.concurrency.release(held_s)
+
+    def _check_rate(self, limiter: TokenBucketLimiter, key: str, reason: str) -> None:
+        wait = limiter.acquire(key)
+        if wait > 0:
+            metrics.incr(f'admission.{self.name}.{reason}')
+            raise AdmissionRejected(429, reason, max(1, math.ceil(wait)))
+
+    def stats(self) -> dict:
+        return {
+            **self.concurrency.stats(),
+            'ip_buckets': len(self.ip_limiter) if self.ip_limiter is not None else 0,
+            'user_buckets': len(self.user_limiter) if self.user_limiter is not None else 0,
+        }
+
+
+_controllers: Dict[str, AdmissionController] = {}
+
+
+def admission_stats() -> dict:
+    return {name: controller.stats() for name, controller in _controllers.items()}
+
+
+metrics.register_collector('admission', admission_stats)
+
+
+def admission_controlled(route: str, default: AdmissionPolicy, user_key: Callable[[], str | None] | None = None):
+    """Flask view decorator applying ``route``'s admission policy (ADMISSION_ENABLED, default true).
+
+    Rate-limited requests get 429 and overload gets 503, both with
+    Retry-After. The concurrency slot is held until the response is closed,
+    so streamed responses count until their last line is sent.
+    """
+    controller = AdmissionController(route, policy_from_env(route, default))
+    _controllers[route] = controller
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if os.getenv('ADMISSION_ENABLED', 'true').lower() != 'true':
+                return view(*args, **kwargs)
+            try:
+                controller.admit(request.remote_addr, user_key() if user_key else None)
+            except AdmissionRejected as e:
+                resp = jsonify({'error': str(e)})
+                resp.headers['Retry-After'] = str(e.retry_after_s)
+                return resp, e.status
+            start = time.monotonic()
+            try:
+                resp = view(*args, **kwargs)
+            except BaseException:
+                controller.release(time.monotonic() - start)
+                raise
+            return _release_on_close(resp, lambda: controller.release(time.monotonic() - start))
+        return wrapper
+    return decorator
+
+
+def _release_on_close(rv, release: Callable[[], None]):
+    resp = make_response(rv)
+    resp.call_on_close(release)
+    return resp
@@ -1,28 +1,151 @@
 import os
-from typing import Any, Dict, List
+import math
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterator, List
 import json
 import requests
 from urllib.parse import urlencode
 
+from utils.http_client import http_client
+from utils.metrics import metrics
+from utils.result_cache import LRUTTLCache, TieredCache, shared_store_from_env
+
+INSIGHT_KEYS = ['summary', 'explanations', 'entry_signals', 'exit_signals', 'risk_management', 'confidence_notes']
+
+# Summary of the placeholder returned when a Gemini call fails
+UNAVAILABLE_SUMMARY = 'AI insights unavailable or parsing failed. Check GEMINI_API_KEY/GEMINI_MODEL.'
+
+# Parsed insights keyed on the canonical pattern set; optionally shared through Redis
+_INSIGHTS_CACHE_TTL = float(os.getenv('INSIGHTS_CACHE_TTL_SECONDS', '21600'))
+insights_cache = TieredCache(
+    LRUTTLCache(
+        max_entries=int(os.getenv('INSIGHTS_CACHE_MAX_ENTRIES', '2048')),
+        ttl_seconds=_INSIGHTS_CACHE_TTL,
+        max_bytes=int(float(os.getenv('INSIGHTS_CACHE_MAX_MB', '32')) * 1024 * 1024),
+        name='insights_cache',
+    ),
+    shared_store_from_env('INSIGHTS_CACHE_REDIS_URL', 'insights_cache', _INSIGHTS_CACHE_TTL),
+)
+metrics.register_collector('insights_cache', insights_cache.stats)
+
+
+def canonical_patterns(patterns: List[Dict[str, Any]], bucket: float) -> List[Dict[str, Any]]:
+    """What the insights depend on: pattern names, each with its best confidence rounded
+    down to ``bucket`` and how often it was detected, sorted by name. Boxes are dropped.
+    """
+    grouped: Dict[str, List[float]] = {}
+    for p in patterns:
+        grouped.setdefault(str(p.get('pattern', '')), []).append(float(p.get('confidence') or 0.0))
+    canonical = []
+    for name in sorted(grouped):
+        confidence = max(grouped[name])
+        if bucket > 0:
+            confidence = math.floor(confidence / bucket + 1e-9) * bucket
+        canonical.append({'pattern': name, 'confidence': round(confidence, 3), 'count': len(grouped[name])})
+    return canonical
+
+
+def insights_unavailable(insights: Dict[str, Any]) -> bool:
+    """True for the placeholder served after a failed Gemini call, which must not be cached."""
+    return insights.get('summary') == UNAVAILABLE_SUMMARY
+
+
+def insights_cache_key(canonical: List[Dict[str, Any]]) -> str:
+    return "|".join(f"{p['pattern']}:{p['confidence']}x{p['count']}" for p in canonical)
+
+
+class SingleFlightTimeout(Exception):
+    """A coalesced caller gave up waiting for the in-flight call it joined."""
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution.
+
+    The first caller for a key runs ``fn``; callers arriving while it is
+    in flight wait up to ``timeout_s`` and get the same result, or the same
+    exception. Nothing is kept once the call finishes (caching is the
+    caller's business).
+    """
+
+    def __init__(self, name: str, timeout_s: float) -> None:
+        self.name = name
+        self.timeout_s = timeout_s
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._counts = {'leaders': 0, 'coalesced': 0, 'errors': 0, 'timeouts': 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self._counts['leaders' if leader else 'coalesced'] += 1
+        if not leader:
+            metrics.incr(f'singleflight.{self.name}.coalesced')
+            if not flight.done.wait(self.timeout_s):
+                self._count('timeouts')
+                raise SingleFlightTimeout(f"{self.name} call still in flight after {self.timeout_s}s")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            self._count('errors')
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            self._counts[field] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._counts, 'in_flight': len(self._flights)}
+
+
+# Identical Gemini requests in flight at the same time go upstream once
+_FLIGHT_TIMEOUT_S = float(os.getenv('GEMINI_SINGLEFLIGHT_TIMEOUT_S', '30'))
+# A generation call, retries included, ends before callers waiting on it give up.
+# Generation POSTs are not idempotent: a read timeout is not retried, since
+# Gemini may still be generating (and billing) the first answer.
+_GEMINI_DEADLINE_S = min(float(os.getenv('GEMINI_CALL_DEADLINE_S', '25')), 0.9 * _FLIGHT_TIMEOUT_S)
+insights_flight = SingleFlight('insights', _FLIGHT_TIMEOUT_S)
+chat_flight = SingleFlight('chat', _FLIGHT_TIMEOUT_S)
+metrics.register_collector('singleflight', lambda: {'insights': insights_flight.stats(), 'chat': chat_flight.stats()})
+
+
 class AIInsightsService:
     def __init__(self) -> None:
         self.api_key = os.getenv('GEMINI_API_KEY')
         self.model = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
         self.enabled = bool(self.api_key)
+        self.api_base = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta').rstrip('/')
+        # Confidences within one bucket (default 0.1) share cached insights
+        self.confidence_bucket = float(os.getenv('INSIGHTS_CACHE_CONF_BUCKET', '0.1'))
 
     def generate_insights(self, patterns: List[Dict[str, Any]]) -> Dict[str, Any]:
         if not self.enabled:
-            # Fallback basic structure
-            return {
-                'summary': 'AI insights unavailable. Set OPENAI_API_KEY to enable.',
-                'explanations': [
-                    'Connect an AI provider to generate detailed, pattern-aware insights.'
-                ],
-                'risk_management': [],
-                'entry_signals': [],
-                'exit_signals': [],
-                'confidence_notes': [],
-            }
+            return self._fallback_insights()
+
+        # Gemini sees the canonical form, so one cached answer is correct for every input with the same key
+        canonical = canonical_patterns(patterns, self.confidence_bucket)
 
         # Build prompt for Gemini
         prompt = (
@@ -35,10 +158,82 @@ class AIInsightsService:
             "5) Confidence considerations based on signal overlap.\n"
             "Return STRICT JSON with keys: summary (string), explanations (array), entry_signals (array), "
             "exit_signals (array), risk_management (array), confidence_notes (array). Do not include any prose outside JSON.\n"
-            f"Patterns: {patterns}"
+            f"Patterns: {json.dumps(canonical)}"
+        )
+        return self._cached_insights(insights_cache_key(canonical), prompt)
+
+    def generate_combined_insights(self, charts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """One analysis covering several charts, e.g. timeframes of the same symbol.
+
+        charts: [{'label': str, 'patterns': [...]}, ...]
+        """
+        if not self.enabled:
+            return self._fallback_insights()
+
+        canonical = [(c['label'], canonical_patterns(c['patterns'], self.confidence_bucket)) for c in charts]
+        chart_lines = "\n".join(f"- {label}: {json.dumps(patterns)}" for label, patterns in canonical)
+        prompt = (
+            "You are an expert trading assistant. Below are detected chart patterns with confidences for several "
+            "charts of the same instrument, usually different timeframes. Produce one concise professional analysis "
+            "across all of them. Include: \n"
+            "1) Overall market context and whether the timeframes agree or conflict;\n"
+            "2) Pattern explanations and implications, naming the chart each comes from;\n"
+            "3) Probable entry signals and invalidation levels;\n"
+            "4) Exit/target strategies and risk management;\n"
+            "5) Confidence considerations based on signal overlap across timeframes.\n"
+            "Return STRICT JSON with keys: summary (string), explanations (array), entry_signals (array), "
+            "exit_signals (array), risk_management (array), confidence_notes (array). Do not include any prose outside JSON.\n"
+            f"Charts:\n{chart_lines}"
         )
+        key = "charts:" + "||".join(f"{label}={insights_cache_key(patterns)}" for label, patterns in canonical)
+        return self._cached_insights(key, prompt)
+
+    def _fallback_insights(self) -> Dict[str, Any]:
+        # Fallback basic structure
+        return {
+            'summary': 'AI insights unavailable. Set OPENAI_API_KEY to enable.',
+            'explanations': [
+                'Connect an AI provider to generate detailed, pattern-aware insights.'
+            ],
+            'risk_management': [],
+            'entry_signals': [],
+            'exit_signals': [],
+            'confidence_notes': [],
+        }
+
+    def _cached_insights(self, key: str, prompt: str) -> Dict[str, Any]:
+        """Insights for ``prompt`` from the cache under ``key``, else from Gemini (successes only are cached).
+
+        Concurrent misses on the same key share one Gemini call.
+        """
+        key = f"{self.model}|{key}"
+        cached = insights_cache.get(key)
+        if cached is not None:
+            return dict(cached)
 
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
+        def fetch() -> Dict[str, Any]:
+            data = self._fetch_insights(prompt)
+            insights_cache.set(key, data)
+            return data
+
+        try:
+            return dict(insights_flight.do(key, fetch))
+        except Exception:
+            return self._unavailable_insights()
+
+    def _unavailable_insights(self) -> Dict[str, Any]:
+        return {
+            'summary': UNAVAILABLE_SUMMARY,
+            'explanations': [],
+            'entry_signals': [],
+            'exit_signals': [],
+            'risk_management': [],
+            'confidence_notes': [],
+        }
+
+    def _fetch_insights(self, prompt: str) -> Dict[str, Any]:
+        """Call Gemini and parse its JSON answer; raises on HTTP or parse errors."""
+        url = f"{self.api_base}/models/{self.model}:generateContent"
         headers = {
             'Content-Type': 'application/json',
             'X-goog-api-key': self.api_key,
@@ -53,42 +248,32 @@ class AIInsightsService:
             ]
         }
 
+        resp = http_client.post(url, headers=headers, json=payload, timeout=20, deadline_s=_GEMINI_DEADLINE_S)
+        resp.raise_for_status()
+        data_json = resp.json()
+        # Extract text
+        content_text = (
+            data_json.get('candidates', [{}])[0]
+            .get('content', {})
+            .get('parts', [{}])[0]
+            .get('text', '{}')
+        )
+        # Try parse as-is, otherwise extract JSON substring
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=20)
-            resp.raise_for_status()
-            data_json = resp.json()
-            # Extract text
-            content_text = (
-                data_json.get('candidates', [{}])[0]
-                .get('content', {})
-                .get('parts', [{}])[0]
-                .get('text', '{}')
-            )
-            # Try parse as-is, otherwise extract JSON substring
-            try:
-                data = json.loads(content_text)
-            except Exception:
-                # Best-effort JSON extraction
-                start = content_text.find('{')
-                end = content_text.rfind('}')
-                if start != -1 and end != -1 and end > start:
-                    snippet = content_text[start:end+1]
-                    data = json.loads(snippet)
-                else:
-                    raise ValueError('No JSON payload in model response')
-            # Ensure keys exist
-            for key in ['summary','explanations','entry_signals','exit_signals','risk_management','confidence_notes']:
-                data.setdefault(key, [] if key != 'summary' else '')
-            return data
+            data = json.loads(content_text)
         except Exception:
-            return {
-                'summary': 'AI insights unavailable or parsing failed. Check GEMINI_API_KEY/GEMINI_MODEL.',
-                'explanations': [],
-                'entry_signals': [],
-                'exit_signals': [],
-                'risk_management': [],
-                'confidence_notes': [],
-            }
+            # Best-effort JSON extraction
+            start = content_text.find('{')
+            end = content_text.rfind('}')
+            if start != -1 and end != -1 and end > start:
+                snippet = content_text[start:end+1]
+                data = json.loads(snippet)
+            else:
+                raise ValueError('No JSON payload in model response')
+        # Ensure keys exist
+        for key in INSIGHT_KEYS:
+            data.setdefault(key, [] if key != 'summary' else '')
+        return data
 
 
 ai_insights_service = AIInsightsService()
@@ -100,37 +285,47 @@ class ChatService:
         self.api_key = os.getenv('GEMINI_API_KEY')
         self.model = os.getenv('GEMINI_MODEL', 'gemini-2.0-flash')
         self.enabled = bool(self.api_key)
+        self.api_base = os.getenv('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta').rstrip('/')
         # Optional Google Programmable Search Engine for web enrichment
         self.cse_key = os.getenv('GOOGLE_CSE_KEY')
         self.cse_id = os.getenv('GOOGLE_CSE_ID')
+        # Characters of conversation memory (summary + recent turns) per prompt, roughly 4 per token
+        self.history_budget_chars = int(os.getenv('CHAT_PROMPT_BUDGET_CHARS', '6000'))
 
-    def _format_history_as_text(self, history: list[dict] | None, max_messages: int = 12) -> str:
-        """Format prior messages into a compact transcript.
+    def _format_history_as_text(self, history: list[dict] | None, summary: str | None = None) -> str:
+        """Format the session summary and prior messages into a compact transcript.
 
         history should be chronological [{'role': 'user'|'assistant', 'message': str}].
-        Only last max_messages are kept.
+        The whole block stays within ``history_budget_chars``: the summary gets
+        at most half, then turns are taken newest first while they fit (the
+        newest is cut short rather than dropped).
         """
-        if not history:
-            return ""
-        trimmed = history[-max_messages:]
+        budget = self.history_budget_chars
+        blocks: list[str] = []
+        summary = (summary or '').strip()
+        if summary:
+            summary = summary[:budget // 2]
+            blocks.append("\nSummary of the earlier conversation:\n" + summary)
+            budget -= len(summary)
+
         lines: list[str] = []
-        for m in trimmed:
-            role = m.get('role', 'user')
+        for m in reversed(history or []):
             text = str(m.get('message', '')).strip()
             if not text:
                 continue
-            prefix = 'User' if role == 'user' else 'Assistant'
-            lines.append(f"{prefix}: {text}")
-        return "\n".join(lines)
-
-    def ask(self, message: str, context: dict | None = None, history: list[dict] | None = None, web_search: bool = False) -> dict:
-        """Send a chat-style prompt to Gemini and return text or error.
-
-        Returns: { text: str } on success, or { error: str } on failure.
-        """
-        if not self.enabled:
-            return { 'error': 'GEMINI_API_KEY not configured' }
+            prefix = 'User' if m.get('role', 'user') == 'user' else 'Assistant'
+            line = f"{prefix}: {text}"
+            if len(line) > budget:
+                if not lines and budget > 0:
+                    lines.append(line[:budget])
+                break
+            lines.append(line)
+            budget -= len(line) + 1
+        if lines:
+            blocks.append("\nRecent conversation (most recent last):\n" + "\n".join(reversed(lines)))
+        return "".join(blocks)
 
+    def _build_payload(self, message: str, context: dict | None, history: list[dict] | None, summary: str | None = None) -> dict:
         # Build a system-style instruction and user/content parts
         system_prompt = (
             "You are a professional trading assistant focused on stocks, Indian markets, and technical analysis. "
@@ -140,8 +335,7 @@ class ChatService:
         )
 
         # Include compact conversation memory
-        history_text_block = self._format_history_as_text(history, max_messages=12)
-        history_text = ("\nRecent conversation (most recent last):\n" + history_text_block) if history_text_block else ""
+        history_text = self._format_history_as_text(history, summary)
 
         # Merge context into the prompt as structured text if provided
         context_text = ""
@@ -152,13 +346,7 @@ class ChatService:
                 context_text = f"\nContext: {context}"
 
         user_prompt = f"User message: {message}{context_text}{history_text}"
-
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent"
-        headers = {
-            'Content-Type': 'application/json',
-            'X-goog-api-key': self.api_key,
-        }
-        payload = {
+        return {
             "contents": [
                 {
                     "parts": [
@@ -169,33 +357,77 @@ class ChatService:
             ]
         }
 
+    def _add_web_links(self, payload: dict, message: str) -> list[dict] | None:
+        """Optional web search enrichment: append top results to the prompt and return them."""
+        if not (self.cse_key and self.cse_id):
+            return None
         try:
-            # Optional web search enrichment
-            links: list[dict] | None = None
-            if web_search and self.cse_key and self.cse_id:
-                try:
-                    q = message
-                    url = f"https://www.googleapis.com/customsearch/v1?{urlencode({'key': self.cse_key, 'cx': self.cse_id, 'q': q, 'num': 5})}"
-                    sresp = requests.get(url, timeout=8)
-                    sresp.raise_for_status()
-                    sjson = sresp.json()
-                    items = sjson.get('items', [])[:5]
-                    links = [
-                        {
-                            'title': it.get('title'),
-                            'link': it.get('link'),
-                            'snippet': it.get('snippet')
-                        }
-                        for it in items
-                        if it.get('link')
-                    ]
-                    if links:
-                        refs_txt = "\n\nTop web references:\n" + "\n".join([f"- {l['title']}: {l['link']}" for l in links])
-                        payload["contents"][0]["parts"].append({"text": refs_txt})
-                except Exception:
-                    links = None
+            search_url = f"https://www.googleapis.com/customsearch/v1?{urlencode({'key': self.cse_key, 'cx': self.cse_id, 'q': message, 'num': 5})}"
+            sresp = http_client.get(search_url, timeout=8)
+            sresp.raise_for_status()
+            items = sresp.json().get('items', [])[:5]
+            links = [
+                {
+                    'title': it.get('title'),
+                    'link': it.get('link'),
+                    'snippet': it.get('snippet')
+                }
+                for it in items
+                if it.get('link')
+            ]
+            if links:
+                refs_txt = "\n\nTop web references:\n" + "\n".join([f"- {l['title']}: {l['link']}" for l in links])
+                payload["contents"][0]["parts"].append({"text": refs_txt})
+            return links or None
+        except Exception:
+            return None
+
+    @staticmethod
+    def derive_title(text: str) -> str | None:
+        """Chat title from an answer: its first bold phrase, else its first line (max 80 chars)."""
+        full_text = text.strip()
+        if '**' in full_text:
+            segs = full_text.split('**')
+            if len(segs) >= 3 and segs[1].strip():
+                return segs[1].strip()
+        first_line = full_text.splitlines()[0] if full_text else ''
+        return first_line[:80] if first_line else None
+
+    def ask(self, message: str, context: dict | None = None, history: list[dict] | None = None, web_search: bool = False,
+            summary: str | None = None) -> dict:
+        """Send a chat-style prompt to Gemini and return text or error.
 
-            resp = requests.post(url, headers=headers, json=payload, timeout=20)
+        Identical history-less questions in flight at the same time share
+        one Gemini call (and its error, if any).
+
+        Returns: { text: str } on success, or { error: str } on failure.
+        """
+        if not self.enabled:
+            return { 'error': 'GEMINI_API_KEY not configured' }
+        if history or summary:
+            return self._ask(message, context, history, web_search, summary)
+
+        key = hashlib.sha256(json.dumps(
+            [self.model, message.strip(), context, web_search], sort_keys=True, default=str,
+        ).encode('utf-8')).hexdigest()
+        try:
+            return dict(chat_flight.do(key, lambda: self._ask(message, context, None, web_search)))
+        except SingleFlightTimeout as e:
+            return { 'error': f"Gemini request failed: {e}" }
+
+    def _ask(self, message: str, context: dict | None, history: list[dict] | None, web_search: bool,
+             summary: str | None = None) -> dict:
+        payload = self._build_payload(message, context, history, summary)
+        url = f"{self.api_base}/models/{self.model}:generateContent"
+        headers = {
+            'Content-Type': 'application/json',
+            'X-goog-api-key': self.api_key,
+        }
+
+        try:
+            links = self._add_web_links(payload, message) if web_search else None
+
+            resp = http_client.post(url, headers=headers, json=payload, timeout=20, deadline_s=_GEMINI_DEADLINE_S)
             resp.raise_for_status()
             data_json = resp.json()
             text = (
@@ -205,18 +437,7 @@ class ChatService:
                 .get('text', '')
             )
             full_text = text.strip()
-            title: str | None = None
-            if '**' in full_text:
-                try:
-                    segs = full_text.split('**')
-                    if len(segs) >= 3 and segs[1].strip():
-                        title = segs[1].strip()
-                except Exception:
-                    title = None
-            if not title:
-                first_line = full_text.splitlines()[0] if full_text else ''
-                title = first_line[:80] if first_line else None
-            result: dict = { 'text': full_text, 'title': title }
+            result: dict = { 'text': full_text, 'title': self.derive_title(full_text) }
             if links:
                 result['links'] = links
             return result
@@ -229,6 +450,99 @@ class ChatService:
         except Exception as e:
             return { 'error': f"Gemini request failed: {e}" }
 
+    def ask_stream(self, message: str, context: dict | None = None, history: list[dict] | None = None, web_search: bool = False,
+                   summary: str | None = None) -> dict:
+        """Like ``ask`` but with Gemini's streamGenerateContent (server-sent events).
+
+        The request is made before returning, so connection and HTTP errors
+        come back as { error: str }. On success returns
+        { chunks: iterator of text pieces as Gemini produces them, links?: [...] }.
+        """
+        if not self.enabled:
+            return { 'error': 'GEMINI_API_KEY not configured' }
+
+        payload = self._build_payload(message, context, history, summary)
+        url = f"{self.api_base}/models/{self.model}:streamGenerateContent?alt=sse"
+        headers = {
+            'Content-Type': 'application/json',
+            'X-goog-api-key': self.api_key,
+        }
+
+        try:
+            links = self._add_web_links(payload, message) if web_search else None
+            # Read timeout applies between chunks, not to the whole answer. Never
+            # retried: a replay could repeat tokens the client may already have
+            resp = http_client.post(url, headers=headers, json=payload, stream=True, timeout=(10, 20), retries=0)
+            resp.raise_for_status()
+        except requests.HTTPError as http_err:
+            try:
+                err_body = resp.json()
+            except Exception:
+                err_body = { 'message': str(http_err) }
+            resp.close()
+            return { 'error': f"Gemini HTTP error: {err_body}" }
+        except Exception as e:
+            return { 'error': f"Gemini request failed: {e}" }
+
+        result: dict = { 'chunks': self._iter_sse_text(resp) }
+        if links:
+            result['links'] = links
+        return result
+
+    @staticmethod
+    def _iter_sse_text(resp) -> Iterator[str]:
+        """Text parts of each ``data:`` event in a streamGenerateContent response."""
+        try:
+            # text/event-stream carries no charset, so requests would fall back
+            # to ISO-8859-1 and mangle non-ASCII text ("₹ 100"); SSE is UTF-8
+            resp.encoding = 'utf-8'
+            # chunk_size=None hands each chunk over as it arrives; the default
+            # 512 would hold back several small events
+            for line in resp.iter_lines(chunk_size=None, decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                event = json.loads(line[len('data:'):].strip())
+                for candidate in event.get('candidates', [])[:1]:
+                    for part in candidate.get('content', {}).get('parts', []):
+                        if part.get('text'):
+                            yield part['text']
+        finally:
+            resp.close()
+
+    def summarize(self, summary: str | None, messages: list[dict], max_chars: int) -> str | None:
+        """Fold ``messages`` (chronological) into the running ``summary``; None if Gemini failed."""
+        if not self.enabled:
+            return None
+        transcript = "\n".join(
+            f"{'User' if m.get('role', 'user') == 'user' else 'Assistant'}: {str(m.get('message', '')).strip()}"
+            for m in messages
+        )
+        prompt = (
+            "You maintain the running summary of a conversation between a user and a trading assistant. "
+            "Update the summary with the new messages below. Keep instruments, timeframes, chart patterns, "
+            "levels, the user's positions and preferences, and open questions; drop pleasantries. "
+            f"Write plain text of at most {max_chars} characters and return only the summary.\n\n"
+            f"Current summary:\n{(summary or '(none)').strip()}\n\nNew messages:\n{transcript}"
+        )
+        url = f"{self.api_base}/models/{self.model}:generateContent"
+        headers = {
+            'Content-Type': 'application/json',
+            'X-goog-api-key': self.api_key,
+        }
+        payload = { "contents": [ { "parts": [ { "text": prompt } ] } ] }
+        try:
+            resp = http_client.post(url, headers=headers, json=payload, timeout=20, deadline_s=_GEMINI_DEADLINE_S)
+            resp.raise_for_status()
+            text = (
+                resp.json().get('candidates', [{}])[0]
+                .get('content', {})
+                .get('parts', [{}])[0]
+                .get('text', '')
+            ).strip()
+        except Exception:
+            return None
+        return text[:max_chars] or None
+
 
 chat_service = ChatService()
 
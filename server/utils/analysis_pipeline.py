@@ -0,0 +1,338 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from db.config import db_config
+from utils.ai_insights import ai_insights_service, insights_unavailable
+from utils.annotation import render_annotations
+from utils.image_decode import decode_chart
+from utils.image_store import image_store
+from utils.inference_profiles import InferenceProfile
+from utils.inference_scheduler import Priority, inference_scheduler
+from utils.job_queue import Job, JobQueue
+from utils.metrics import metrics
+from utils.model_registry import ModelGeneration, model_registry
+from utils.result_cache import analysis_cache, pixel_cache_key
+from utils.stage_graph import StageGraph, StageRun
+
+# Stage names reported to job / streaming clients, in order
+STAGE_DETECTED = 'detected'
+STAGE_ANNOTATED = 'annotated'
+STAGE_INSIGHTS = 'insights'
+
+StageCallback = Callable[[str, Dict[str, Any]], None]
+
+# Per-request cap for /analyze-charts
+MAX_CHARTS_PER_REQUEST = int(os.getenv('ANALYSIS_MAX_CHARTS_PER_REQUEST', '12'))
+
+# Shared pool for analysis stages and background persistence
+stage_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ANALYSIS_STAGE_THREADS', '16')),
+    thread_name_prefix='analysis-stage',
+)
+
+# Detection only: a thread per scheduler slot, so a request granted a slot
+# never queues behind insights calls or annotation on the stage pool
+detect_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('ANALYSIS_DETECT_THREADS', '0')) or inference_scheduler.slots,
+    thread_name_prefix='analysis-detect',
+)
+
+
+def annotated_image_url(image_id: str, base_url: str) -> str:
+    return f"{base_url.rstrip('/')}/api/analysis/annotated/{image_id}"
+
+
+class AnalysisRun:
+    """Handle on one in-flight chart analysis.
+
+    Detection runs first; annotation (CPU) and insights (network) both
+    depend only on the detections and run concurrently on the stage pool.
+    """
+
+    def __init__(self, stage_run: StageRun | None = None, cached: Dict[str, Any] | None = None) -> None:
+        self.stage_run = stage_run
+        self.cached = cached
+
+    def stages(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ``(stage, data)`` in order: detections, annotated image reference, insights."""
+        if self.cached is not None:
+            yield STAGE_DETECTED, {k: self.cached[k] for k in ('patterns_detected', 'summary', 'model_version')}
+            yield STAGE_ANNOTATED, {k: self.cached[k] for k in ('annotated_image', 'annotated_image_id')}
+            yield STAGE_INSIGHTS, {'insights': self.cached['insights']}
+            return
+        for stage in (STAGE_DETECTED, STAGE_ANNOTATED, STAGE_INSIGHTS):
+            yield stage, self.stage_run.result(stage)
+
+    def result(self) -> Dict[str, Any]:
+        """Block until every stage is done and return the analyze-chart response payload."""
+        if self.cached is not None:
+            return dict(self.cached)
+        return dict(self.stage_run.result('store'))
+
+    def server_timing(self) -> str:
+        if self.cached is not None:
+            return 'cache;desc="hit"'
+        return self.stage_run.server_timing()
+
+
+def _with_image_url(cached: Dict[str, Any], base_url: str) -> Dict[str, Any]:
+    # The cache holds only the image id: the URL's host comes from the current request
+    return {**cached, 'annotated_image': annotated_image_url(cached['annotated_image_id'], base_url)}
+
+
+def result_cache_key(img_np: np.ndarray, model_version: str, profile: InferenceProfile) -> str:
+    # Identical pixels + identical model and profile => identical analysis
+    return pixel_cache_key(img_np, f"{model_version}|{profile.name}")
+
+
+def _lease_identity(analyzer, profile: InferenceProfile | str | None) -> Tuple[ModelGeneration | None, str, InferenceProfile]:
+    """(leased generation, model version, profile) for result-cache keys, without building an analyzer.
+
+    With an explicit ``analyzer`` nothing is leased. Otherwise the caller
+    must release the generation once detection is done.
+    """
+    if analyzer is not None:
+        return None, analyzer.model_version, analyzer.profile
+    generation = model_registry.acquire()
+    return generation, generation.version, model_registry.resolve_profile(profile)
+
+
+def start_analysis(
+    img_np: np.ndarray,
+    base_url: str,
+    analyzer=None,
+    insights_service=None,
+    profile: InferenceProfile | str | None = None,
+    priority: Priority | None = None,
+    deadline: bool = True,
+) -> AnalysisRun:
+    """Start analyzing one decoded chart on the stage pool and return immediately.
+
+    ``profile`` picks the analyzer (default CHART_FREE_PROFILE) unless one is
+    passed in. Repeat uploads are served from the result cache. With a
+    ``priority``, this call first waits on the calling thread for a slot from
+    the inference scheduler (raising SchedulerDeadlineError if ``deadline``
+    passes first); detection then runs on its own executor and gives the
+    slot back. A cache hit never loads a model. The current model
+    generation is held until detection finishes, so a hot swap cannot close
+    it mid-request.
+    """
+    insights_service = insights_service or ai_insights_service
+
+    generation, model_version, profile = _lease_identity(analyzer, profile)
+    cache_key = result_cache_key(img_np, model_version, profile)
+    cached = analysis_cache.get(cache_key)
+    # A hit counts as a use of its image; one already swept is analyzed afresh
+    if cached is not None and image_store.touch(cached['annotated_image_id']):
+        if generation is not None:
+            generation.release()
+        return AnalysisRun(cached=_with_image_url(cached, base_url))
+
+    release_slot = None
+    if priority is not None:
+        try:
+            release_slot = inference_scheduler.acquire(priority, deadline)
+        except BaseException:
+            if generation is not None:
+                generation.release()
+            raise
+
+    def detect():
+        try:
+            detector = analyzer or generation.analyzer(profile)
+            patterns = detector.detect_or_reuse(img_np)
+        finally:
+            if release_slot is not None:
+                release_slot()
+            if generation is not None:
+                generation.release()
+        model_registry.maybe_shadow(img_np, profile, patterns)
+        return {
+            'patterns_detected': patterns,
+            'summary': f"{len(patterns)} pattern(s) detected.",
+            'model_version': detector.model_version,
+        }
+
+    def annotate(detected):
+        # Store the rendered frame once; clients fetch it in their preferred format
+        annotated = render_annotations(img_np, detected['patterns_detected'], scale=profile.annotation_scale)
+        image_id = image_store.put(annotated)
+        return {'annotated_image': annotated_image_url(image_id, base_url), 'annotated_image_id': image_id}
+
+    def insights(detected):
+        # AI-generated insights
+        return {'insights': insights_service.generate_insights(detected['patterns_detected'])}
+
+    def store(detected, annotated, insights):
+        result_payload = {**detected, **annotated, **insights}
+        # A failed Gemini call is retried on the next upload rather than served from here
+        if not insights_unavailable(insights['insights']):
+            analysis_cache.set(cache_key, {k: v for k, v in result_payload.items() if k != 'annotated_image'})
+        return result_payload
+
+    graph = (
+        StageGraph(stage_executor, name='analysis')
+        .add(STAGE_DETECTED, detect, executor=detect_executor)
+        .add(STAGE_ANNOTATED, annotate, deps=(STAGE_DETECTED,))
+        .add(STAGE_INSIGHTS, insights, deps=(STAGE_DETECTED,))
+        .add('store', store, deps=(STAGE_DETECTED, STAGE_ANNOTATED, STAGE_INSIGHTS))
+    )
+    return AnalysisRun(graph.run())
+
+
+def iter_analysis(
+    img_np: np.ndarray,
+    base_url: str,
+    analyzer=None,
+    insights_service=None,
+    profile: InferenceProfile | str | None = None,
+    priority: Priority | None = None,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Analyze one decoded chart, yielding ``(stage, data)`` as each part is ready."""
+    return start_analysis(img_np, base_url, analyzer, insights_service, profile, priority).stages()
+
+
+def run_analysis(
+    img_np: np.ndarray,
+    base_url: str,
+    on_stage: Optional[StageCallback] = None,
+    profile: InferenceProfile | str | None = None,
+    priority: Priority | None = None,
+    deadline: bool = True,
+) -> Dict[str, Any]:
+    """Analyze one decoded chart and return the analyze-chart response payload.
+
+    ``on_stage`` is called with each stage as it completes, which lets job
+    mode report progress.
+    """
+    run = start_analysis(img_np, base_url, profile=profile, priority=priority, deadline=deadline)
+    if on_stage is not None:
+        for stage, data in run.stages():
+            on_stage(stage, data)
+    return run.result()
+
+
+def iter_batch_analysis(
+    images: List[np.ndarray],
+    labels: List[str],
+    base_url: str,
+    analyzer=None,
+    insights_service=None,
+    profile: InferenceProfile | str | None = None,
+    priority: Priority | None = None,
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Analyze several charts together, yielding one ``chart`` stage per image then one ``insights`` stage.
+
+    Charts not already in the result cache go through a single batched
+    inference; all charts share one combined insights call. Chart stages are
+    yielded as their annotations finish, so they may arrive out of order
+    (each carries its ``index``).
+    """
+    insights_service = insights_service or ai_insights_service
+
+    generation, model_version, profile = _lease_identity(analyzer, profile)
+    charts: List[Dict[str, Any] | None] = [None] * len(images)
+    pending: List[int] = []
+    detected = []
+    try:
+        for i, img_np in enumerate(images):
+            cached = analysis_cache.get(result_cache_key(img_np, model_version, profile))
+            if cached is not None and image_store.touch(cached['annotated_image_id']):
+                charts[i] = _with_image_url({k: cached[k] for k in ('patterns_detected', 'summary', 'model_version', 'annotated_image_id')}, base_url)
+            else:
+                pending.append(i)
+
+        if pending:
+            analyzer = analyzer or generation.analyzer(profile)
+            # The whole batch is one forward pass, so it takes one scheduler slot
+            with metrics.timer('analysis.batch_detect'):
+                if priority is None:
+                    detected = analyzer.detect_many([images[i] for i in pending])
+                else:
+                    with inference_scheduler.slot(priority):
+                        detected = analyzer.detect_many([images[i] for i in pending])
+    finally:
+        if generation is not None:
+            generation.release()
+    patterns_by_index = {i: charts[i]['patterns_detected'] for i in range(len(images)) if charts[i] is not None}
+    patterns_by_index.update(zip(pending, detected))
+
+    insights_future = stage_executor.submit(
+        insights_service.generate_combined_insights,
+        [{'label': labels[i], 'patterns': patterns_by_index[i]} for i in range(len(images))],
+    )
+
+    def annotate(i: int) -> Dict[str, Any]:
+        patterns = patterns_by_index[i]
+        annotated = render_annotations(images[i], patterns, scale=profile.annotation_scale)
+        image_id = image_store.put(annotated)
+        return {
+            'patterns_detected': patterns,
+            'summary': f"{len(patterns)} pattern(s) detected.",
+            'model_version': model_version,
+            'annotated_image': annotated_image_url(image_id, base_url),
+            'annotated_image_id': image_id,
+        }
+
+    for i in range(len(images)):
+        if charts[i] is not None:
+            yield 'chart', {'index': i, 'label': labels[i], **charts[i]}
+    futures = {stage_executor.submit(annotate, i): i for i in pending}
+    for future in as_completed(futures):
+        i = futures[future]
+        yield 'chart', {'index': i, 'label': labels[i], **future.result()}
+
+    yield STAGE_INSIGHTS, {'insights': insights_future.result()}
+
+
+def persist_analysis(user_id: str, result_payload: Dict[str, Any]) -> None:
+    """Save an analysis to analysis_history (best-effort); its annotated image is kept for good."""
+    image_store.pin(result_payload['annotated_image_id'])
+    try:
+        with metrics.timer('analysis.persist'):
+            db_config.supabase.table('analysis_history').insert({
+                'user_id': user_id,
+                'summary': result_payload['summary'],
+                'patterns_detected': result_payload['patterns_detected'],
+                'insights': result_payload.get('insights'),
+                'annotated_image': result_payload['annotated_image'],
+                'model_version': result_payload.get('model_version'),
+            }).execute()
+    except Exception:
+        # Non-fatal: continue even if saving fails
+        metrics.incr('analysis.persist_errors')
+
+
+def persist_analysis_async(user_id: str, result_payload: Dict[str, Any]) -> None:
+    """Queue the analysis_history insert on the stage pool, off the response path."""
+    stage_executor.submit(persist_analysis, user_id, result_payload)
+
+
+def _run_analysis_job(job: Job, payload: Dict[str, Any]) -> Dict[str, Any]:
+    img_np = decode_chart(payload['data'])
+    # Job clients poll rather than wait on the connection, so queued jobs are never dropped
+    result_payload = run_analysis(
+        img_np,
+        payload['base_url'],
+        on_stage=job.add_event,
+        profile=payload.get('profile'),
+        priority=payload.get('priority'),
+        deadline=False,
+    )
+    if payload.get('user_id'):
+        persist_analysis_async(payload['user_id'], result_payload)
+    return result_payload
+
+
+# Background analysis jobs: uploads are queued and processed off the request thread
+analysis_jobs = JobQueue(
+    _run_analysis_job,
+    workers=int(os.getenv('ANALYSIS_JOB_WORKERS', '2')),
+    max_queued=int(os.getenv('ANALYSIS_JOB_QUEUE_SIZE', '32')),
+    ttl_seconds=float(os.getenv('ANALYSIS_JOB_TTL_SECONDS', '600')),
+    name='analysis_jobs',
+)
+metrics.register_collector('analysis_jobs', analysis_jobs.stats)
@@ -0,0 +1,62 @@
+import io
+from typing import Any, Dict, List
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Pure green is the same triple in RGB and BGR order
+BOX_COLOR = (0, 255, 0)
+
+
+def render_annotations(img_rgb: np.ndarray, patterns: List[Dict[str, Any]], scale: float = 1.0) -> np.ndarray:
+    """Draw pattern boxes and labels onto a new RGB uint8 buffer; ``img_rgb`` is left untouched.
+
+    The decoded frame is shared with other readers (perceptual hash, shadow
+    comparison), so it is never drawn on. At ``scale`` >= 1 the boxes go on
+    one full-size copy; a smaller scale shrinks the frame first, e.g. for
+    mobile clients, and the resize output is the only new buffer.
+    """
+    if scale < 1.0:
+        h, w = img_rgb.shape[:2]
+        canvas = cv2.resize(img_rgb, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    else:
+        canvas = img_rgb.copy()
+        scale = 1.0
+
+    font_scale = 0.6 * max(scale, 0.5)
+    thickness = max(1, round(2 * scale))
+    for p in patterns:
+        x1, y1, x2, y2 = [int(v * scale) for v in p["bbox"]]
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), BOX_COLOR, thickness)
+        label = f"{p['pattern']} {p['confidence']*100:.1f}%"
+        cv2.putText(
+            canvas,
+            label,
+            (x1, max(0, y1 - round(10 * scale))),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            font_scale,
+            BOX_COLOR,
+            thickness,
+            cv2.LINE_AA,
+        )
+    return canvas
+
+
+def encode_image(
+    img_rgb: np.ndarray,
+    fmt: str = "PNG",
+    quality: int | None = None,
+    compress_level: int | None = None,
+) -> bytes:
+    """Encode an RGB uint8 buffer without intermediate numpy frames."""
+    h, w = img_rgb.shape[:2]
+    image = Image.frombuffer("RGB", (w, h), np.ascontiguousarray(img_rgb), "raw", "RGB", 0, 1)
+    out = io.BytesIO()
+    params: Dict[str, Any] = {}
+    if quality is not None and fmt.upper() in ("JPEG", "WEBP"):
+        params["quality"] = int(quality)
+    if compress_level is not None and fmt.upper() == "PNG":
+        params["compress_level"] = int(compress_level)
+    image.save(out, format=fmt, **params)
+    return out.getvalue()
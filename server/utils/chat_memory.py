@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from db.config import db_config
+from utils.ai_insights import chat_service
+from utils.metrics import metrics
+
+
+class ChatMemory:
+    """Bounded conversation memory: a rolling summary per chat session plus its last few raw turns.
+
+    Each chat_sessions row keeps ``summary``, covering every message up to
+    ``summarized_through``, and ``summarized_count``. After an exchange is
+    saved, once more than ``recent_turns + fold_batch`` messages are newer
+    than that, the oldest of them are folded into the summary in the
+    background and the last ``recent_turns`` stay raw. Building a prompt
+    reads one session row and at most ``recent_turns + fold_batch`` messages
+    (everything the summary does not cover yet), so its size does not grow
+    with the session.
+    """
+
+    def __init__(self) -> None:
+        self.recent_turns = max(1, int(os.getenv('CHAT_RECENT_TURNS', '12')))
+        self.fold_batch = max(1, int(os.getenv('CHAT_SUMMARY_FOLD_BATCH', '8')))
+        self.max_fold = max(self.fold_batch, int(os.getenv('CHAT_SUMMARY_MAX_FOLD', '60')))
+        self.summary_max_chars = int(os.getenv('CHAT_SUMMARY_MAX_CHARS', '2000'))
+        self._executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('CHAT_SUMMARY_THREADS', '2')),
+            thread_name_prefix='chat-summary',
+        )
+        self._lock = threading.Lock()
+        self._folding: set[str] = set()
+
+    def load(self, user_id: str | None, session_id: str | None, scope: str, mode: str, limit: int) -> Tuple[str | None, List[dict] | None]:
+        """(summary, chronological recent messages) for a prompt.
+
+        ``mode`` 'full' adds the session summary to every message it does not
+        cover yet, at most ``min(limit, recent_turns + fold_batch)``, which is
+        as many as can be waiting for the next fold; the prompt budget trims
+        the oldest of them. 'recent' sends only the last ``min(limit,
+        recent_turns)`` turns. ``scope`` 'user' reads across all of the
+        user's sessions, which have no shared summary.
+        """
+        if not user_id or not (session_id or scope == 'user'):
+            return None, None
+        turns = self.recent_turns
+        if mode == 'full' and scope == 'session':
+            # Anything older than the last fold_batch + recent_turns is in the summary
+            turns += self.fold_batch
+        turns = max(1, min(limit, turns))
+        try:
+            query = db_config.supabase.table('chat_messages').select('role,message,created_at').eq('user_id', user_id)
+            summary = None
+            if scope == 'session' and session_id:
+                query = query.eq('session_id', session_id)
+                session = self._session_row(user_id, session_id)
+                if session.get('summarized_through'):
+                    query = query.gt('created_at', session['summarized_through'])
+                if mode == 'full':
+                    summary = session.get('summary') or None
+            res = query.order('created_at', desc=True).range(0, turns - 1).execute()
+            return summary, list(reversed(res.data or [])) or None
+        except Exception:
+            return None, None
+
+    def schedule_fold(self, user_id: str, session_id: str) -> None:
+        """Fold older messages of ``session_id`` into its summary in the background (one fold per session at a time)."""
+        with self._lock:
+            if session_id in self._folding:
+                return
+            self._folding.add(session_id)
+        self._executor.submit(self._fold_in_background, user_id, session_id)
+
+    def _fold_in_background(self, user_id: str, session_id: str) -> None:
+        try:
+            while self.fold(user_id, session_id):
+                pass
+        except Exception as e:
+            print(f"Chat summary update failed for session {session_id}: {e}")
+        finally:
+            with self._lock:
+                self._folding.discard(session_id)
+
+    def fold(self, user_id: str, session_id: str) -> bool:
+        """Fold one batch into the summary; True if there may be more to fold."""
+        session = self._session_row(user_id, session_id)
+        if 'summarized_count' not in session:
+            # Summary columns not migrated yet (see queries.sql)
+            return False
+        query = (
+            db_config.supabase.table('chat_messages')
+            .select('role,message,created_at')
+            .eq('user_id', user_id)
+            .eq('session_id', session_id)
+        )
+        if session.get('summarized_through'):
+            query = query.gt('created_at', session['summarized_through'])
+        rows = query.order('created_at', desc=False).range(0, self.recent_turns + self.max_fold - 1).execute().data or []
+        if len(rows) <= self.recent_turns + self.fold_batch:
+            return False
+
+        to_fold = rows[:len(rows) - self.recent_turns]
+        start = time.perf_counter()
+        summary = chat_service.summarize(session.get('summary'), to_fold, self.summary_max_chars)
+        if summary is None:
+            metrics.incr('chat_memory.fold_failed')
+            return False
+        count = session.get('summarized_count') or 0
+        # Conditional on the count read above, so a concurrent fold from another worker wins cleanly
+        updated = (
+            db_config.supabase.table('chat_sessions')
+            .update({
+                'summary': summary,
+                'summarized_through': to_fold[-1]['created_at'],
+                'summarized_count': count + len(to_fold),
+            })
+            .eq('id', session_id)
+            .eq('summarized_count', count)
+            .execute()
+        )
+        metrics.observe('chat_memory.fold', time.perf_counter() - start)
+        metrics.incr('chat_memory.folded_messages', len(to_fold))
+        return bool(updated.data) and len(rows) == self.recent_turns + self.max_fold
+
+    def _session_row(self, user_id: str, session_id: str) -> dict:
+        try:
+            res = (
+                db_config.supabase.table('chat_sessions')
+                .select('summary,summarized_through,summarized_count')
+                .eq('id', session_id)
+                .eq('user_id', user_id)
+                .limit(1)
+                .execute()
+            )
+        except Exception:
+            return {}
+        return (res.data or [{}])[0]
+
+
+# Global instance
+chat_memory = ChatMemory()
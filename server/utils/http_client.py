@@ -0,0 +1,216 @@
+import importlib
+import os
+import random
+import threading
+import time
+from typing import Dict, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import NewConnectionError
+
+from utils.metrics import metrics
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+# Statuses worth retrying; a non-idempotent request is only retried on
+# the ones that mean the server did not act on it
+RETRY_STATUSES = {429, 502, 503, 504}
+RETRY_STATUSES_UNSAFE = {429, 503}
+
+
+def _parse_pool_sizes(spec: str) -> Dict[str, int]:
+    """``"exp.host=4,generativelanguage.googleapis.com=32"`` -> {host: size}."""
+    sizes = {}
+    for item in spec.split(','):
+        host, _, size = item.strip().partition('=')
+        if host and size:
+            sizes[host.strip()] = int(size)
+    return sizes
+
+
+def _never_sent(exc: Exception) -> bool:
+    """True when the request failed before reaching the server, so any method may be retried."""
+    if isinstance(exc, requests.ConnectTimeout):
+        return True
+    if isinstance(exc, requests.ConnectionError):
+        reason = getattr(exc.args[0], 'reason', None) if exc.args else None
+        return isinstance(reason, NewConnectionError)
+    return type(exc).__name__ in ('ConnectError', 'ConnectTimeout') and type(exc).__module__.startswith('httpx')
+
+
+class HttpClient:
+    """Shared outbound HTTP client: one keep-alive connection pool per host.
+
+    Each host gets its own ``requests.Session`` so connections (and TLS
+    sessions) are reused across calls instead of a handshake per call. A
+    bare number as ``timeout`` is the read timeout; connecting is bounded
+    separately. Failed calls are retried with full-jitter exponential
+    backoff: idempotent requests on connection errors and 429/502/503/504,
+    others only when the request never reached the server or got 429/503
+    (``idempotent=True`` opts a POST into the full set). With
+    HTTP_CLIENT_HTTP2=true and ``httpx[http2]`` installed, non-streaming
+    calls go over HTTP/2; responses are still ``requests.Response``.
+    """
+
+    def __init__(self) -> None:
+        self.pool_size = int(os.getenv('HTTP_CLIENT_POOL_SIZE', '10'))
+        self.pool_sizes = _parse_pool_sizes(os.getenv('HTTP_CLIENT_POOL_SIZES', ''))
+        self.connect_timeout_s = float(os.getenv('HTTP_CLIENT_CONNECT_TIMEOUT_S', '5'))
+        self.read_timeout_s = float(os.getenv('HTTP_CLIENT_READ_TIMEOUT_S', '20'))
+        self.retries = int(os.getenv('HTTP_CLIENT_RETRIES', '2'))
+        self.backoff_s = float(os.getenv('HTTP_CLIENT_BACKOFF_S', '0.25'))
+        self.backoff_max_s = float(os.getenv('HTTP_CLIENT_BACKOFF_MAX_S', '4'))
+        self.http2 = os.getenv('HTTP_CLIENT_HTTP2', 'false').lower() == 'true'
+        self._httpx = None
+        if self.http2:
+            try:
+                import httpx
+                importlib.import_module('h2')  # httpx needs it for http2=True
+                self._httpx = httpx
+            except ImportError:
+                print("HTTP_CLIENT_HTTP2 needs httpx[http2]; using HTTP/1.1")
+                self.http2 = False
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._h2_clients: Dict[str, object] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, *, timeout=None, retries: int | None = None,
+                idempotent: bool | None = None, stream: bool = False, deadline_s: float | None = None,
+                **kwargs) -> requests.Response:
+        """Send through ``url``'s host pool; same keyword arguments as ``requests.request``.
+
+        ``deadline_s`` bounds all attempts together: each one's timeouts are
+        cut to the time left, and no retry starts once it has run out.
+        """
+        method = method.upper()
+        host = urlsplit(url).netloc
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else RETRY_STATUSES_UNSAFE
+        attempts = 1 + max(0, self.retries if retries is None else retries)
+        timeout = self._timeout(timeout)
+        started = time.monotonic()
+        use_h2 = self.http2 and not stream and 'verify' not in kwargs and 'cert' not in kwargs
+
+        for attempt in range(attempts):
+            attempt_timeout = timeout
+            if deadline_s is not None:
+                left = max(0.001, deadline_s - (time.monotonic() - started))
+                attempt_timeout = (min(timeout[0], left), min(timeout[1], left))
+            self._count(host, 'requests')
+            start = time.perf_counter()
+            try:
+                if use_h2:
+                    resp = self._send_h2(host, method, url, attempt_timeout, kwargs)
+                else:
+                    resp = self._session(host).request(method, url, timeout=attempt_timeout, stream=stream, **kwargs)
+            except Exception as e:
+                if self._last_attempt(attempt, attempts, started, deadline_s) or not (idempotent or _never_sent(e)):
+                    self._count(host, 'errors')
+                    raise
+                self._backoff(host, attempt, None, started, deadline_s)
+                continue
+            metrics.observe(f'http_client.{host}', time.perf_counter() - start)
+            if resp.status_code in retry_statuses and not self._last_attempt(attempt, attempts, started, deadline_s):
+                retry_after = resp.headers.get('Retry-After')
+                resp.close()
+                self._backoff(host, attempt, retry_after, started, deadline_s)
+                continue
+            return resp
+        raise RuntimeError('unreachable')
+
+    @staticmethod
+    def _last_attempt(attempt: int, attempts: int, started: float, deadline_s: float | None) -> bool:
+        return attempt == attempts - 1 or (deadline_s is not None and time.monotonic() - started >= deadline_s)
+
+    def _timeout(self, timeout) -> Tuple[float, float]:
+        if timeout is None:
+            return (self.connect_timeout_s, self.read_timeout_s)
+        if isinstance(timeout, tuple):
+            return timeout
+        return (min(self.connect_timeout_s, float(timeout)), float(timeout))
+
+    def _backoff(self, host: str, attempt: int, retry_after: str | None,
+                 started: float, deadline_s: float | None) -> None:
+        self._count(host, 'retries')
+        delay = random.uniform(0, min(self.backoff_max_s, self.backoff_s * (2 ** attempt)))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_max_s, float(retry_after)))
+        if deadline_s is not None:
+            delay = min(delay, max(0.0, deadline_s - (time.monotonic() - started)))
+        time.sleep(delay)
+
+    def _pool_size(self, host: str) -> int:
+        return self.pool_sizes.get(host.split(':')[0], self.pool_size)
+
+    def _session(self, host: str) -> requests.Session:
+        session = self._sessions.get(host)
+        if session is not None:
+            return session
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                # Retries are done above so they behave the same for every backend
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size(host), max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+        return session
+
+    def _send_h2(self, host: str, method: str, url: str, timeout: Tuple[float, float], kwargs: dict) -> requests.Response:
+        httpx = self._httpx
+        client = self._h2_clients.get(host)
+        if client is None:
+            with self._lock:
+                client = self._h2_clients.get(host)
+                if client is None:
+                    size = self._pool_size(host)
+                    client = httpx.Client(http2=True, limits=httpx.Limits(max_connections=size, max_keepalive_connections=size))
+                    self._h2_clients[host] = client
+        r = client.request(method, url, timeout=httpx.Timeout(timeout[1], connect=timeout[0]), **kwargs)
+        # Hand back a requests.Response so callers need not care which backend ran
+        resp = requests.Response()
+        resp.status_code = r.status_code
+        resp.headers = CaseInsensitiveDict(r.headers)
+        resp._content = r.content
+        resp._content_consumed = True
+        resp.encoding = r.encoding
+        resp.reason = r.reason_phrase
+        resp.url = str(r.url)
+        return resp
+
+    def _count(self, host: str, field: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(host, {'requests': 0, 'retries': 0, 'errors': 0})
+            stats[field] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'http2': self.http2,
+                'hosts': {host: {**counts, 'pool_size': self._pool_size(host)} for host, counts in self._stats.items()},
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            for client in self._h2_clients.values():
+                client.close()
+            self._sessions.clear()
+            self._h2_clients.clear()
+
+
+# Global instance
+http_client = HttpClient()
+metrics.register_collector('http_client', http_client.stats)
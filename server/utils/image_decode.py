@@ -0,0 +1,96 @@
+import io
+import os
+from typing import BinaryIO
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Images are decoded close to the size the model and annotation actually use:
+# the shorter side is capped at the largest model input (the accurate
+# profile's 1024), which is also the most a tile of a wide chart is fed at
+MAX_UPLOAD_BYTES = int(os.getenv("CHART_MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+MAX_PIXELS = int(os.getenv("CHART_MAX_PIXELS", "40000000"))
+DECODE_MAX_SIDE = int(os.getenv("CHART_DECODE_MAX_SIDE", "1024"))
+
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class ImageTooLargeError(ValueError):
+    """Upload exceeds the configured byte or pixel limits."""
+
+
+def read_upload(stream: BinaryIO, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    data = stream.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ImageTooLargeError(f"Image exceeds {max_bytes // (1024 * 1024)} MB upload limit")
+    if not data:
+        raise ValueError("Empty image upload")
+    return data
+
+
+def probe_image(data: bytes, max_pixels: int = MAX_PIXELS) -> tuple[int, int]:
+    """Return (width, height) from the image header, enforcing the pixel limit."""
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            width, height = probe.size
+    except Image.UnidentifiedImageError:
+        raise ValueError("Unsupported or corrupt image upload")
+    except Image.DecompressionBombError:
+        # PIL's own cap (about 179M pixels) trips in the header read, before ours
+        raise ImageTooLargeError(f"Image exceeds the {max_pixels} pixel limit")
+    if width * height > max_pixels:
+        raise ImageTooLargeError(f"Image is {width}x{height}; limit is {max_pixels} pixels")
+    return width, height
+
+
+def decode_chart(data: bytes, max_side: int = DECODE_MAX_SIDE, max_pixels: int = MAX_PIXELS) -> np.ndarray:
+    """Decode image bytes into one contiguous, writable RGB uint8 array.
+
+    The header is inspected first so oversized images are rejected before any
+    pixel is decoded. ``max_side`` bounds the shorter side: that is the tile
+    size for wide charts (see utils.tiling), so a 5000x1000 panorama keeps its
+    full height instead of shrinking to 1024x205. JPEGs are decoded directly
+    at 1/2, 1/4 or 1/8 scale (DCT scaling) when that still leaves the shorter
+    side >= ``max_side``, and the result is resized down to ``max_side`` at most.
+    """
+    width, height = probe_image(data, max_pixels)
+
+    shortest = min(width, height)
+    factor = 1
+    for f in (8, 4, 2):
+        if shortest // f >= max_side:
+            factor = f
+            break
+
+    buf = np.frombuffer(data, dtype=np.uint8)
+    img = cv2.imdecode(buf, _REDUCED_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        return _decode_with_pil(data, max_side)
+    cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=img)
+
+    h, w = img.shape[:2]
+    if min(h, w) > max_side:
+        scale = max_side / min(h, w)
+        img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(img)
+
+
+def _decode_with_pil(data: bytes, max_side: int) -> np.ndarray:
+    """Fallback for formats OpenCV cannot read (e.g. GIF)."""
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        scale = min(1.0, max_side / max(1, min(width, height)))
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        img.draft("RGB", size)
+        img.thumbnail(size)
+        return np.array(img.convert("RGB"))
+
+
+def decode_upload(stream: BinaryIO) -> np.ndarray:
+    return decode_chart(read_upload(stream))
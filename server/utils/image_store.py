@@ -0,0 +1,251 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from utils.annotation import encode_image
+from utils.metrics import metrics
+from utils.result_cache import LRUTTLCache
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+}
+_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+# Subdirectory of pinned masters, which the sweeper never deletes
+PINNED_DIR = 'pinned'
+
+
+class AnnotatedImageStore:
+    """Content-addressed store for rendered (annotated) chart images.
+
+    Each rendered RGB frame is stored once under the hash of its pixels. The
+    raw frame stays in memory for immediate serving while a fast PNG master is
+    written to disk in the background; encoded variants (format, quality) are
+    produced on first request and cached.
+
+    The disk store is local to this host. Behind a load balancer with several
+    nodes, put ``directory`` on shared storage (e.g. an NFS mount) or route
+    image URLs back to the node that rendered them. Every ``sweep_interval_s``
+    masters unused for ``max_age_s`` are deleted, then the least recently
+    used ones until the store is within ``max_disk_mb`` (0 disables either
+    limit). Images saved with an analysis in history are ``pin``-ned: a hard
+    link under ``pinned/`` keeps them out of the sweep and its budget.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        memory_mb: float = 128,
+        variant_cache_mb: float = 64,
+        default_quality: int = 80,
+        max_age_s: float = 30 * 86400,
+        max_disk_mb: float = 2048,
+        sweep_interval_s: float = 600,
+    ) -> None:
+        self.directory = directory
+        self.default_quality = default_quality
+        self.max_age_s = max_age_s
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        self._masters = LRUTTLCache(
+            max_entries=256, ttl_seconds=3600, max_bytes=int(memory_mb * 1024 * 1024),
+            sizeof=lambda arr: arr.nbytes, name='image_store.masters',
+        )
+        self._variants = LRUTTLCache(
+            max_entries=2048, ttl_seconds=86400, max_bytes=int(variant_cache_mb * 1024 * 1024),
+            sizeof=len, name='image_store.variants',
+        )
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix='image-store-writer')
+        os.makedirs(directory, exist_ok=True)
+        self.disk_bytes = 0
+        if sweep_interval_s > 0 and (max_age_s > 0 or max_disk_mb > 0):
+            threading.Thread(target=self._sweep_loop, args=(sweep_interval_s,), name='image-store-sweeper', daemon=True).start()
+
+    def put(self, img_rgb: np.ndarray) -> str:
+        digest = hashlib.sha256(f"{img_rgb.shape}".encode('utf-8'))
+        digest.update(np.ascontiguousarray(img_rgb).data)
+        image_id = digest.hexdigest()[:32]
+        self._masters.set(image_id, img_rgb)
+        path = self._path(image_id)
+        if not os.path.exists(path):
+            self._writer.submit(self._write_master, path, img_rgb)
+        else:
+            self._touch(path)
+        return image_id
+
+    def touch(self, image_id: str) -> bool:
+        """Mark ``image_id`` as just used; False if it is gone (swept, or never stored here)."""
+        path = self._path(image_id)
+        if os.path.exists(path):
+            self._touch(path)
+            return True
+        if os.path.exists(self._pinned_path(image_id)):
+            return True
+        master = self._masters.get(image_id)
+        if master is None:
+            return False
+        # Swept from disk while still in memory: write it back before memory lets go too
+        self._writer.submit(self._write_master, path, master)
+        return True
+
+    def pin(self, image_id: str) -> None:
+        """Keep ``image_id`` for good (it is referenced from analysis_history).
+
+        Runs on the writer thread, after the master write queued by ``put``.
+        """
+        if _ID_RE.match(image_id):
+            self._writer.submit(self._pin, image_id)
+
+    def render(self, image_id: str, fmt: str, quality: Optional[int] = None) -> Optional[bytes]:
+        """Encoded bytes of ``image_id`` in ``fmt`` ('webp' | 'jpeg' | 'png'), or None if unknown."""
+        if not _ID_RE.match(image_id) or fmt not in FORMATS:
+            return None
+        quality = self.default_quality if quality is None else max(1, min(100, int(quality)))
+        variant_key = (image_id, fmt, quality if fmt != 'png' else None)
+        data = self._variants.get(variant_key)
+        if data is not None:
+            return data
+        master = self._load_master(image_id)
+        if master is None:
+            return None
+        with metrics.timer(f'image_store.encode.{fmt}'):
+            data = encode_image(master, FORMATS[fmt][0], quality=quality if fmt != 'png' else None)
+        self._variants.set(variant_key, data)
+        return data
+
+    def _load_master(self, image_id: str) -> Optional[np.ndarray]:
+        master = self._masters.get(image_id)
+        if master is not None:
+            return master
+        path = self._path(image_id)
+        if not os.path.exists(path):
+            path = self._pinned_path(image_id)
+        if not os.path.exists(path):
+            return None
+        bgr = cv2.imread(path, cv2.IMREAD_COLOR)
+        if bgr is None:
+            return None
+        self._touch(path)
+        master = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB, dst=bgr)
+        self._masters.set(image_id, master)
+        return master
+
+    def _write_master(self, path: str, img_rgb: np.ndarray) -> None:
+        try:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as fh:
+                fh.write(encode_image(img_rgb, 'PNG', compress_level=1))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            metrics.incr('image_store.write_errors')
+            print(f"Annotated image write warning: {e}")
+
+    def _pin(self, image_id: str) -> None:
+        pinned_path = self._pinned_path(image_id)
+        if os.path.exists(pinned_path):
+            return
+        path = self._path(image_id)
+        try:
+            try:
+                os.link(path, pinned_path)
+            except FileNotFoundError:
+                # Swept already, or its write failed: write the pinned copy from memory
+                master = self._masters.get(image_id)
+                if master is None:
+                    raise
+                self._write_master(pinned_path, master)
+            except OSError:
+                # No hard links on this filesystem
+                shutil.copyfile(path, pinned_path)
+        except Exception as e:
+            metrics.incr('image_store.pin_errors')
+            print(f"Annotated image pin warning: {e}")
+
+    def sweep(self) -> int:
+        """Delete expired masters, then least recently used ones over the disk budget; returns the count removed.
+
+        Pinned masters are neither deleted nor counted against the budget.
+        """
+        entries = []
+        with os.scandir(self.directory) as subdirs:
+            for subdir in subdirs:
+                if not subdir.is_dir() or subdir.name == PINNED_DIR:
+                    continue
+                with os.scandir(subdir.path) as files:
+                    for entry in files:
+                        if entry.name.endswith('.png'):
+                            try:
+                                st = entry.stat()
+                            except FileNotFoundError:
+                                continue
+                            entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age_s if self.max_age_s > 0 else None
+        removed = 0
+        for mtime, size, path in entries:
+            expired = cutoff is not None and mtime < cutoff
+            over_budget = self.max_disk_bytes > 0 and total > self.max_disk_bytes
+            if not (expired or over_budget):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self.disk_bytes = total
+        if removed:
+            metrics.incr('image_store.swept', removed)
+        return removed
+
+    def _sweep_loop(self, interval_s: float) -> None:
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Annotated image sweep warning: {e}")
+            time.sleep(interval_s)
+
+    @staticmethod
+    def _touch(path: str) -> None:
+        # mtime doubles as last use for the sweeper
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _path(self, image_id: str) -> str:
+        # Two-level fan-out keeps directories small
+        subdir = os.path.join(self.directory, image_id[:2])
+        os.makedirs(subdir, exist_ok=True)
+        return os.path.join(subdir, f"{image_id}.png")
+
+    def _pinned_path(self, image_id: str) -> str:
+        subdir = os.path.join(self.directory, PINNED_DIR, image_id[:2])
+        os.makedirs(subdir, exist_ok=True)
+        return os.path.join(subdir, f"{image_id}.png")
+
+
+image_store = AnnotatedImageStore(
+    directory=os.getenv('CHART_IMAGE_STORE_DIR', 'annotated_images'),
+    memory_mb=float(os.getenv('CHART_IMAGE_STORE_MEMORY_MB', '128')),
+    variant_cache_mb=float(os.getenv('CHART_IMAGE_VARIANT_CACHE_MB', '64')),
+    default_quality=int(os.getenv('CHART_IMAGE_QUALITY', '80')),
+    max_age_s=float(os.getenv('CHART_IMAGE_STORE_TTL_S', str(30 * 86400))),
+    max_disk_mb=float(os.getenv('CHART_IMAGE_STORE_MAX_MB', '2048')),
+    sweep_interval_s=float(os.getenv('CHART_IMAGE_STORE_SWEEP_INTERVAL_S', '600')),
+)
+metrics.register_collector('image_store', lambda: {
+    'masters': image_store._masters.stats(),
+    'variants': image_store._variants.stats(),
+    'disk_bytes': image_store.disk_bytes,
+})
@@ -0,0 +1,255 @@
+import ast
+import os
+import shutil
+from typing import Dict, List, NamedTuple
+
+import cv2
+import numpy as np
+
+from utils.box_ops import batched_nms, xywh_to_xyxy
+
+
+class Detections(NamedTuple):
+    """Raw detections for one image in source pixel coordinates."""
+    xyxy: np.ndarray  # (N, 4) float32
+    conf: np.ndarray  # (N,) float32
+    cls: np.ndarray   # (N,) int64
+
+
+class UltralyticsBackend:
+    """PyTorch inference through ``ultralytics.YOLO``."""
+
+    name = "ultralytics"
+
+    def __init__(self, model_path: str, imgsz: int | None = None, conf: float | None = None, max_det: int | None = None) -> None:
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.names: Dict[int, str] = getattr(self.model, "names", {}) or {}
+        # Only explicitly configured options are passed; the rest keep ultralytics defaults
+        self.predict_kwargs = {k: v for k, v in (("imgsz", imgsz), ("conf", conf), ("max_det", max_det)) if v is not None}
+
+    def predict(self, images: List[np.ndarray]) -> List[Detections]:
+        results = self.model(images, **self.predict_kwargs)
+        out: List[Detections] = []
+        for result in results:
+            boxes = getattr(result, "boxes", None)
+            if boxes is None:
+                out.append(_empty_detections())
+                continue
+            out.append(Detections(
+                xyxy=boxes.xyxy.cpu().numpy().astype(np.float32),
+                conf=boxes.conf.cpu().numpy().astype(np.float32),
+                cls=boxes.cls.cpu().numpy().astype(np.int64),
+            ))
+        return out
+
+
+def export_onnx(model_path: str, model_version: str, imgsz: int, cache_dir: str | None = None) -> str:
+    """Export the .pt weights to ONNX once and return the cached artifact path.
+
+    The file name embeds the weights hash and input size, so new weights or a
+    different ``imgsz`` produce a fresh export while restarts reuse the old one.
+    """
+    cache_dir = cache_dir or os.getenv("CHART_ONNX_CACHE_DIR") or os.path.join(
+        os.path.dirname(os.path.abspath(model_path)), ".onnx_cache"
+    )
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    digest = model_version.rsplit(":", 1)[-1]
+    target = os.path.join(cache_dir, f"{stem}-{digest}-{imgsz}.onnx")
+    if os.path.exists(target):
+        return target
+
+    from ultralytics import YOLO
+
+    os.makedirs(cache_dir, exist_ok=True)
+    exported = YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True)
+    tmp_target = f"{target}.tmp"
+    shutil.copyfile(exported, tmp_target)
+    os.replace(tmp_target, target)
+    return target
+
+
+def quantize_onnx(onnx_path: str, calibration_dir: str | None = None, imgsz: int = 640) -> str:
+    """Produce (once) an INT8 copy of an exported ONNX model.
+
+    Static QDQ quantization is used when a folder of calibration charts is
+    given; otherwise weights are quantized dynamically, which needs no data.
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic, quantize_static
+
+    mode = "static" if calibration_dir else "dynamic"
+    target = onnx_path.replace(".onnx", f"-int8-{mode}.onnx")
+    if os.path.exists(target):
+        return target
+
+    tmp_target = f"{target}.tmp"
+    if calibration_dir:
+        quantize_static(
+            onnx_path,
+            tmp_target,
+            _CalibrationReader(onnx_path, calibration_dir, imgsz),
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    else:
+        quantize_dynamic(onnx_path, tmp_target, weight_type=QuantType.QUInt8)
+    os.replace(tmp_target, target)
+    return target
+
+
+class _CalibrationReader:
+    """Feeds letterboxed calibration images to onnxruntime's static quantizer."""
+
+    def __init__(self, onnx_path: str, folder: str, imgsz: int, limit: int = 200) -> None:
+        import onnxruntime as ort
+
+        self.input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        exts = (".png", ".jpg", ".jpeg", ".webp")
+        self.paths = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(exts))[:limit]
+        if not self.paths:
+            raise ValueError(f"No calibration images found in {folder}")
+        self.imgsz = imgsz
+        self._iter = iter(self.paths)
+
+    def get_next(self):
+        path = next(self._iter, None)
+        if path is None:
+            return None
+        img = cv2.cvtColor(cv2.imread(path, cv2.IMREAD_COLOR), cv2.COLOR_BGR2RGB)
+        batch, _ = letterbox_batch([img], self.imgsz)
+        return {self.input_name: batch}
+
+    def rewind(self) -> None:
+        self._iter = iter(self.paths)
+
+
+def letterbox_batch(images: List[np.ndarray], imgsz: int):
+    """Letterbox RGB arrays into one NCHW float32 batch plus per-image (gain, left, top)."""
+    batch = np.full((len(images), imgsz, imgsz, 3), 114, dtype=np.uint8)
+    transforms = []
+    for i, img in enumerate(images):
+        h, w = img.shape[:2]
+        gain = min(imgsz / h, imgsz / w)
+        new_w, new_h = int(round(w * gain)), int(round(h * gain))
+        pad_x, pad_y = (imgsz - new_w) / 2, (imgsz - new_h) / 2
+        top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+        resized = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (w, h) else img
+        batch[i, top:top + new_h, left:left + new_w] = resized
+        transforms.append((gain, left, top))
+    # ultralytics treats ndarray input as BGR and reverses channels; do the same for parity
+    tensor = batch[..., ::-1].transpose(0, 3, 1, 2).astype(np.float32) / 255.0
+    return np.ascontiguousarray(tensor), transforms
+
+
+class OnnxBackend:
+    """CPU inference with onnxruntime and NumPy pre/post-processing.
+
+    Mirrors ultralytics defaults (letterbox with grey padding, conf 0.25,
+    class-aware NMS at IoU 0.7, 300 detections) so both backends produce the
+    same ``patterns``.
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        model_version: str,
+        imgsz: int = 640,
+        conf: float = 0.25,
+        iou: float = 0.7,
+        max_det: int = 300,
+        onnx_path: str | None = None,
+        precision: str = "fp32",
+        intra_threads: int | None = None,
+    ) -> None:
+        import onnxruntime as ort
+
+        self.imgsz = imgsz
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.precision = precision
+        self.onnx_path = onnx_path or export_onnx(model_path, model_version, imgsz)
+        if precision == "int8":
+            self.onnx_path = quantize_onnx(self.onnx_path, os.getenv("CHART_INT8_CALIBRATION_DIR"), imgsz)
+        elif precision != "fp32":
+            raise ValueError(f"Unsupported ONNX precision '{precision}'. Use 'fp32' or 'int8'")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if not intra_threads:
+            intra_threads = int(os.getenv("CHART_ORT_INTRA_THREADS", "0"))
+        if intra_threads > 0:
+            options.intra_op_num_threads = intra_threads
+        self.session = ort.InferenceSession(self.onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        # ultralytics stores the class map as a dict literal in the ONNX metadata
+        meta = self.session.get_modelmeta().custom_metadata_map
+        try:
+            self.names = {int(k): v for k, v in ast.literal_eval(meta.get("names", "{}")).items()}
+        except Exception:
+            self.names = {}
+
+    def predict(self, images: List[np.ndarray]) -> List[Detections]:
+        batch, transforms = self._preprocess(images)
+        output = self.session.run(None, {self.input_name: batch})[0]
+        return [self._postprocess(output[i], transforms[i], images[i].shape[:2]) for i in range(len(images))]
+
+    def _preprocess(self, images: List[np.ndarray]):
+        return letterbox_batch(images, self.imgsz)
+
+    def _postprocess(self, pred: np.ndarray, transform, shape) -> Detections:
+        # YOLOv8-style head: (4 + num_classes, anchors)
+        pred = pred.T
+        scores_all = pred[:, 4:]
+        cls = scores_all.argmax(axis=1)
+        conf = scores_all[np.arange(len(cls)), cls]
+        mask = conf > self.conf
+        if not mask.any():
+            return _empty_detections()
+        boxes = xywh_to_xyxy(pred[mask, :4])
+        conf, cls = conf[mask], cls[mask]
+        keep = batched_nms(boxes, conf, cls, self.iou)[: self.max_det]
+        boxes, conf, cls = boxes[keep], conf[keep], cls[keep]
+
+        gain, left, top = transform
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - left) / gain
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - top) / gain
+        h, w = shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+        return Detections(boxes.astype(np.float32), conf.astype(np.float32), cls.astype(np.int64))
+
+
+def _empty_detections() -> Detections:
+    return Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+
+
+def create_backend(
+    model_path: str,
+    model_version: str,
+    backend: str | None = None,
+    imgsz: int | None = None,
+    conf: float | None = None,
+    max_det: int | None = None,
+    intra_threads: int | None = None,
+):
+    """Build the backend selected by CHART_BACKEND (``ultralytics`` | ``onnx`` | ``onnx-int8``).
+
+    ``imgsz`` defaults to CHART_IMGSZ; ``conf`` and ``max_det`` to the
+    ultralytics defaults. ``intra_threads`` sizes the onnxruntime session
+    (torch threads are set by the caller's thread, see ReplicaPool).
+    """
+    backend = (backend or os.getenv("CHART_BACKEND", "ultralytics")).lower()
+    imgsz = imgsz or int(os.getenv("CHART_IMGSZ", "640"))
+    thresholds = {k: v for k, v in (("conf", conf), ("max_det", max_det)) if v is not None}
+    if backend == "ultralytics":
+        return UltralyticsBackend(model_path, imgsz=imgsz, **thresholds)
+    if backend == "onnx":
+        return OnnxBackend(model_path, model_version, imgsz=imgsz, intra_threads=intra_threads, **thresholds)
+    if backend == "onnx-int8":
+        return OnnxBackend(model_path, model_version, imgsz=imgsz, precision="int8", intra_threads=intra_threads, **thresholds)
+    raise ValueError(f"Unknown CHART_BACKEND '{backend}'. Use 'ultralytics', 'onnx' or 'onnx-int8'")
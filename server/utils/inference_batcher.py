@@ -0,0 +1,158 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Sequence
+
+
+_STOP = object()
+
+
+class BatcherClosedError(RuntimeError):
+    """Raised for items submitted to, or still queued on, a closed MicroBatcher."""
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into one batched call.
+
+    Callers block in ``submit``; a background thread gathers up to
+    ``max_batch_size`` items or waits at most ``max_wait_ms`` after the first
+    item arrives, runs ``run_batch`` once and hands each caller its own result.
+    With ``concurrency`` > 1 up to that many batches run at once, e.g. one per
+    inference worker process.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 5.0,
+        name: str = "micro-batcher",
+        concurrency: int = 1,
+    ) -> None:
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self._slots = threading.Semaphore(self.concurrency)
+        self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix=name) if self.concurrency > 1 else None
+        self._stats_lock = threading.Lock()
+        self.batches_run = 0
+        self.items_run = 0
+        self._queue: "queue.Queue[tuple[Any, Future]]" = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, item: Any, timeout: float | None = None) -> Any:
+        """Queue one item and block until its batch has been processed.
+
+        Raises BatcherClosedError once ``close`` has been called.
+        """
+        future: Future = Future()
+        with self._start_lock:
+            if self._closed:
+                raise BatcherClosedError(f"{self.name} is closed")
+            self._queue.put((item, future))
+        self._ensure_started()
+        return future.result(timeout=timeout)
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches_run,
+            'items': self.items_run,
+            'avg_batch_size': round(self.items_run / self.batches_run, 2) if self.batches_run else 0.0,
+            'queued': self._queue.qsize(),
+        }
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+
+    def close(self) -> None:
+        """Stop the collector thread and fail every item still queued.
+
+        A batch the collector has already taken still runs.
+        """
+        with self._start_lock:
+            if self._closed:
+                return
+            self._closed = True
+            pending = []
+            while True:
+                try:
+                    pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._queue.put(_STOP)
+        for entry in pending:
+            if entry is not _STOP:
+                entry[1].set_exception(BatcherClosedError(f"{self.name} closed before this item ran"))
+
+    def _collect(self) -> List[tuple]:
+        first = self._queue.get()
+        if first is _STOP:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Window closed: still take whatever is already waiting
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Run this batch, then stop at the next collect
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            if self._executor is None:
+                batch = self._collect()
+                if not batch:
+                    return
+                self._run(batch)
+                continue
+            # Wait for a free slot before collecting, so requests that arrive
+            # while all batches are busy join the next batch
+            self._slots.acquire()
+            batch = self._collect()
+            if not batch:
+                self._slots.release()
+                self._executor.shutdown(wait=False)
+                return
+            self._executor.submit(self._run_and_release, batch)
+
+    def _run_and_release(self, batch: List[tuple]) -> None:
+        try:
+            self._run(batch)
+        finally:
+            self._slots.release()
+
+    def _run(self, batch: List[tuple]) -> None:
+        items = [item for item, _ in batch]
+        try:
+            results = list(self.run_batch(items))
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name}: batch returned {len(results)} results for {len(items)} items")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._stats_lock:
+            self.batches_run += 1
+            self.items_run += len(items)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
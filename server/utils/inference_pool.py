@@ -0,0 +1,306 @@
+import functools
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from utils.inference_backends import Detections, create_backend
+from utils.metrics import metrics
+
+
+class WorkerDiedError(RuntimeError):
+    """The inference worker running a task exited before answering it."""
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a segment owned (and unlinked) by the parent process."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        # Spawned workers share the parent's resource tracker, where the
+        # segment is already registered; re-registering is a no-op.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker_main(conn, backend_factory: Callable, torch_threads: int) -> None:
+    if torch_threads > 0:
+        os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+        os.environ.setdefault("CHART_ORT_INTRA_THREADS", str(torch_threads))
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+
+    try:
+        backend = backend_factory()
+    except Exception as e:
+        conn.send(("failed", repr(e)))
+        return
+    conn.send(("ready", dict(backend.names)))
+
+    while True:
+        try:
+            segments = conn.recv()
+        except EOFError:
+            # Parent went away
+            break
+        if segments is None:
+            break
+        handles = []
+        try:
+            images = []
+            for name, shape in segments:
+                shm = _attach(name)
+                handles.append(shm)
+                images.append(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf))
+            detections = backend.predict(images)
+            del images
+            conn.send(("ok", [tuple(d) for d in detections]))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+        finally:
+            for shm in handles:
+                shm.close()
+
+
+_Worker = Tuple[int, mp.Process, object]  # (worker id, process, parent end of its pipe)
+
+
+class InferenceWorkerPool:
+    """Dedicated inference processes, each holding its own loaded model.
+
+    Images are copied once into ``multiprocessing.shared_memory`` segments and
+    only their names and shapes travel to the worker; workers send back just
+    the small detection arrays. Exposes the same ``predict`` / ``names``
+    interface as the in-process backends.
+
+    Each worker has its own pipe, fed by one thread in this process that
+    takes tasks from a shared in-process queue. So the thread always knows
+    which task its worker is running: when the worker dies (crash, OOM kill)
+    that task fails with WorkerDiedError right away, and the thread starts a
+    replacement, retrying with backoff (up to ``max_restart_delay_s``) until
+    one loads. While no worker is running, queued and new tasks fail with
+    WorkerDiedError instead of waiting. Idle workers are checked every
+    second. Nothing is shared between worker processes, so a killed one
+    cannot leave a lock held.
+    """
+
+    name = "process-pool"
+
+    def __init__(
+        self,
+        workers: int,
+        backend_factory: Callable,
+        torch_threads: int = 0,
+        start_timeout_s: float = 300.0,
+        task_timeout_s: float = 60.0,
+        max_restart_delay_s: float = 60.0,
+    ) -> None:
+        self._ctx = mp.get_context("spawn")
+        self._backend_factory = backend_factory
+        self._torch_threads = torch_threads
+        self.workers = max(1, int(workers))
+        self.start_timeout_s = start_timeout_s
+        self.task_timeout_s = task_timeout_s
+        self.max_restart_delay_s = max_restart_delay_s
+        self.restarts = 0
+        self._tasks: "queue.Queue[tuple | None]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._procs: Dict[int, mp.Process] = {}
+        self._threads: List[threading.Thread] = []
+        self._worker_ids = itertools.count()
+        self._closing = False
+        self._closed = threading.Event()
+        self._live = self.workers
+
+        # Start every worker, then wait until each has loaded its model
+        started = [self._start_worker() for _ in range(self.workers)]
+        self.names: Dict[int, str] = {}
+        try:
+            for worker in started:
+                self.names = self._await_ready(worker)
+        except Exception:
+            self.close()
+            raise
+
+        for worker in started:
+            thread = threading.Thread(target=self._serve, args=(worker,), name=f"inference-pool-{worker[0]}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def predict(self, images: List[np.ndarray]) -> List[Detections]:
+        segments = []
+        future: Future = Future()
+        try:
+            for img in images:
+                img = np.ascontiguousarray(img, dtype=np.uint8)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, img.nbytes))
+                segments.append(shm)
+                np.ndarray(img.shape, dtype=np.uint8, buffer=shm.buf)[...] = img
+            with self._lock:
+                if not self._live:
+                    raise WorkerDiedError("No inference worker is running; restarts are in progress")
+                self._tasks.put(([(shm.name, img.shape) for shm, img in zip(segments, images)], future))
+            raw = future.result(timeout=self.task_timeout_s)
+        finally:
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+        return [Detections(*d) for d in raw]
+
+    def close(self) -> None:
+        with self._lock:
+            self._closing = True
+        self._closed.set()
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        with self._lock:
+            procs = list(self._procs.values())
+        for proc in procs:
+            proc.join(timeout=5)
+            if proc.is_alive():
+                proc.terminate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            alive = sum(proc.is_alive() for proc in self._procs.values())
+            return {'workers': alive, 'serving': self._live, 'restarts': self.restarts, 'queued': self._tasks.qsize()}
+
+    def _start_worker(self) -> _Worker:
+        worker_id = next(self._worker_ids)
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self._backend_factory, self._torch_threads),
+            name=f"chart-inference-{worker_id}",
+            daemon=True,
+        )
+        proc.start()
+        # Drop our copy of the child's end so recv() sees EOF when the child dies
+        child_conn.close()
+        with self._lock:
+            self._procs[worker_id] = proc
+        return worker_id, proc, parent_conn
+
+    def _await_ready(self, worker: _Worker) -> Dict[int, str]:
+        worker_id, _, conn = worker
+        if not conn.poll(self.start_timeout_s):
+            raise RuntimeError(f"Inference worker {worker_id} did not start within {self.start_timeout_s:.0f}s")
+        try:
+            kind, payload = conn.recv()
+        except EOFError:
+            raise RuntimeError(f"Inference worker {worker_id} exited while loading its model")
+        if kind == "failed":
+            raise RuntimeError(f"Inference worker {worker_id} failed to start: {payload}")
+        return payload
+
+    def _replace(self, worker: _Worker) -> _Worker | None:
+        """Reap a dead worker and start its replacement, retrying with backoff; None once closing."""
+        worker_id, proc, conn = worker
+        proc.join(timeout=5)
+        conn.close()
+        with self._lock:
+            self._procs.pop(worker_id, None)
+            if self._closing:
+                return None
+            self._live -= 1
+            if not self._live:
+                self._fail_queued()
+        metrics.incr("inference_pool.worker_deaths")
+        print(f"Inference worker {worker_id} exited with code {proc.exitcode}; restarting it")
+        delay = 1.0
+        while True:
+            replacement = self._start_worker()
+            try:
+                self._await_ready(replacement)
+            except Exception as e:
+                metrics.incr("inference_pool.restart_failures")
+                print(f"Inference worker restart failed, retrying in {delay:.0f}s: {e}")
+                replacement[1].terminate()
+                replacement[1].join(timeout=5)
+                replacement[2].close()
+                with self._lock:
+                    self._procs.pop(replacement[0], None)
+                if self._closed.wait(delay):
+                    return None
+                delay = min(delay * 2, self.max_restart_delay_s)
+                continue
+            with self._lock:
+                if self._closing:
+                    return replacement
+                self.restarts += 1
+                self._live += 1
+            return replacement
+
+    def _fail_queued(self) -> None:
+        """With no worker left, fail what is queued rather than let it wait for a restart."""
+        while True:
+            try:
+                item = self._tasks.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                item[1].set_exception(WorkerDiedError("No inference worker is running; restarts are in progress"))
+
+    def _serve(self, worker: _Worker) -> None:
+        """Feed tasks to one worker process, replacing it when it dies."""
+        while True:
+            worker_id, proc, conn = worker
+            try:
+                item = self._tasks.get(timeout=1.0)
+            except queue.Empty:
+                if not proc.is_alive():
+                    worker = self._replace(worker)
+                    if worker is None:
+                        return
+                continue
+            if item is None:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                return
+            segments, future = item
+            if not proc.is_alive():
+                # Died while idle: hand the task on and get a new worker
+                self._tasks.put(item)
+                worker = self._replace(worker)
+                if worker is None:
+                    return
+                continue
+            try:
+                conn.send(segments)
+                kind, payload = conn.recv()
+            except (EOFError, OSError):
+                proc.join(timeout=5)
+                future.set_exception(WorkerDiedError(f"Inference worker {worker_id} exited with code {proc.exitcode}"))
+                worker = self._replace(worker)
+                if worker is None:
+                    return
+                continue
+            if kind == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Inference worker error: {payload}"))
+
+
+def create_worker_pool(model_path: str, model_version: str, workers: int, pools: int = 1, **backend_kwargs) -> InferenceWorkerPool:
+    """Pool sized from CHART_WORKER_TORCH_THREADS (default: cores split across every worker process).
+
+    ``pools`` is how many such pools this process runs (one per inference
+    profile), so the default split covers ``workers * pools`` processes
+    rather than oversubscribing the cores once per pool. ``backend_kwargs``
+    (imgsz, conf, max_det) are passed to create_backend in each worker.
+    """
+    torch_threads = int(os.getenv("CHART_WORKER_TORCH_THREADS", "0")) or max(1, (os.cpu_count() or 1) // (workers * max(1, pools)))
+    factory = functools.partial(create_backend, model_path, model_version, **backend_kwargs)
+    return InferenceWorkerPool(workers, factory, torch_threads=torch_threads)
@@ -0,0 +1,100 @@
+import os
+from datetime import datetime, timezone
+from typing import Dict, NamedTuple
+
+from db.config import db_config
+from utils.metrics import metrics
+from utils.result_cache import LRUTTLCache
+
+
+class InferenceProfile(NamedTuple):
+    """Quality tier for chart analysis: model input size, thresholds and output scale."""
+
+    name: str
+    imgsz: int
+    conf: float
+    max_det: int
+    annotation_scale: float
+
+
+def _profile_from_env(name: str, imgsz: int, conf: float, max_det: int, annotation_scale: float) -> InferenceProfile:
+    prefix = f"CHART_PROFILE_{name.upper()}_"
+    return InferenceProfile(
+        name=name,
+        imgsz=int(os.getenv(prefix + "IMGSZ", str(imgsz))),
+        conf=float(os.getenv(prefix + "CONF", str(conf))),
+        max_det=int(os.getenv(prefix + "MAX_DET", str(max_det))),
+        annotation_scale=float(os.getenv(prefix + "ANNOTATION_SCALE", str(annotation_scale))),
+    )
+
+
+# Free users get the cheap profile, premium users the accurate one
+PROFILES: Dict[str, InferenceProfile] = {
+    "fast": _profile_from_env("fast", imgsz=416, conf=0.3, max_det=100, annotation_scale=0.5),
+    "accurate": _profile_from_env("accurate", imgsz=1024, conf=0.2, max_det=300, annotation_scale=1.0),
+}
+FREE_PROFILE = os.getenv("CHART_FREE_PROFILE", "fast")
+PREMIUM_PROFILE = os.getenv("CHART_PREMIUM_PROFILE", "accurate")
+
+# users.is_premium lookups, cached briefly so analyses do not wait on Supabase each time
+plan_cache = LRUTTLCache(
+    max_entries=int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("PLAN_CACHE_TTL_SECONDS", "60")),
+    name="plan_cache",
+)
+metrics.register_collector("plan_cache", plan_cache.stats)
+
+
+def get_profile(name: str) -> InferenceProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference profile '{name}'. Use one of: {', '.join(PROFILES)}")
+
+
+def is_premium_user(user_id: str) -> bool:
+    """users.is_premium, honouring subscription_expires_at (cached; False on lookup errors)."""
+    cached = plan_cache.get(user_id)
+    if cached is not None:
+        return cached
+    premium = False
+    try:
+        res = (
+            db_config.supabase.table('users')
+            .select('is_premium, subscription_expires_at')
+            .eq('id', user_id)
+            .limit(1)
+            .execute()
+        )
+        row = (res.data or [None])[0]
+        if row and row.get('is_premium'):
+            premium = not _expired(row.get('subscription_expires_at'))
+    except Exception:
+        metrics.incr("plan_cache.lookup_errors")
+        return False
+    plan_cache.set(user_id, premium)
+    return premium
+
+
+def _expired(expires_at: str | None) -> bool:
+    if not expires_at:
+        return False
+    try:
+        when = datetime.fromisoformat(expires_at.replace('Z', '+00:00'))
+    except ValueError:
+        # Unparseable expiry: trust is_premium
+        return False
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return when <= datetime.now(timezone.utc)
+
+
+def forget_user_plan(user_id: str) -> None:
+    """Drop a cached plan, e.g. right after a purchase upgrades the user."""
+    plan_cache.delete(user_id)
+
+
+def profile_for_user(user_id: str | None) -> InferenceProfile:
+    if user_id and is_premium_user(user_id):
+        return get_profile(PREMIUM_PROFILE)
+    return get_profile(FREE_PROFILE)
@@ -0,0 +1,204 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, NamedTuple
+
+from utils.inference_profiles import is_premium_user
+from utils.metrics import metrics
+
+PREMIUM = 'premium'
+FREE = 'free'
+ANONYMOUS = 'anonymous'
+# Highest priority first
+PRIORITY_CLASSES = (PREMIUM, FREE, ANONYMOUS)
+
+_DEFAULT_DEADLINES_S = {PREMIUM: 30.0, FREE: 20.0, ANONYMOUS: 10.0}
+
+
+class Priority(NamedTuple):
+    """Scheduling class of a request and the key it shares fairly with (user id or client IP)."""
+
+    cls: str
+    user: str
+
+
+class SchedulerDeadlineError(RuntimeError):
+    """A request waited past its class deadline; its client has most likely given up."""
+
+    def __init__(self, priority_class: str, retry_after_s: int) -> None:
+        super().__init__("Server busy, chart analysis timed out in queue")
+        self.priority_class = priority_class
+        self.retry_after_s = retry_after_s
+
+
+def request_priority(user_id: str | None, client_key: str | None) -> Priority:
+    """Premium for users with an active subscription, free for other signed-in users, else anonymous."""
+    if user_id:
+        return Priority(PREMIUM if is_premium_user(user_id) else FREE, user_id)
+    return Priority(ANONYMOUS, client_key or '')
+
+
+class _Waiter:
+    __slots__ = ('priority', 'enqueued_at', 'deadline', 'event', 'granted')
+
+    def __init__(self, priority: Priority, limit_s: float | None) -> None:
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.deadline = None if limit_s is None else self.enqueued_at + limit_s
+        self.event = threading.Event()
+        self.granted = False
+
+
+class PriorityScheduler:
+    """Grants a fixed number of inference slots, premium first and fair-share within a class.
+
+    Waiting requests are served strictly by class (premium, then free, then
+    anonymous). Within a class, users take turns round-robin, so one user
+    with many queued uploads gets one slot per turn rather than the whole
+    queue. A request still waiting when its class deadline passes is dropped
+    with SchedulerDeadlineError instead of running for a client that has
+    likely gone away.
+    """
+
+    def __init__(self, slots: int, deadlines_s: Dict[str, float] | None = None, name: str = 'scheduler') -> None:
+        self.slots = max(1, int(slots))
+        self.deadlines_s = {**_DEFAULT_DEADLINES_S, **(deadlines_s or {})}
+        self.name = name
+        self._lock = threading.Lock()
+        self._free = self.slots
+        # class -> user -> waiters in arrival order; user order is the round-robin turn
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Waiter]]"] = {cls: OrderedDict() for cls in PRIORITY_CLASSES}
+        self._queued = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._granted = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._dropped = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._avg_hold_s = 0.0
+
+    @contextmanager
+    def slot(self, priority: Priority, deadline: bool = True) -> Iterator[None]:
+        """Hold one inference slot for the body of the ``with`` block.
+
+        With ``deadline`` False the caller waits as long as it takes (for
+        background jobs, whose clients poll).
+        """
+        release = self.acquire(priority, deadline)
+        try:
+            yield
+        finally:
+            release()
+
+    def acquire(self, priority: Priority, deadline: bool = True) -> Callable[[], None]:
+        """Wait for one slot and return the callable that gives it back.
+
+        For work that starts on another thread: the wait (and its deadline)
+        happens here, and the release may be called from any thread.
+        """
+        self._acquire(priority, deadline)
+        start = time.monotonic()
+        return lambda: self._release(time.monotonic() - start)
+
+    def _acquire(self, priority: Priority, deadline: bool) -> None:
+        if priority.cls not in self._queues:
+            raise ValueError(f"Unknown priority class '{priority.cls}'")
+        limit_s = self.deadlines_s[priority.cls] if deadline else None
+        with self._lock:
+            # Slots are handed straight to waiters on release, so a free slot means nobody is waiting
+            if self._free > 0:
+                self._free -= 1
+                self._granted[priority.cls] += 1
+                metrics.observe(f'{self.name}.wait.{priority.cls}', 0.0)
+                return
+            waiter = _Waiter(priority, limit_s)
+            self._queues[priority.cls].setdefault(priority.user, deque()).append(waiter)
+            self._queued[priority.cls] += 1
+
+        waiter.event.wait(limit_s)
+        with self._lock:
+            granted = waiter.granted
+            if not granted:
+                self._remove(waiter)
+                self._dropped[priority.cls] += 1
+                retry_after = self._retry_after()
+        if not granted:
+            metrics.incr(f'{self.name}.dropped.{priority.cls}')
+            raise SchedulerDeadlineError(priority.cls, retry_after)
+        metrics.observe(f'{self.name}.wait.{priority.cls}', time.monotonic() - waiter.enqueued_at)
+
+    def _release(self, held_s: float) -> None:
+        with self._lock:
+            self._avg_hold_s = held_s if not self._avg_hold_s else 0.9 * self._avg_hold_s + 0.1 * held_s
+            waiter = self._next_waiter()
+            if waiter is None:
+                self._free += 1
+                return
+            waiter.granted = True
+            self._granted[waiter.priority.cls] += 1
+        waiter.event.set()
+
+    def _next_waiter(self) -> _Waiter | None:
+        now = time.monotonic()
+        for cls in PRIORITY_CLASSES:
+            users = self._queues[cls]
+            while users:
+                user, waiters = next(iter(users.items()))
+                waiter = waiters.popleft()
+                self._queued[cls] -= 1
+                # This user's turn is used; the next one goes to the following user
+                if waiters:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                if waiter.deadline is not None and waiter.deadline <= now:
+                    # Expired: its own wait times out and reports the drop
+                    continue
+                return waiter
+        return None
+
+    def _remove(self, waiter: _Waiter) -> None:
+        users = self._queues[waiter.priority.cls]
+        waiters = users.get(waiter.priority.user)
+        if waiters is None or waiter not in waiters:
+            return
+        waiters.remove(waiter)
+        self._queued[waiter.priority.cls] -= 1
+        if not waiters:
+            del users[waiter.priority.user]
+
+    def _retry_after(self) -> int:
+        queued = sum(self._queued.values())
+        return max(1, round(self._avg_hold_s * (queued + 1) / self.slots))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'busy': self.slots - self._free,
+                **{
+                    cls: {
+                        'queued': self._queued[cls],
+                        'users_waiting': len(self._queues[cls]),
+                        'granted': self._granted[cls],
+                        'dropped': self._dropped[cls],
+                    }
+                    for cls in PRIORITY_CLASSES
+                },
+            }
+
+
+def _default_slots() -> int:
+    # Enough concurrent detections to fill a micro-batch on every replica
+    replicas = max(1, int(os.getenv('CHART_MODEL_REPLICAS', '1')), int(os.getenv('CHART_WORKER_PROCESSES', '0')))
+    return replicas * max(1, int(os.getenv('CHART_BATCH_MAX_SIZE', '8')))
+
+
+# Gate in front of the chart analyzer for request-driven analyses
+inference_scheduler = PriorityScheduler(
+    slots=int(os.getenv('ANALYSIS_SCHED_SLOTS', '0')) or _default_slots(),
+    deadlines_s={
+        cls: float(os.getenv(f'ANALYSIS_SCHED_DEADLINE_{cls.upper()}_S', str(default)))
+        for cls, default in _DEFAULT_DEADLINES_S.items()
+    },
+    name='scheduler',
+)
+metrics.register_collector('scheduler', inference_scheduler.stats)
@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Tuple
+
+from utils.metrics import metrics
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class QueueFullError(RuntimeError):
+    """The job queue is at capacity; the caller should retry later."""
+
+    def __init__(self, retry_after_s: int) -> None:
+        super().__init__("Analysis queue is full, retry later")
+        self.retry_after_s = retry_after_s
+
+
+class Job:
+    """One queued unit of work and the ordered stage events it has produced.
+
+    Events are numbered from 1 so SSE clients can resume with Last-Event-ID.
+    """
+
+    def __init__(self, owner: str | None = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.status = JOB_QUEUED
+        self.result: Any = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self._events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def add_event(self, event: str, data: Dict[str, Any]) -> None:
+        with self._cond:
+            self._events.append((len(self._events) + 1, event, data))
+            self._cond.notify_all()
+
+    def _set_status(self, status: str, data: Dict[str, Any]) -> None:
+        with self._cond:
+            self.status = status
+            if self.finished:
+                self.finished_at = time.time()
+            self._events.append((len(self._events) + 1, status, data))
+            self._cond.notify_all()
+
+    def events_after(self, last_id: int = 0, timeout: float | None = None) -> List[Tuple[int, str, Dict[str, Any]]]:
+        """Events newer than ``last_id``, waiting up to ``timeout`` for one to arrive."""
+        with self._cond:
+            if len(self._events) <= last_id and not self.finished and timeout:
+                self._cond.wait(timeout)
+            return self._events[last_id:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._cond:
+            # Stage payloads received so far, so pollers can render partial results
+            partial: Dict[str, Any] = {}
+            for _, event, data in self._events:
+                if event not in (JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_FAILED):
+                    partial.update(data)
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'stages': [event for _, event, _ in self._events],
+                'partial': partial,
+                'result': self.result,
+                'error': self.error,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class JobQueue:
+    """Bounded in-process job queue served by a small pool of worker threads.
+
+    ``submit`` never blocks: when ``max_queued`` jobs are already waiting it
+    raises QueueFullError so the route can answer 503 immediately. Finished
+    jobs are kept for ``ttl_seconds`` for polling and then dropped.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Job, Any], Any],
+        workers: int = 2,
+        max_queued: int = 32,
+        ttl_seconds: float = 600.0,
+        name: str = 'jobs',
+    ) -> None:
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.max_queued = max(1, int(max_queued))
+        self.ttl_seconds = float(ttl_seconds)
+        self.name = name
+        self._queue: "queue.Queue[tuple[Job, Any]]" = queue.Queue(maxsize=self.max_queued)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._running = 0
+        self._completed = 0
+        self._busy_seconds = 0.0
+
+    def submit(self, payload: Any, owner: str | None = None) -> Job:
+        self._ensure_started()
+        self._purge_expired()
+        job = Job(owner)
+        job.add_event(JOB_QUEUED, {'position': self._queue.qsize() + 1})
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait((job, payload))
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            metrics.incr(f'{self.name}.rejected')
+            raise QueueFullError(self.retry_after())
+        metrics.incr(f'{self.name}.submitted')
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up, for the Retry-After header."""
+        with self._lock:
+            avg = self._busy_seconds / self._completed if self._completed else 1.0
+        return max(1, round(avg * (self._queue.qsize() + 1) / self.workers))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'queued': self._queue.qsize(),
+                'running': self._running,
+                'tracked_jobs': len(self._jobs),
+                'completed': self._completed,
+                'avg_job_ms': round(self._busy_seconds / self._completed * 1000, 1) if self._completed else 0.0,
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+            }
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if not self._threads:
+                for i in range(self.workers):
+                    t = threading.Thread(target=self._loop, name=f'{self.name}-{i}', daemon=True)
+                    t.start()
+                    self._threads.append(t)
+
+    def _loop(self) -> None:
+        while True:
+            job, payload = self._queue.get()
+            metrics.observe(f'{self.name}.queue_wait', time.time() - job.created_at)
+            with self._lock:
+                self._running += 1
+            job._set_status(JOB_RUNNING, {})
+            start = time.perf_counter()
+            try:
+                job.result = self.handler(job, payload)
+                job._set_status(JOB_DONE, {'result': job.result})
+            except Exception as e:
+                job.error = str(e)
+                metrics.incr(f'{self.name}.failed')
+                job._set_status(JOB_FAILED, {'error': job.error})
+            finally:
+                payload = None
+                elapsed = time.perf_counter() - start
+                metrics.observe(f'{self.name}.run', elapsed)
+                with self._lock:
+                    self._running -= 1
+                    self._completed += 1
+                    self._busy_seconds += elapsed
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [jid for jid, job in self._jobs.items() if job.finished_at is not None and job.finished_at < cutoff]
+            for jid in expired:
+                del self._jobs[jid]
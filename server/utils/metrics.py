@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+
+class Metrics:
+    """In-process counters, gauges and timing summaries exposed on /api/metrics."""
+
+    def __init__(self, window: int = 1024) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, deque] = {}
+        self._timing_counts: Dict[str, int] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._timings.get(name)
+            if samples is None:
+                samples = self._timings[name] = deque(maxlen=self.window)
+            samples.append(seconds)
+            self._timing_counts[name] = self._timing_counts.get(name, 0) + 1
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def register_collector(self, name: str, collect: Callable[[], Dict[str, Any]]) -> None:
+        """Attach a callable whose dict is included in every snapshot under ``name``."""
+        with self._lock:
+            self._collectors[name] = collect
+
+    def counter(self, name: str) -> float:
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: (list(samples), self._timing_counts.get(name, 0)) for name, samples in self._timings.items()}
+            collectors = dict(self._collectors)
+
+        timing_summary: Dict[str, Dict[str, float]] = {}
+        for name, (samples, count) in timings.items():
+            ordered = sorted(samples)
+            n = len(ordered)
+            timing_summary[name] = {
+                'count': count,
+                'avg_ms': round(sum(ordered) / n * 1000.0, 2) if n else 0.0,
+                'p50_ms': round(ordered[int(0.50 * (n - 1))] * 1000.0, 2) if n else 0.0,
+                'p99_ms': round(ordered[int(0.99 * (n - 1))] * 1000.0, 2) if n else 0.0,
+            }
+
+        collected: Dict[str, Any] = {}
+        for name, collect in collectors.items():
+            try:
+                collected[name] = collect()
+            except Exception as e:
+                collected[name] = {'error': str(e)}
+
+        return {
+            'counters': counters,
+            'gauges': gauges,
+            'timings': timing_summary,
+            **collected,
+        }
+
+
+# Global metrics registry
+metrics = Metrics()
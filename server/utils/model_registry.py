@@ -0,0 +1,273 @@
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+from utils.inference_profiles import FREE_PROFILE, PROFILES, InferenceProfile, get_profile
+from utils.metrics import metrics
+from utils.yolo_service import YoloChartAnalyzer, get_model_version, resolve_model_path
+
+
+class ModelGeneration:
+    """One loaded version of the chart model: an analyzer per inference profile, built lazily.
+
+    Requests hold the generation between ``acquire`` and ``release``. Once
+    ``retire`` is called no new holder is admitted, and the analyzers are
+    closed when the last one releases.
+    """
+
+    def __init__(self, model_path: str, shadow: bool = False) -> None:
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found at '{model_path}'")
+        self.model_path = model_path
+        self.version = get_model_version(model_path)
+        self.shadow = shadow
+        self.loaded_at = time.time()
+        self._analyzers: Dict[str, YoloChartAnalyzer] = {}
+        self._lock = threading.Lock()
+        self._users = 0
+        self._retiring = False
+        self.closed = False
+
+    def analyzer(self, profile: InferenceProfile) -> YoloChartAnalyzer:
+        analyzer = self._analyzers.get(profile.name)
+        if analyzer is None:
+            with self._lock:
+                analyzer = self._analyzers.get(profile.name)
+                if analyzer is None:
+                    analyzer = YoloChartAnalyzer(profile, model_path=self.model_path, shadow=self.shadow)
+                    self._analyzers[profile.name] = analyzer
+        return analyzer
+
+    def load(self, warmup_runs: int) -> None:
+        """Build and warm every profile's analyzer."""
+        for name in PROFILES:
+            analyzer = self.analyzer(get_profile(name))
+            if warmup_runs > 0:
+                analyzer.warm_up(warmup_runs)
+
+    def acquire(self) -> bool:
+        """Register one in-flight user; False once the generation is retiring."""
+        with self._lock:
+            if self._retiring:
+                return False
+            self._users += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._users -= 1
+            idle = self._retiring and self._users == 0
+        if idle:
+            self.close()
+
+    def retire(self) -> None:
+        """Admit no new users and close as soon as the in-flight ones have released."""
+        with self._lock:
+            self._retiring = True
+            idle = self._users == 0
+        if idle:
+            self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            analyzers, self._analyzers = list(self._analyzers.values()), {}
+        for analyzer in analyzers:
+            try:
+                analyzer.close()
+            except Exception as e:
+                print(f"Model retire warning ({self.version}): {e}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'model_version': self.version,
+            'model_path': self.model_path,
+            'loaded_at': self.loaded_at,
+            'profiles': sorted(self._analyzers),
+            'in_flight': self._users,
+        }
+
+
+class ModelRegistry:
+    """Holds the model generation serving requests and swaps in new ones without downtime.
+
+    ``reload`` loads and warms a new version in the background while the
+    current one keeps serving, then switches atomically. Requests that
+    leased the old generation finish on it; it is closed when the last of
+    them releases it. A shadow generation can run alongside on a sample of
+    traffic to compare latency and detections before promoting it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._current: ModelGeneration | None = None
+        self._shadow: ModelGeneration | None = None
+        self._reload: Dict[str, Any] = {'state': 'idle'}
+        self.shadow_sample_rate = float(os.getenv('CHART_SHADOW_SAMPLE_RATE', '0.1'))
+        # One comparison at a time; samples arriving while it is busy are skipped
+        self._shadow_slot = threading.Semaphore(1)
+        self._shadow_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-shadow')
+        self._shadow_stats: Counter = Counter()
+
+    def current(self) -> ModelGeneration:
+        generation = self._current
+        if generation is None:
+            with self._lock:
+                if self._current is None:
+                    self._current = ModelGeneration(resolve_model_path())
+                generation = self._current
+        return generation
+
+    def acquire(self) -> ModelGeneration:
+        """The current generation, held until ``release`` is called on it."""
+        while True:
+            generation = self.current()
+            if generation.acquire():
+                return generation
+            # Swapped out between the read and the acquire; take the new one
+
+    @contextmanager
+    def lease(self) -> Iterator[ModelGeneration]:
+        """``acquire`` / ``release`` around a block."""
+        generation = self.acquire()
+        try:
+            yield generation
+        finally:
+            generation.release()
+
+    @staticmethod
+    def resolve_profile(profile: InferenceProfile | str | None = None) -> InferenceProfile:
+        """A profile or its name (default CHART_FREE_PROFILE) as an InferenceProfile."""
+        if profile is None:
+            profile = FREE_PROFILE
+        if isinstance(profile, str):
+            profile = get_profile(profile)
+        return profile
+
+    def get_analyzer(self, profile: InferenceProfile | str | None = None) -> YoloChartAnalyzer:
+        return self.current().analyzer(self.resolve_profile(profile))
+
+    def reload(self, model_path: str | None = None, shadow: bool = False) -> Dict[str, Any]:
+        """Start loading ``model_path`` (default CHART_MODEL_PATH) in the background.
+
+        With ``shadow`` the new version is compared against live traffic
+        instead of serving it. Raises RuntimeError if a reload is already
+        running and FileNotFoundError for a missing file.
+        """
+        model_path = model_path or resolve_model_path()
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found at '{model_path}'")
+        with self._lock:
+            if self._reload['state'] == 'loading':
+                raise RuntimeError('A model reload is already in progress')
+            self._reload = {'state': 'loading', 'model_path': model_path, 'shadow': shadow, 'started_at': time.time()}
+            reload_state = dict(self._reload)
+        threading.Thread(target=self._load, args=(model_path, shadow), name='model-reload', daemon=True).start()
+        return reload_state
+
+    def stop_shadow(self) -> bool:
+        with self._lock:
+            generation, self._shadow = self._shadow, None
+        if generation is None:
+            return False
+        self._retire(generation)
+        return True
+
+    def _load(self, model_path: str, shadow: bool) -> None:
+        start = time.perf_counter()
+        try:
+            generation = ModelGeneration(model_path, shadow=shadow)
+            generation.load(int(os.getenv('CHART_WARMUP_RUNS', '2')))
+        except Exception as e:
+            metrics.incr('model_registry.reload_errors')
+            with self._lock:
+                self._reload = {**self._reload, 'state': 'failed', 'error': str(e), 'finished_at': time.time()}
+            print(f"Model reload failed for {model_path}: {e}")
+            return
+
+        with self._lock:
+            if shadow:
+                previous, self._shadow = self._shadow, generation
+                self._shadow_stats.clear()
+            else:
+                previous, self._current = self._current, generation
+            self._reload = {**self._reload, 'state': 'idle', 'model_version': generation.version, 'finished_at': time.time()}
+        metrics.incr('model_registry.reloads')
+        metrics.observe('model_registry.reload', time.perf_counter() - start)
+        role = 'shadow' if shadow else 'serving'
+        print(f"✅ Model {generation.version} now {role} (loaded in {time.perf_counter() - start:.2f}s)")
+        if previous is not None:
+            self._retire(previous)
+
+    def _retire(self, generation: ModelGeneration) -> None:
+        # Requests still holding the old generation finish on it; the last one closes it
+        generation.retire()
+
+    def maybe_shadow(self, img_np: np.ndarray, profile: InferenceProfile, patterns: List[Dict[str, Any]]) -> None:
+        """Compare the shadow model against ``patterns`` for a sample of requests, in the background."""
+        generation = self._shadow
+        if generation is None or random.random() >= self.shadow_sample_rate:
+            return
+        if not self._shadow_slot.acquire(blocking=False):
+            metrics.incr('shadow.skipped')
+            return
+        if not generation.acquire():
+            # Stopped or replaced since it was read
+            self._shadow_slot.release()
+            return
+        self._shadow_executor.submit(self._compare, generation, img_np, profile, patterns)
+
+    def _compare(self, generation: ModelGeneration, img_np: np.ndarray, profile: InferenceProfile, patterns: List[Dict[str, Any]]) -> None:
+        try:
+            start = time.perf_counter()
+            shadow_patterns = generation.analyzer(profile).predict_batch([img_np])[0]
+            metrics.observe('shadow.latency', time.perf_counter() - start)
+            expected = Counter(p['pattern'] for p in patterns)
+            got = Counter(p['pattern'] for p in shadow_patterns)
+            agree = expected == got
+            metrics.incr('shadow.compared')
+            metrics.incr('shadow.agree' if agree else 'shadow.disagree')
+            with self._lock:
+                self._shadow_stats['compared'] += 1
+                self._shadow_stats['agree'] += int(agree)
+                self._shadow_stats['primary_detections'] += len(patterns)
+                self._shadow_stats['shadow_detections'] += len(shadow_patterns)
+        except Exception:
+            metrics.incr('shadow.errors')
+        finally:
+            generation.release()
+            self._shadow_slot.release()
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            current, shadow = self._current, self._shadow
+            reload_state = dict(self._reload)
+            stats = dict(self._shadow_stats)
+        shadow_status = None
+        if shadow is not None:
+            compared = stats.get('compared', 0)
+            shadow_status = {
+                **shadow.to_dict(),
+                'sample_rate': self.shadow_sample_rate,
+                'compared': compared,
+                'agreement_rate': round(stats.get('agree', 0) / compared, 4) if compared else None,
+                'primary_detections': stats.get('primary_detections', 0),
+                'shadow_detections': stats.get('shadow_detections', 0),
+            }
+        return {
+            'current': current.to_dict() if current is not None else None,
+            'shadow': shadow_status,
+            'reload': reload_state,
+        }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from utils.inference_profiles import PROFILES
+from utils.metrics import metrics
+from utils.model_registry import model_registry
+
+READY = 'ready'
+WARMING = 'warming'
+FAILED = 'failed'
+STARTING = 'starting'
+
+
+class Readiness:
+    """Whether this process has its models loaded and warmed, for /api/ready."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.status = STARTING
+        self.error: str | None = None
+        self.started_at = time.time()
+        self.ready_at: float | None = None
+        self.profiles: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def set(self, status: str, error: str | None = None) -> None:
+        with self._lock:
+            self.status = status
+            self.error = error
+            if status == READY:
+                self.ready_at = time.time()
+
+    def record_profile(self, name: str, **timings: Any) -> None:
+        with self._lock:
+            self.profiles[name] = timings
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'status': self.status,
+                'error': self.error,
+                'startup_s': round((self.ready_at or time.time()) - self.started_at, 3),
+                'profiles': dict(self.profiles),
+            }
+
+
+readiness = Readiness()
+
+
+def warm_up_models(runs: int | None = None) -> None:
+    """Load the analyzer of every profile and warm it; updates ``readiness``."""
+    runs = int(os.getenv('CHART_WARMUP_RUNS', '2')) if runs is None else runs
+    readiness.set(WARMING)
+    try:
+        for name in PROFILES:
+            start = time.perf_counter()
+            analyzer = model_registry.get_analyzer(name)
+            loaded = time.perf_counter()
+            if runs > 0:
+                analyzer.warm_up(runs)
+            warmed = time.perf_counter()
+            metrics.observe(f'startup.load.{name}', loaded - start)
+            metrics.observe(f'startup.warmup.{name}', warmed - loaded)
+            readiness.record_profile(name, load_s=round(loaded - start, 3), warmup_s=round(warmed - loaded, 3))
+            print(f"✅ Chart model ready for profile '{name}' (load {loaded - start:.2f}s, warm-up {warmed - loaded:.2f}s)")
+    except Exception as e:
+        readiness.set(FAILED, str(e))
+        print(f"Model warm-up failed: {e}")
+        return
+    readiness.set(READY)
+    shadow_path = os.getenv('CHART_SHADOW_MODEL_PATH')
+    if shadow_path:
+        try:
+            model_registry.reload(shadow_path, shadow=True)
+        except Exception as e:
+            print(f"Shadow model not started: {e}")
+
+
+def start_warmup() -> threading.Thread | None:
+    """Load and warm models in the background at startup (CHART_EAGER_LOAD, default true).
+
+    With eager loading off, models load lazily on first use and the process
+    reports ready immediately.
+    """
+    if os.getenv('CHART_EAGER_LOAD', 'true').lower() != 'true':
+        readiness.set(READY)
+        return None
+    thread = threading.Thread(target=warm_up_models, name='model-warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,300 @@
+import atexit
+import json
+import os
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+_CHUNKS = 4
+_CHUNK_BITS = 16
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+_FILE_MAGIC = 'chartai-phash-v2'
+_THUMB_SIDE = 24
+_THUMB_BYTES = _THUMB_SIDE * _THUMB_SIDE
+
+
+def dhash(img_np: np.ndarray) -> int:
+    """64-bit difference hash of an RGB array (horizontal gradients on a 9x8 grid)."""
+    gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY) if img_np.ndim == 3 else img_np
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def phash(img_np: np.ndarray) -> int:
+    """64-bit DCT perceptual hash; more tolerant of recompression than dHash."""
+    gray = cv2.cvtColor(img_np, cv2.COLOR_RGB2GRAY) if img_np.ndim == 3 else img_np
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+HASHERS = {'dhash': dhash, 'phash': phash}
+
+
+def thumbnail(img_np: np.ndarray) -> bytes:
+    """24x24 grayscale of the chart's central 80%, for confirming hash matches.
+
+    The margins are left out so an added status bar or a small crop does not
+    dominate the comparison.
+    """
+    height, width = img_np.shape[:2]
+    dy, dx = height // 10, width // 10
+    center = np.ascontiguousarray(img_np[dy:height - dy or None, dx:width - dx or None])
+    gray = cv2.cvtColor(center, cv2.COLOR_RGB2GRAY) if center.ndim == 3 else center
+    return cv2.resize(gray, (_THUMB_SIDE, _THUMB_SIDE), interpolation=cv2.INTER_AREA).tobytes()
+
+
+def _correlation(a: bytes, b: bytes) -> float:
+    x = np.frombuffer(a, dtype=np.uint8).astype(np.float32)
+    y = np.frombuffer(b, dtype=np.uint8).astype(np.float32)
+    x -= x.mean()
+    y -= y.mean()
+    denom = float(np.sqrt((x * x).sum() * (y * y).sum()))
+    return float((x * y).sum()) / denom if denom else 0.0
+
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _popcount64(values: np.ndarray) -> np.ndarray:
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return _POPCOUNT8[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def _chunks(h: int) -> List[int]:
+    return [(h >> (i * _CHUNK_BITS)) & _CHUNK_MASK for i in range(_CHUNKS)]
+
+
+def _neighbours(value: int, radius: int) -> List[int]:
+    """All chunk values within ``radius`` bit flips of ``value``."""
+    out = [value]
+    frontier = [(value, -1)]
+    for _ in range(radius):
+        nxt = []
+        for v, last_bit in frontier:
+            for bit in range(last_bit + 1, _CHUNK_BITS):
+                flipped = v ^ (1 << bit)
+                out.append(flipped)
+                nxt.append((flipped, bit))
+        frontier = nxt
+    return out
+
+
+class PerceptualHashIndex:
+    """Multi-index hash table over 64-bit perceptual hashes.
+
+    Each hash is split into four 16-bit chunks with one table per chunk. By the
+    pigeonhole principle any hash within Hamming distance ``r`` of a query
+    agrees with it on some chunk up to ``r // 4`` bits, so a lookup only probes
+    a handful of buckets and verifies the few candidates with a popcount.
+    Buckets hold compact ``array('I')`` id lists so millions of entries fit in
+    a few hundred MB. Distances up to 11 bits are supported.
+
+    With ``max_entries`` the index is a ring: once full, each new entry
+    replaces the oldest one. Entries added with a ``thumbnail`` are only
+    returned for queries whose thumbnail correlates with theirs at least
+    ``min_correlation``; a 64-bit hash is too coarse to tell every pair of
+    charts apart on its own.
+    """
+
+    MAX_SUPPORTED_DISTANCE = 11
+
+    def __init__(
+        self,
+        max_distance: int = 2,
+        model_version: str = '',
+        max_entries: int = 0,
+        min_correlation: float = 0.9,
+    ) -> None:
+        self.max_distance = self._check_distance(max_distance)
+        self.model_version = model_version
+        self.max_entries = max(0, int(max_entries))
+        self.min_correlation = float(min_correlation)
+        self.rejected = 0
+        self._lock = threading.RLock()
+        self._hashes = array('Q')
+        self._payloads: List[Any] = []
+        self._thumbs: List[bytes | None] = []
+        self._tables: List[Dict[int, array]] = [dict() for _ in range(_CHUNKS)]
+        # Slot the next entry overwrites once the ring is full
+        self._next = 0
+        self._dirty = False
+        self._autosave_stop = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def add(self, h: int, payload: Any, thumb: bytes | None = None) -> None:
+        with self._lock:
+            self._insert(h, payload, thumb)
+            self._dirty = True
+
+    def lookup(self, h: int, max_distance: Optional[int] = None, thumb: bytes | None = None) -> Optional[Tuple[int, Any]]:
+        """Return ``(distance, payload)`` of the closest entry within range, or None.
+
+        With a ``thumb``, candidates are tried closest first and the first whose
+        stored thumbnail matches is returned.
+        """
+        radius = self.max_distance if max_distance is None else self._check_distance(max_distance)
+        probe_radius = radius // _CHUNKS
+        with self._lock:
+            buckets = []
+            for i, chunk in enumerate(_chunks(h)):
+                table = self._tables[i]
+                for key in _neighbours(chunk, probe_radius):
+                    ids = table.get(key)
+                    if ids is not None:
+                        buckets.append(np.frombuffer(ids, dtype=np.uint32))
+            if not buckets:
+                return None
+            candidates = np.concatenate(buckets)
+            # Verify all candidates at once; duplicates across tables are harmless here
+            hashes = np.frombuffer(self._hashes, dtype=np.uint64)
+            distances = _popcount64(hashes[candidates] ^ np.uint64(h))
+            # Release the buffer views before unlocking so add() can grow the arrays
+            del buckets, hashes
+            if thumb is None:
+                best = int(np.argmin(distances))
+                distance = int(distances[best])
+                if distance > radius:
+                    return None
+                return distance, self._payloads[int(candidates[best])]
+            in_range = np.flatnonzero(distances <= radius)
+            seen = set()
+            for pos in in_range[np.argsort(distances[in_range], kind='stable')]:
+                idx = int(candidates[pos])
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                stored = self._thumbs[idx]
+                if stored is not None and _correlation(stored, thumb) >= self.min_correlation:
+                    return int(distances[pos]), self._payloads[idx]
+            if in_range.size:
+                self.rejected += 1
+            return None
+
+    def save(self, path: str) -> None:
+        """Write the index atomically, oldest entry first.
+
+        Layout: JSON header, raw hashes, raw thumbnails (zeros where an entry
+        has none), one JSON payload per line.
+        """
+        with self._lock:
+            order = list(range(self._next, len(self._hashes))) + list(range(self._next))
+            hashes = array('Q', (self._hashes[i] for i in order))
+            thumbs = [self._thumbs[i] or bytes(_THUMB_BYTES) for i in order]
+            payloads = [self._payloads[i] for i in order]
+            self._dirty = False
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as fh:
+            header = {'magic': _FILE_MAGIC, 'model_version': self.model_version, 'count': len(hashes)}
+            fh.write(json.dumps(header).encode('utf-8') + b'\n')
+            fh.write(hashes.tobytes())
+            fh.write(b''.join(thumbs))
+            for payload in payloads:
+                fh.write(json.dumps(payload, separators=(',', ':')).encode('utf-8') + b'\n')
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> int:
+        """Load entries saved by ``save``.
+
+        Entries from another model version, or from an older file format
+        without thumbnails, are ignored.
+        """
+        with open(path, 'rb') as fh:
+            header = json.loads(fh.readline())
+            magic = str(header.get('magic', ''))
+            if not magic.startswith('chartai-phash-'):
+                raise ValueError(f"Not a perceptual hash index file: {path}")
+            if magic != _FILE_MAGIC or header.get('model_version') != self.model_version:
+                return 0
+            count = int(header['count'])
+            hashes = array('Q')
+            hashes.frombytes(fh.read(count * hashes.itemsize))
+            thumbs = fh.read(count * _THUMB_BYTES)
+            payloads = [json.loads(line) for line in fh]
+        if len(payloads) != count or len(thumbs) != count * _THUMB_BYTES:
+            raise ValueError(f"Corrupt perceptual hash index file: {path}")
+        with self._lock:
+            for i, (h, payload) in enumerate(zip(hashes, payloads)):
+                self._insert(h, payload, thumbs[i * _THUMB_BYTES:(i + 1) * _THUMB_BYTES])
+        return count
+
+    def autosave(self, path: str, interval_s: float = 300.0) -> None:
+        """Persist to ``path`` every ``interval_s`` seconds when changed, and at exit."""
+        def save_if_dirty() -> None:
+            if self._dirty and not self._autosave_stop.is_set():
+                try:
+                    self.save(path)
+                except Exception as e:
+                    print(f"Perceptual hash index save warning: {e}")
+
+        def loop() -> None:
+            while not self._autosave_stop.wait(interval_s):
+                save_if_dirty()
+
+        threading.Thread(target=loop, name='phash-autosave', daemon=True).start()
+        atexit.register(save_if_dirty)
+
+    def stop_autosave(self) -> None:
+        """Stop periodic and at-exit saving, e.g. when a newer model replaces this index."""
+        self._autosave_stop.set()
+
+    def _check_distance(self, distance: int) -> int:
+        distance = int(distance)
+        if not 0 <= distance <= self.MAX_SUPPORTED_DISTANCE:
+            raise ValueError(f"Hamming distance must be between 0 and {self.MAX_SUPPORTED_DISTANCE}, got {distance}")
+        return distance
+
+    def _insert(self, h: int, payload: Any, thumb: bytes | None = None) -> None:
+        if self.max_entries and len(self._hashes) >= self.max_entries:
+            # Full: overwrite the oldest slot and drop it from the chunk tables
+            idx = self._next
+            self._next = (idx + 1) % len(self._hashes)
+            for i, chunk in enumerate(_chunks(self._hashes[idx])):
+                ids = self._tables[i][chunk]
+                ids.remove(idx)
+                if not ids:
+                    del self._tables[i][chunk]
+            self._hashes[idx] = h
+            self._payloads[idx] = payload
+            self._thumbs[idx] = thumb
+        else:
+            idx = len(self._hashes)
+            self._hashes.append(h)
+            self._payloads.append(payload)
+            self._thumbs.append(thumb)
+        for i, chunk in enumerate(_chunks(h)):
+            ids = self._tables[i].get(chunk)
+            if ids is None:
+                ids = self._tables[i][chunk] = array('I')
+            ids.append(idx)
+
+
+def normalize_patterns(patterns: List[Dict[str, Any]], width: int, height: int) -> List[list]:
+    """Compact, resolution-independent form of detections for the index."""
+    return [
+        [p['pattern'], p['confidence'], *[round(v / d, 5) for v, d in zip(p['bbox'], (width, height, width, height))]]
+        for p in patterns
+    ]
+
+
+def denormalize_patterns(stored: List[list], width: int, height: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            'pattern': name,
+            'confidence': confidence,
+            'bbox': [x1 * width, y1 * height, x2 * width, y2 * height],
+        }
+        for name, confidence, x1, y1, x2, y2 in stored
+    ]
@@ -1,5 +1,6 @@
 import os
-import requests
+
+from utils.http_client import http_client
 
 
 class PushService:
@@ -14,7 +15,7 @@ class PushService:
             self.headers['Authorization'] = f'Bearer {access_token}'
 
     def send_messages(self, messages):
-        response = requests.post(self.expo_endpoint, json=messages, headers=self.headers, timeout=10)
+        response = http_client.post(self.expo_endpoint, json=messages, headers=self.headers, timeout=10)
         response.raise_for_status()
         return response.json()
 
@@ -0,0 +1,106 @@
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List
+
+from utils.inference_backends import Detections
+from utils.metrics import metrics
+
+
+class _Replica:
+    def __init__(self, index: int, backend: Any, executor: ThreadPoolExecutor) -> None:
+        self.index = index
+        self.backend = backend
+        self.executor = executor
+
+    def predict(self, images: List[Any]) -> List[Detections]:
+        return self.executor.submit(self.backend.predict, images).result()
+
+
+class ReplicaPool:
+    """N in-process copies of a backend, each used by one request at a time.
+
+    Callers check a replica out, run it on the replica's dedicated thread
+    and return it; when all are busy they wait, and that wait is recorded as
+    ``<name>.queue_wait``. Exposes the same ``predict`` / ``names`` interface
+    as the backends.
+
+    ``intra_threads`` is each call's share of the cores (callers pass the
+    thread budget divided by the number of replicas that can run at once).
+    onnxruntime takes it per session through the factory. For PyTorch it is
+    one process-wide setting (``torch.set_num_threads``), applied once here
+    after the replicas load; every replica, and every other pool in the
+    process, shares it.
+    """
+
+    name = "replica-pool"
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        replicas: int = 1,
+        intra_threads: int = 0,
+        checkout_timeout_s: float = 60.0,
+        name: str = "replicas",
+    ) -> None:
+        self.replicas = max(1, int(replicas))
+        self.intra_threads = int(intra_threads)
+        self.checkout_timeout_s = checkout_timeout_s
+        self.metric_name = name
+        self._free: "queue.Queue[_Replica]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._busy = 0
+        self._all: List[_Replica] = []
+        for i in range(self.replicas):
+            executor = ThreadPoolExecutor(1, thread_name_prefix=f"{name}-{i}")
+            backend = executor.submit(factory).result()
+            replica = _Replica(i, backend, executor)
+            self._all.append(replica)
+            self._free.put(replica)
+        self.names = self._all[0].backend.names
+        if self.intra_threads > 0 and "torch" in sys.modules:
+            sys.modules["torch"].set_num_threads(self.intra_threads)
+
+    @contextmanager
+    def checkout(self, timeout: float | None = None) -> Iterator[_Replica]:
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        try:
+            replica = self._free.get(timeout=self.checkout_timeout_s if timeout is None else timeout)
+        except queue.Empty:
+            metrics.incr(f"{self.metric_name}.checkout_timeouts")
+            raise TimeoutError(f"No model replica free within {self.checkout_timeout_s}s")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        metrics.observe(f"{self.metric_name}.queue_wait", time.perf_counter() - start)
+        with self._lock:
+            self._busy += 1
+        try:
+            yield replica
+        finally:
+            with self._lock:
+                self._busy -= 1
+            self._free.put(replica)
+
+    def predict(self, images: List[Any]) -> List[Detections]:
+        with self.checkout() as replica:
+            return replica.predict(images)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'replicas': self.replicas,
+                'busy': self._busy,
+                'waiting': self._waiting,
+                'intra_threads': self.intra_threads,
+            }
+
+    def close(self) -> None:
+        for replica in self._all:
+            replica.executor.shutdown(wait=False)
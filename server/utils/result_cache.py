@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+import numpy as np
+
+from utils.metrics import metrics
+
+
+def estimate_size(value: Any) -> int:
+    """Rough byte size of a JSON-like value (strings dominate: base64 images)."""
+    if isinstance(value, (str, bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    return 8
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache with per-entry TTL and a total memory budget."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600.0,
+        max_bytes: int = 256 * 1024 * 1024,
+        sizeof: Callable[[Any], int] = estimate_size,
+        name: str = 'cache',
+    ) -> None:
+        # max_entries <= 0 disables the cache entirely
+        self.enabled = int(max_entries) > 0
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.max_bytes = int(max_bytes)
+        self.sizeof = sizeof
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # key -> (expires_at, size, value)
+        self._entries: "OrderedDict[Hashable, tuple[float, int, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < now:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                hit = False
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+        metrics.incr(f'{self.name}.hits' if hit else f'{self.name}.misses')
+        return entry[2] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            # Never let one oversized value flush the whole cache
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class RedisStore:
+    """JSON values in Redis under ``prefix``, shared by every worker process and host.
+
+    Needs the optional ``redis`` package. Lookups are best-effort: errors and
+    slow responses count as misses so the shared tier can never fail a request.
+    """
+
+    def __init__(self, url: str, prefix: str, ttl_seconds: float, timeout_s: float = 0.2) -> None:
+        import redis
+        self.prefix = prefix
+        self.ttl = max(1, int(ttl_seconds))
+        self._client = redis.Redis.from_url(url, socket_timeout=timeout_s, socket_connect_timeout=timeout_s)
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self._client.get(f"{self.prefix}:{key}")
+            return json.loads(raw) if raw is not None else None
+        except Exception:
+            metrics.incr(f'{self.prefix}.shared_errors')
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            self._client.set(f"{self.prefix}:{key}", json.dumps(value), ex=self.ttl)
+        except Exception:
+            metrics.incr(f'{self.prefix}.shared_errors')
+
+
+class TieredCache:
+    """An in-process LRUTTLCache in front of an optional shared store.
+
+    Shared-store hits are copied into the local tier. ``hit_rate`` in the
+    stats counts hits from either tier.
+    """
+
+    def __init__(self, local: LRUTTLCache, shared: Optional[RedisStore] = None) -> None:
+        self.local = local
+        self.shared = shared
+        self.shared_hits = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.shared_hits += 1
+                metrics.incr(f'{self.local.name}.shared_hits')
+                self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value)
+
+    def stats(self) -> dict:
+        stats = self.local.stats()
+        lookups = stats['hits'] + stats['misses']
+        hits = stats['hits'] + self.shared_hits
+        return {
+            **stats,
+            'shared': self.shared is not None,
+            'shared_hits': self.shared_hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def shared_store_from_env(env_var: str, prefix: str, ttl_seconds: float) -> Optional[RedisStore]:
+    """A RedisStore when ``env_var`` holds a redis:// URL, else None (local cache only)."""
+    url = os.getenv(env_var)
+    if not url:
+        return None
+    try:
+        return RedisStore(url, prefix, ttl_seconds)
+    except Exception as e:
+        print(f"Shared cache for {prefix} disabled: {e}")
+        return None
+
+
+def pixel_cache_key(img_np: np.ndarray, model_version: str) -> str:
+    """Content address of a decoded image: hash of the pixel buffer + model version."""
+    digest = hashlib.sha256()
+    digest.update(f"{img_np.shape}|{img_np.dtype}|{model_version}".encode('utf-8'))
+    digest.update(np.ascontiguousarray(img_np).data)
+    return digest.hexdigest()
+
+
+# Cache of full analyze-chart responses keyed by pixel_cache_key
+analysis_cache = LRUTTLCache(
+    max_entries=int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '512')),
+    ttl_seconds=float(os.getenv('ANALYSIS_CACHE_TTL_SECONDS', '3600')),
+    max_bytes=int(float(os.getenv('ANALYSIS_CACHE_MAX_MB', '256')) * 1024 * 1024),
+    name='analysis_cache',
+)
+metrics.register_collector('analysis_cache', analysis_cache.stats)
@@ -0,0 +1,102 @@
+import threading
+import time
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Tuple
+
+from utils.metrics import metrics
+
+
+class StageGraph:
+    """A small DAG of named stages executed on a thread pool.
+
+    Each stage is called with the results of its dependencies as keyword
+    arguments and is submitted as soon as they have all finished, so stages
+    that do not depend on each other run concurrently. A failed stage fails
+    every stage downstream of it with the same exception. A stage may name
+    its own executor, e.g. to keep it from queueing behind slow stages.
+    """
+
+    def __init__(self, executor: Executor, name: str = 'stages') -> None:
+        self.executor = executor
+        self.name = name
+        self._stages: Dict[str, Tuple[Callable[..., Any], Tuple[str, ...]]] = {}
+        self._executors: Dict[str, Executor] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Tuple[str, ...] = (), executor: Executor | None = None) -> 'StageGraph':
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dep!r}")
+        self._stages[name] = (fn, tuple(deps))
+        if executor is not None:
+            self._executors[name] = executor
+        return self
+
+    def run(self) -> 'StageRun':
+        return StageRun(self)
+
+
+class StageRun:
+    """One execution of a StageGraph: a Future per stage plus per-stage timings."""
+
+    def __init__(self, graph: StageGraph) -> None:
+        self.graph = graph
+        self.futures: Dict[str, Future] = {name: Future() for name in graph._stages}
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._waiting = {name: len(deps) for name, (_, deps) in graph._stages.items()}
+        self._dependents: Dict[str, List[str]] = {name: [] for name in graph._stages}
+        for name, (_, deps) in graph._stages.items():
+            for dep in deps:
+                self._dependents[dep].append(name)
+        for name, waiting in list(self._waiting.items()):
+            if waiting == 0:
+                self._submit(name)
+
+    def result(self, name: str, timeout: float | None = None) -> Any:
+        return self.futures[name].result(timeout=timeout)
+
+    def wait(self, timeout: float | None = None) -> Dict[str, Any]:
+        return {name: fut.result(timeout=timeout) for name, fut in self.futures.items()}
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def server_timing(self) -> str:
+        """Per-stage durations formatted for a Server-Timing response header."""
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items()]
+        parts.append(f"total;dur={self.elapsed * 1000:.1f}")
+        return ", ".join(parts)
+
+    def _submit(self, name: str) -> None:
+        self.graph._executors.get(name, self.graph.executor).submit(self._run_stage, name)
+
+    def _run_stage(self, name: str) -> None:
+        fn, deps = self.graph._stages[name]
+        future = self.futures[name]
+        try:
+            kwargs = {dep: self.futures[dep].result() for dep in deps}
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            start = time.perf_counter()
+            try:
+                value = fn(**kwargs)
+            except Exception as e:
+                future.set_exception(e)
+            else:
+                future.set_result(value)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.timings[name] = elapsed
+                metrics.observe(f'{self.graph.name}.{name}', elapsed)
+
+        ready = []
+        with self._lock:
+            for dependent in self._dependents[name]:
+                self._waiting[dependent] -= 1
+                if self._waiting[dependent] == 0:
+                    ready.append(dependent)
+        for dependent in ready:
+            self._submit(dependent)
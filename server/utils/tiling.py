@@ -0,0 +1,88 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from utils.box_ops import batched_nms
+from utils.inference_backends import Detections
+
+Window = Tuple[int, int, int, int]
+
+
+class TilePlanner:
+    """Split wide or very large charts into overlapping square tiles.
+
+    A chart is tiled when its width is at least ``min_aspect`` times its
+    height, when its height is at least ``min_portrait_aspect`` times its
+    width, or when its longest side is at least ``min_side`` (0 disables
+    either of the last two). Portrait phone screenshots (about 2.2:1, the
+    most common upload) therefore run whole by default. Tiles
+    are ``tile_size`` pixels square, or as tall as the chart's short side when
+    ``tile_size`` is 0, so a 5:1 screenshot becomes a row of square crops the
+    model sees at full height instead of one squashed letterbox.
+    """
+
+    def __init__(
+        self,
+        min_aspect: float = 2.0,
+        min_portrait_aspect: float = 0.0,
+        min_side: int = 0,
+        tile_size: int = 0,
+        overlap: float = 0.2,
+        merge_threshold: float = 0.6,
+    ) -> None:
+        self.min_aspect = float(min_aspect)
+        self.min_portrait_aspect = float(min_portrait_aspect)
+        self.min_side = int(min_side)
+        self.tile_size = int(tile_size)
+        self.overlap = min(max(float(overlap), 0.0), 0.9)
+        self.merge_threshold = float(merge_threshold)
+
+    def windows(self, width: int, height: int) -> List[Window] | None:
+        """Tile windows (x1, y1, x2, y2) for a chart, or None if it should run whole."""
+        short, long = min(width, height), max(width, height)
+        by_aspect = width / max(height, 1) >= self.min_aspect
+        by_portrait = self.min_portrait_aspect > 0 and height / max(width, 1) >= self.min_portrait_aspect
+        by_size = self.min_side > 0 and long >= self.min_side
+        if not (by_aspect or by_portrait or by_size):
+            return None
+        side = min(self.tile_size, short) if self.tile_size > 0 else short
+        xs = _starts(width, side, self.overlap)
+        ys = _starts(height, side, self.overlap)
+        if len(xs) * len(ys) <= 1:
+            return None
+        return [(x, y, x + side, y + side) for y in ys for x in xs]
+
+    def crops(self, img_np: np.ndarray, windows: Sequence[Window]) -> List[np.ndarray]:
+        return [np.ascontiguousarray(img_np[y1:y2, x1:x2]) for x1, y1, x2, y2 in windows]
+
+    def merge(self, detections: Sequence[Detections], windows: Sequence[Window]) -> Detections:
+        """Map per-tile boxes to chart coordinates and drop duplicates across seams.
+
+        Duplicates are suppressed class-wise by intersection over the smaller
+        box, so a pattern cut in two by a tile edge collapses into the
+        detection from the tile that saw it whole.
+        """
+        boxes, confs, classes = [], [], []
+        for det, (x1, y1, _, _) in zip(detections, windows):
+            if len(det.xyxy) == 0:
+                continue
+            boxes.append(det.xyxy + np.array([x1, y1, x1, y1], dtype=det.xyxy.dtype))
+            confs.append(det.conf)
+            classes.append(det.cls)
+        if not boxes:
+            return Detections(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int64))
+        xyxy = np.concatenate(boxes)
+        conf = np.concatenate(confs)
+        cls = np.concatenate(classes)
+        keep = batched_nms(xyxy, conf, cls, self.merge_threshold, metric="ios")
+        return Detections(xyxy[keep], conf[keep], cls[keep])
+
+
+def _starts(length: int, side: int, overlap: float) -> List[int]:
+    if length <= side:
+        return [0]
+    stride = max(1, int(side * (1.0 - overlap)))
+    starts = list(range(0, length - side, stride))
+    # Last tile is flush with the far edge
+    starts.append(length - side)
+    return starts
@@ -1,77 +1,303 @@
 import os
-import io
+import functools
+import hashlib
+import threading
 from typing import Any, Dict, List, Tuple
 
 import numpy as np
-from PIL import Image
-from ultralytics import YOLO
-import cv2
+
+from utils.inference_backends import Detections, create_backend
+from utils.inference_batcher import MicroBatcher
+from utils.inference_pool import create_worker_pool
+from utils.inference_profiles import FREE_PROFILE, PROFILES, InferenceProfile, get_profile
+from utils.metrics import metrics
+from utils.phash_index import HASHERS, PerceptualHashIndex, denormalize_patterns, normalize_patterns, thumbnail
+from utils.replica_pool import ReplicaPool
+from utils.tiling import TilePlanner
+
+
+def resolve_model_path() -> str:
+    return os.getenv("CHART_MODEL_PATH") or os.getenv("YOLO_MODEL_PATH") or "model.pt"
+
+
+_version_lock = threading.Lock()
+_version_cache: Dict[Tuple[str, float, int], str] = {}
+
+
+def get_model_version(model_path: str | None = None) -> str:
+    """Stable identifier of the weights file: '<name>:<sha256 prefix>'.
+
+    Computed from file contents (memoized on path/mtime/size) so result caches
+    can be keyed on it without loading the model.
+    """
+    model_path = model_path or resolve_model_path()
+    try:
+        st = os.stat(model_path)
+    except OSError:
+        return f"{os.path.basename(model_path)}:missing"
+    key = (os.path.abspath(model_path), st.st_mtime, st.st_size)
+    with _version_lock:
+        version = _version_cache.get(key)
+        if version is None:
+            digest = hashlib.sha256()
+            with open(model_path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            version = f"{os.path.basename(model_path)}:{digest.hexdigest()[:12]}"
+            _version_cache[key] = version
+    return version
+
+
+def warmup_images(imgsz: int, tiled: bool) -> List[np.ndarray]:
+    """Synthetic chart-like frames at the profile's input size (and a wide one when tiling is on)."""
+    shapes = [(imgsz, imgsz)]
+    if tiled:
+        shapes.append((imgsz, imgsz * 4))
+    images = []
+    for height, width in shapes:
+        img = np.full((height, width, 3), 18, dtype=np.uint8)
+        img[:, ::max(8, width // 60)] = (60, 60, 60)
+        img[height // 3:height // 3 + 4, :] = (40, 200, 90)
+        images.append(img)
+    return images
 
 
 class YoloChartAnalyzer:
-    def __init__(self) -> None:
-        model_path = os.getenv("CHART_MODEL_PATH") or os.getenv("YOLO_MODEL_PATH") or "model.pt"
+    def __init__(
+        self,
+        profile: InferenceProfile | None = None,
+        model_path: str | None = None,
+        shadow: bool = False,
+    ) -> None:
+        """Load ``model_path`` (default CHART_MODEL_PATH) for one inference profile.
+
+        A ``shadow`` analyzer only serves predict_batch for model comparisons:
+        it gets no micro-batcher, perceptual-hash index or metrics collectors.
+        """
+        self.profile = profile or get_profile(FREE_PROFILE)
+        self.shadow = shadow
+        model_path = model_path or resolve_model_path()
+        self.model_path = model_path
         if not os.path.exists(model_path):
             raise FileNotFoundError(
                 f"YOLO model file not found at '{model_path}'. Set CHART_MODEL_PATH env to a valid .pt file"
             )
-        self.model = YOLO(model_path)
+        self.model_version = get_model_version(model_path)
+        # CHART_BACKEND selects PyTorch (ultralytics) or onnxruntime on CPU.
+        # With CHART_WORKER_PROCESSES > 0 the model lives in dedicated worker
+        # processes instead, keeping inference off the Flask request threads' GIL.
+        # The profile sets input size, thresholds and annotation resolution.
+        backend_kwargs = dict(imgsz=self.profile.imgsz, conf=self.profile.conf, max_det=self.profile.max_det)
+        worker_processes = int(os.getenv("CHART_WORKER_PROCESSES", "0"))
+        replicas = 1
+        if worker_processes > 0:
+            # Every profile runs its own pool, so cores are split across all of them
+            self.backend = create_worker_pool(model_path, self.model_version, worker_processes, pools=len(PROFILES), **backend_kwargs)
+            if not shadow:
+                metrics.register_collector(f"worker_pool.{self.profile.name}", self.backend.stats)
+        else:
+            # In-process models are never shared between threads: each of the
+            # CHART_MODEL_REPLICAS copies serves one call at a time with
+            # CHART_REPLICA_THREADS intra-op threads (default: cores split across
+            # the replicas of every profile, since all of them can run at once).
+            replicas = max(1, int(os.getenv("CHART_MODEL_REPLICAS", "1")))
+            intra_threads = int(os.getenv("CHART_REPLICA_THREADS", "0"))
+            concurrent_calls = replicas * len(PROFILES)
+            if not intra_threads and concurrent_calls > 1:
+                intra_threads = max(1, (os.cpu_count() or 1) // concurrent_calls)
+            self.backend = ReplicaPool(
+                functools.partial(create_backend, model_path, self.model_version, intra_threads=intra_threads or None, **backend_kwargs),
+                replicas=replicas,
+                intra_threads=intra_threads,
+                name=f"replicas.{self.profile.name}",
+            )
+            if not shadow:
+                metrics.register_collector(f"replicas.{self.profile.name}", self.backend.stats)
+        self.names = self.backend.names
+        self.annotation_scale = self.profile.annotation_scale
 
-    def analyze_pil(self, image: Image.Image) -> Tuple[List[Dict[str, Any]], Image.Image]:
-        img_rgb = image.convert("RGB")
-        img_np = np.array(img_rgb)
+        # Wide (width/height >= CHART_TILE_MIN_ASPECT), very tall (height/width >=
+        # CHART_TILE_MIN_PORTRAIT_ASPECT, off by default) or large (CHART_TILE_MIN_SIDE)
+        # charts are run as overlapping square tiles instead of one squashed input.
+        self.tiler: TilePlanner | None = None
+        if os.getenv("CHART_TILING_ENABLED", "true").lower() == "true":
+            self.tiler = TilePlanner(
+                min_aspect=float(os.getenv("CHART_TILE_MIN_ASPECT", "2.0")),
+                min_portrait_aspect=float(os.getenv("CHART_TILE_MIN_PORTRAIT_ASPECT", "0")),
+                min_side=int(os.getenv("CHART_TILE_MIN_SIDE", "0")),
+                tile_size=int(os.getenv("CHART_TILE_SIZE", "0")),
+                overlap=float(os.getenv("CHART_TILE_OVERLAP", "0.2")),
+                merge_threshold=float(os.getenv("CHART_TILE_MERGE_IOS", "0.6")),
+            )
 
-        results = self.model(img_np)
+        # Concurrent requests are coalesced into one forward pass of up to
+        # CHART_BATCH_MAX_SIZE images, waiting at most CHART_BATCH_MAX_WAIT_MS.
+        max_batch_size = int(os.getenv("CHART_BATCH_MAX_SIZE", "8"))
+        max_wait_ms = float(os.getenv("CHART_BATCH_MAX_WAIT_MS", "5"))
+        self.batcher: MicroBatcher | None = None
+        if max_batch_size > 1 and not shadow:
+            self.batcher = MicroBatcher(
+                self.predict_batch,
+                max_batch_size=max_batch_size,
+                max_wait_ms=max_wait_ms,
+                name=f"yolo-batcher-{self.profile.name}",
+                concurrency=max(replicas, worker_processes),
+            )
 
-        patterns: List[Dict[str, Any]] = []
-        names = getattr(self.model, "names", {}) or {}
-
-        boxes = getattr(results[0], "boxes", None)
-        if boxes is not None:
-            # boxes.cls (tensor), boxes.conf, boxes.xyxy
-            cls_list = boxes.cls.tolist()
-            conf_list = boxes.conf.tolist()
-            xyxy = boxes.xyxy.cpu().numpy().tolist()
-            for idx, cls_id in enumerate(cls_list):
-                name = names.get(int(cls_id), str(int(cls_id)))
-                confidence = float(conf_list[idx])
-                bbox = xyxy[idx]
-                patterns.append(
-                    {
-                        "pattern": name,
-                        "confidence": round(confidence, 3),
-                        "bbox": bbox,
-                    }
-                )
-
-        # Annotate image
-        img_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-        for p in patterns:
-            x1, y1, x2, y2 = [int(v) for v in p["bbox"]]
-            cv2.rectangle(img_bgr, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            label = f"{p['pattern']} {p['confidence']*100:.1f}%"
-            cv2.putText(
-                img_bgr,
-                label,
-                (x1, max(0, y1 - 10)),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.6,
-                (0, 255, 0),
-                2,
-                cv2.LINE_AA,
+        # Near-duplicate uploads (recompressed, cropped, extra status bar) reuse
+        # the detections of an earlier analysis within CHART_PHASH_MAX_DISTANCE bits
+        # whose thumbnail also correlates at least CHART_PHASH_MIN_CORRELATION.
+        self.phash_index: PerceptualHashIndex | None = None
+        if os.getenv("CHART_PHASH_ENABLED", "true").lower() == "true" and not shadow:
+            self._hasher = HASHERS[os.getenv("CHART_PHASH_ALGO", "dhash")]
+            # Detections depend on the profile, so each profile keeps its own index
+            self.phash_index = PerceptualHashIndex(
+                max_distance=int(os.getenv("CHART_PHASH_MAX_DISTANCE", "2")),
+                model_version=f"{self.model_version}@{self.profile.name}",
+                max_entries=int(os.getenv("CHART_PHASH_MAX_ENTRIES", "50000")),
+                min_correlation=float(os.getenv("CHART_PHASH_MIN_CORRELATION", "0.9")),
+            )
+            index_path = os.getenv("CHART_PHASH_INDEX_PATH")
+            if index_path:
+                root, ext = os.path.splitext(index_path)
+                index_path = f"{root}.{self.profile.name}{ext}"
+                if os.path.exists(index_path):
+                    try:
+                        loaded = self.phash_index.load(index_path)
+                        print(f"✅ Loaded {loaded} perceptual hashes from {index_path}")
+                    except Exception as e:
+                        print(f"Perceptual hash index load warning: {e}")
+                self.phash_index.autosave(index_path, float(os.getenv("CHART_PHASH_SAVE_INTERVAL_S", "300")))
+            metrics.register_collector(
+                f"phash_index.{self.profile.name}",
+                lambda: {"entries": len(self.phash_index), "rejected": self.phash_index.rejected},
             )
-        annotated = Image.fromarray(cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB))
-        return patterns, annotated
 
+    def warm_up(self, runs: int) -> None:
+        """Run synthetic frames through the model so graph setup and allocator growth happen now.
+
+        Goes through predict_batch directly so the perceptual-hash index is not
+        filled with synthetic entries.
+        """
+        images = warmup_images(self.profile.imgsz, self.tiler is not None)
+        batch = self.batcher.max_batch_size if self.batcher is not None else 1
+        for _ in range(max(1, runs)):
+            for img in images:
+                self.predict_batch([img])
+            if batch > 1:
+                self.predict_batch([images[0]] * batch)
+
+    def close(self) -> None:
+        """Release the model once a newer version has replaced it.
+
+        Calls still queued on the batcher fail with BatcherClosedError, as do
+        later ones; the hash index stops saving so it cannot overwrite the
+        replacement's file.
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+        if self.phash_index is not None:
+            self.phash_index.stop_autosave()
+        self.backend.close()
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Run one forward pass over several RGB arrays, returning patterns per image.
+
+        Charts the tile planner selects are expanded into their tiles within
+        the same forward pass and merged back afterwards.
+        """
+        inputs: List[np.ndarray] = []
+        plan: List[Tuple[int, Any]] = []
+        for img_np in images:
+            windows = None
+            if self.tiler is not None:
+                windows = self.tiler.windows(img_np.shape[1], img_np.shape[0])
+            plan.append((len(inputs), windows))
+            if windows is None:
+                inputs.append(img_np)
+            else:
+                inputs.extend(self.tiler.crops(img_np, windows))
+                metrics.incr("tiling.images")
+                metrics.incr("tiling.tiles", len(windows))
 
-# Global singleton
-_analyzer: YoloChartAnalyzer | None = None
+        detections = self.backend.predict(inputs)
+        results: List[List[Dict[str, Any]]] = []
+        for start, windows in plan:
+            if windows is None:
+                merged = detections[start]
+            else:
+                merged = self.tiler.merge(detections[start:start + len(windows)], windows)
+            results.append(self._patterns_from_detections(merged))
+        return results
+
+    def detect(self, img_np: np.ndarray) -> List[Dict[str, Any]]:
+        if self.batcher is not None:
+            return self.batcher.submit(img_np)
+        return self.predict_batch([img_np])[0]
+
+    def detect_or_reuse(self, img_np: np.ndarray) -> List[Dict[str, Any]]:
+        """Detect patterns, reusing a near-duplicate's detections when the index has one."""
+        if self.phash_index is None:
+            return self.detect(img_np)
+        height, width = img_np.shape[:2]
+        key, thumb = self._hasher(img_np), thumbnail(img_np)
+        match = self.phash_index.lookup(key, thumb=thumb)
+        if match is not None:
+            metrics.incr("phash_index.hits")
+            return denormalize_patterns(match[1], width, height)
+        metrics.incr("phash_index.misses")
+        patterns = self.detect(img_np)
+        self.phash_index.add(key, normalize_patterns(patterns, width, height), thumb)
+        return patterns
+
+    def detect_many(self, images: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """detect_or_reuse for several charts, running all index misses as one batch."""
+        results: List[List[Dict[str, Any]] | None] = [None] * len(images)
+        misses: List[Tuple[int, Any, bytes | None]] = []
+        for i, img_np in enumerate(images):
+            if self.phash_index is None:
+                misses.append((i, None, None))
+                continue
+            height, width = img_np.shape[:2]
+            key, thumb = self._hasher(img_np), thumbnail(img_np)
+            match = self.phash_index.lookup(key, thumb=thumb)
+            if match is not None:
+                metrics.incr("phash_index.hits")
+                results[i] = denormalize_patterns(match[1], width, height)
+            else:
+                metrics.incr("phash_index.misses")
+                misses.append((i, key, thumb))
+        if misses:
+            detected = self.predict_batch([images[i] for i, _, _ in misses])
+            for (i, key, thumb), patterns in zip(misses, detected):
+                results[i] = patterns
+                if key is not None:
+                    height, width = images[i].shape[:2]
+                    self.phash_index.add(key, normalize_patterns(patterns, width, height), thumb)
+        return results
+
+    def _patterns_from_detections(self, detections: Detections) -> List[Dict[str, Any]]:
+        patterns: List[Dict[str, Any]] = []
+        xyxy = detections.xyxy.tolist()
+        for idx, cls_id in enumerate(detections.cls.tolist()):
+            name = self.names.get(int(cls_id), str(int(cls_id)))
+            confidence = float(detections.conf[idx])
+            patterns.append(
+                {
+                    "pattern": name,
+                    "confidence": round(confidence, 3),
+                    "bbox": xyxy[idx],
+                }
+            )
+        return patterns
 
 
-def get_chart_analyzer() -> YoloChartAnalyzer:
-    global _analyzer
-    if _analyzer is None:
-        _analyzer = YoloChartAnalyzer()
-    return _analyzer
+def get_chart_analyzer(profile: InferenceProfile | str | None = None) -> YoloChartAnalyzer:
+    """Analyzer for ``profile`` (a profile or its name; default CHART_FREE_PROFILE) on the current model."""
+    from utils.model_registry import model_registry
+    return model_registry.get_analyzer(profile)
 
 
+def load_all_profiles() -> Dict[str, YoloChartAnalyzer]:
+    """Build the analyzer for every configured profile so none is loaded on a request."""
+    return {name: get_chart_analyzer(name) for name in PROFILES}